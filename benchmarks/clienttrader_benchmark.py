@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+使用模拟的 pywinauto 应用测量 ClientTrader 连续下单的速度
+
+模拟应用每次通过 child_window 查找控件耗时 --search-cost 秒，其他操作不耗时,
+ClientTrader.wait 及 wait_until 不实际等待，只统计等待的时间，
+wait_until 的条件不满足时按超时时间统计。
+对比关闭及开启控件缓存、菜单状态跟踪时每秒的下单数,
+以及依次读取 balance, position, today_entrusts, today_trades 与调用 snapshot()
+时每轮刷新页面的次数
+
+用法::
+
+    python benchmarks/clienttrader_benchmark.py --orders 200 --search-cost 0.005
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from easytrader.clienttrader import ClientTrader  # noqa: E402
+
+
+class FakeControl:
+    def __init__(self, app, criteria):
+        self._app = app
+        self._criteria = criteria
+
+    def is_visible(self):
+        return True
+
+    def is_selected(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def wait(self, *args, **kwargs):
+        return self
+
+    def wrapper_object(self):
+        return self
+
+    def window_text(self):
+        return "10000.00"
+
+    def set_edit_text(self, text):
+        self._app.typed += 1
+
+    def type_keys(self, keys, **kwargs):
+        if keys == "{F5}":
+            self._app.refreshes += 1
+
+    def click(self, **kwargs):
+        self._app.clicks += 1
+
+    def get_item(self, path):
+        return self
+
+
+class FakeWindowSpecification:
+    """与 pywinauto 的 WindowSpecification 相同，每次调用控件的方法都重新查找控件"""
+
+    def __init__(self, app, criteria):
+        self._app = app
+        self._criteria = criteria
+
+    def wrapper_object(self):
+        self._app.searches += 1
+        time.sleep(self._app.search_cost)
+        return FakeControl(self._app, self._criteria)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapper_object(), name)
+
+
+class FakeMainWindow(FakeControl):
+    def child_window(self, **criteria):
+        return FakeWindowSpecification(self._app, criteria)
+
+
+class FakeApplication:
+    def __init__(self, search_cost):
+        self.search_cost = search_cost
+        self.searches = 0
+        self.clicks = 0
+        self.typed = 0
+        self.refreshes = 0
+        self.main = FakeMainWindow(self, {})
+
+    def top_window(self):
+        return self.main
+
+    def windows(self, **kwargs):
+        return []
+
+
+class BenchmarkTrader(ClientTrader):
+    def __init__(self, app):
+        super().__init__()
+        self._app = app
+        self._main = app.main
+        self.waited = 0.0
+
+    def wait(self, seconds):
+        self.waited += seconds
+
+    def wait_until(self, name, condition, timeout):
+        ok = bool(condition())
+        if not ok:
+            self.waited += timeout
+        return ok
+
+    def _get_grid_data(self, control_id):
+        # 不实际复制表格
+        self._control(control_id, "CVirtualGridCtrl")
+        return []
+
+
+def run(orders, search_cost, optimized):
+    app = FakeApplication(search_cost)
+    trader = BenchmarkTrader(app)
+    # pylint: disable=protected-access
+    trader._controls.enabled = optimized
+    if not optimized:
+        # 每次都点击菜单并刷新
+        trader._is_menu_selected = lambda path: False
+    start = time.perf_counter()
+    for i in range(orders):
+        trader.buy("600{:03d}".format(i % 1000), 10.0, 100)
+    elapsed = time.perf_counter() - start
+    return {
+        "orders_per_second": orders / elapsed,
+        "searches_per_order": app.searches / orders,
+        "wait_per_order": trader.waited / orders,
+    }
+
+
+def run_reads(rounds, search_cost, use_snapshot):
+    app = FakeApplication(search_cost)
+    trader = BenchmarkTrader(app)
+    # 风控循环每轮都需要最新数据
+    trader.menu_freshness = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if use_snapshot:
+            trader.snapshot()
+        else:
+            # pylint: disable=pointless-statement
+            trader.balance
+            trader.position
+            trader.today_entrusts
+            trader.today_trades
+    elapsed = time.perf_counter() - start
+    return {
+        "rounds_per_second": rounds / elapsed,
+        "refreshes_per_round": app.refreshes / rounds,
+        "wait_per_round": trader.waited / rounds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--search-cost", type=float, default=0.005)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, optimized in (("before", False), ("after", True)):
+        stats = run(args.orders, args.search_cost, optimized)
+        print(
+            "{:<8} orders/s {:>10.1f}   searches/order {:>6.2f}"
+            "   wait/order {:>6.3f}s".format(
+                name,
+                stats["orders_per_second"],
+                stats["searches_per_order"],
+                stats["wait_per_order"],
+            )
+        )
+
+    for name, use_snapshot in (("props", False), ("snapshot", True)):
+        stats = run_reads(args.rounds, args.search_cost, use_snapshot)
+        print(
+            "{:<8} rounds/s {:>10.1f}   refreshes/round {:>5.2f}"
+            "   wait/round {:>6.3f}s".format(
+                name,
+                stats["rounds_per_second"],
+                stats["refreshes_per_round"],
+                stats["wait_per_round"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
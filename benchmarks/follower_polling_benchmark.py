@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+对比 follower 两种策略轮询方式在不同策略数下的内存及 CPU 占用
+
+用法::
+
+    python benchmarks/follower_polling_benchmark.py --duration 10
+
+每种配置在独立子进程中运行，查询接口使用 sleep 模拟网络延迟
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from easytrader.follower import BaseFollower  # noqa: E402
+from easytrader.log import log  # noqa: E402
+
+
+class BenchFollower(BaseFollower):
+    def __init__(self, io_latency):
+        super().__init__()
+        self.io_latency = io_latency
+        self.polls = 0
+        self._lock = threading.Lock()
+
+    def query_strategy_transaction(self, strategy, **kwargs):
+        time.sleep(self.io_latency)
+        with self._lock:
+            self.polls += 1
+        return []
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(
+    engine, strategies, duration, io_latency, max_concurrency, conn
+):
+    log.disabled = True
+    follower = BenchFollower(io_latency)
+    follower.follow(
+        users=[],
+        strategies=[],
+        polling_engine=engine,
+        max_concurrency=max_concurrency,
+    )
+    base_rss = rss_mb()
+    cpu_start = time.process_time()
+    wall_start = time.time()
+    follower.start_strategy_workers(
+        [("s{}".format(i), "s{}".format(i), {}) for i in range(strategies)],
+        track_interval=1,
+    )
+    peak_threads = 0
+    while time.time() - wall_start < duration:
+        peak_threads = max(peak_threads, threading.active_count())
+        time.sleep(0.2)
+    wall = time.time() - wall_start
+    conn.send(
+        {
+            "engine": engine,
+            "strategies": strategies,
+            "threads": peak_threads,
+            "rss_mb": rss_mb() - base_rss,
+            "cpu_percent": (time.process_time() - cpu_start) / wall * 100,
+            "polls_per_second": follower.polls / wall,
+        }
+    )
+    # 轮询线程不会退出，直接结束子进程
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--io-latency", type=float, default=0.05)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument(
+        "--strategies", type=int, nargs="+", default=[10, 100, 1000]
+    )
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(
+        "{:<8} {:>10} {:>8} {:>10} {:>8} {:>10}".format(
+            "engine", "strategies", "threads", "rss(MB)", "cpu(%)", "polls/s"
+        )
+    )
+    for strategies in args.strategies:
+        for engine in BaseFollower.POLLING_ENGINES:
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=run_case,
+                args=(
+                    engine,
+                    strategies,
+                    args.duration,
+                    args.io_latency,
+                    args.max_concurrency,
+                    child_conn,
+                ),
+            )
+            process.start()
+            result = parent_conn.recv()
+            process.join()
+            print(
+                "{engine:<8} {strategies:>10} {threads:>8} {rss_mb:>10.1f} "
+                "{cpu_percent:>8.1f} {polls_per_second:>10.1f}".format(**result)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+回放调仓记录，测量 follower 从解析、去重到下单的吞吐量
+
+用法::
+
+    # 使用生成的聚宽调仓记录
+    python benchmarks/follower_replay_benchmark.py --strategies 50 --polls 200
+
+    # 回放 follow(record_history=...) 录制的文件
+    python benchmarks/follower_replay_benchmark.py \\
+        --recording history.jsonl --follower xueqiu --assets 100000
+
+默认尽快回放，--speed 100 表示按录制时间的 100 倍速回放
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from easytrader.joinquant_follower import JoinQuantFollower  # noqa: E402
+from easytrader.log import log  # noqa: E402
+from easytrader.replay import (  # noqa: E402
+    HistoryRecorder,
+    RecordedResponse,
+    ReplayHarness,
+    ReplaySource,
+    ReplayUser,
+)
+from easytrader.ricequant_follower import RiceQuantFollower  # noqa: E402
+from easytrader.xq_follower import XueQiuFollower  # noqa: E402
+
+FOLLOWERS = {
+    "joinquant": JoinQuantFollower,
+    "ricequant": RiceQuantFollower,
+    "xueqiu": XueQiuFollower,
+}
+
+
+def generate_joinquant_recording(path, strategies, polls, rebalance_every):
+    """
+    生成聚宽调仓记录，每个策略每 10 秒查询一次，每 rebalance_every 次查询新增一条成交
+    """
+    start = time.time() - polls * 10
+    recorder = HistoryRecorder(path)
+    transactions = {i: [] for i in range(strategies)}
+    for poll in range(polls):
+        for i in range(strategies):
+            fetched = start + poll * 10 + i * 10 / strategies
+            if poll % rebalance_every == 0:
+                signal = datetime.datetime.fromtimestamp(fetched)
+                transactions[i].append(
+                    {
+                        "date": signal.strftime("%Y-%m-%d"),
+                        "time": signal.strftime("%H:%M"),
+                        "stock": "浦发银行(600{:03d}.XSHG)".format(
+                            (i + poll) % 1000
+                        ),
+                        "transaction": "买" if poll % 2 else "卖",
+                        "amount": "{}股".format(100 * (poll + 1)),
+                        "price": 10.0,
+                    }
+                )
+            content = json.dumps({"data": {"transaction": transactions[i]}})
+            recorder.record(
+                "bt{}".format(i),
+                RecordedResponse(content=content.encode("utf8")),
+                fetched,
+            )
+    recorder.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording", help="录制文件，默认生成聚宽调仓记录")
+    parser.add_argument(
+        "--follower", choices=sorted(FOLLOWERS), default="joinquant"
+    )
+    parser.add_argument("--assets", type=float, default=100000)
+    parser.add_argument("--speed", type=float, default=None)
+    parser.add_argument("--strategies", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--rebalance-every", type=int, default=5)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--broker-latency", type=float, default=0.0)
+    parser.add_argument("--parallel-dispatch", action="store_true")
+    args = parser.parse_args()
+
+    log.disabled = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recording = args.recording
+        if recording is None:
+            recording = os.path.join(tmp_dir, "history.jsonl")
+            generate_joinquant_recording(
+                recording, args.strategies, args.polls, args.rebalance_every
+            )
+        source = ReplaySource(recording, speed=args.speed)
+        users = [ReplayUser(args.broker_latency) for _ in range(args.users)]
+        strategy_kwargs = {}
+        if args.follower == "xueqiu":
+            strategy_kwargs = {
+                s: {"assets": args.assets} for s in source.strategies
+            }
+        stats = ReplayHarness(
+            FOLLOWERS[args.follower](),
+            source,
+            users=users,
+            strategy_kwargs=strategy_kwargs,
+            parallel_dispatch=args.parallel_dispatch,
+        ).run()
+
+    for key, value in stats.items():
+        if isinstance(value, float):
+            value = "{:.3f}".format(value)
+        print("{:<20} {}".format(key, value))
+
+
+if __name__ == "__main__":
+    main()
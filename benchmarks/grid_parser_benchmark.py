@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+对比 grid_parser 与 pandas.read_csv 解析客户端 grid 文本的耗时
+
+用法::
+
+    python benchmarks/grid_parser_benchmark.py --rows 10 1000 50000
+
+未安装 pandas 时只测量 grid_parser
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# pylint: disable=wrong-import-position
+from easytrader.config.client import CommonConfig  # noqa: E402
+from easytrader.grid_parser import GridParser  # noqa: E402
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+HEADER = [
+    "证券代码",
+    "证券名称",
+    "股票余额",
+    "可用余额",
+    "冻结数量",
+    "成本价",
+    "市价",
+    "盈亏",
+    "盈亏比例(%)",
+    "市值",
+    "股东代码",
+    "交易市场",
+    "",
+]
+
+
+def generate_grid(rows):
+    lines = ["\t".join(HEADER)]
+    for i in range(rows):
+        lines.append(
+            "\t".join(
+                [
+                    "{:06d}".format(i % 1000000),
+                    "股票{}".format(i),
+                    str(100 * (i % 50 + 1)),
+                    str(100 * (i % 50)),
+                    "0",
+                    "{:.3f}".format(10 + i % 7 * 0.125),
+                    "{:.2f}".format(11 + i % 5 * 0.25),
+                    "{:.2f}".format((i % 11 - 5) * 12.5),
+                    "{:.2f}".format((i % 13 - 6) * 1.5),
+                    "{:.2f}".format(1000 + i),
+                    "A{:09d}".format(i),
+                    "上海Ａ股",
+                    "",
+                ]
+            )
+        )
+    return "\n".join(lines) + "\n"
+
+
+def parse_with_grid_parser(parser, text):
+    return parser.parse(text).records()
+
+
+def parse_with_pandas(text):
+    df = pd.read_csv(
+        io.StringIO(text),
+        delimiter="\t",
+        dtype=CommonConfig.GRID_DTYPE,
+        na_filter=False,
+    )
+    return df.to_dict("records")
+
+
+def measure(func, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10, 1000, 50000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    grid_parser = GridParser(CommonConfig.GRID_DTYPE)
+    print("{:>8} {:>14} {:>14}".format("rows", "grid_parser", "pandas"))
+    for rows in args.rows:
+        text = generate_grid(rows)
+        native = measure(
+            parse_with_grid_parser, grid_parser, text, repeat=args.repeat
+        )
+        if pd is None:
+            pandas_cost = "-"
+        else:
+            pandas_cost = "{:.3f} ms".format(
+                measure(parse_with_pandas, text, repeat=args.repeat) * 1000
+            )
+        print(
+            "{:>8} {:>11.3f} ms {:>14}".format(rows, native * 1000, pandas_cost)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import types
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+
+class AccountSnapshot(NamedTuple):
+    """
+    同一次读取得到的账户数据，字典被转换为只读的 MappingProxyType,
+    列表被转换为 tuple，多个读取者共享同一个快照时不会互相修改。
+    timestamp 为读取完成的时间，started 为开始读取第一个页面的时间
+    """
+
+    timestamp: float
+    balance: object
+    position: tuple
+    today_entrusts: tuple
+    today_trades: tuple
+    started: float
+
+    @property
+    def age(self) -> float:
+        """最早读取的数据距今的时间，单位为秒"""
+        return time.time() - self.started
+
+
+def freeze(data):
+    """:return: 只读的数据，dict 转换为 MappingProxyType, list 转换为 tuple"""
+    if isinstance(data, dict):
+        return types.MappingProxyType(
+            {key: freeze(value) for key, value in data.items()}
+        )
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(value) for value in data)
+    return data
+
+
+def take_snapshot(
+    pages: Sequence[Tuple[List[str], str, Callable]],
+    switch_menu: Callable[[List[str]], None],
+) -> AccountSnapshot:
+    """
+    按页面分组读取账户数据，每个菜单页只切换并刷新一次
+    :param pages: [(菜单路径, 字段名, 读取当前页面数据的函数)]，
+        菜单路径相同的字段在同一次刷新后读取
+    :param switch_menu: 切换到菜单路径对应页面并刷新数据的函数
+    :return: AccountSnapshot
+    """
+    groups: Dict[Tuple[str, ...], List[Tuple[str, Callable]]] = {}
+    for path, field, reader in pages:
+        groups.setdefault(tuple(path), []).append((field, reader))
+
+    started = time.time()
+    data = {}
+    for page, readers in groups.items():
+        switch_menu(list(page))
+        for field, reader in readers:
+            data[field] = freeze(reader())
+    return AccountSnapshot(timestamp=time.time(), started=started, **data)
+
+
+class AccountSnapshotCache:
+    """
+    缓存最近一次的账户快照
+
+    同时到达的多个读取请求只读取一次客户端，下单或撤单后调用 invalidate 使缓存失效
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(
+        self, load: Callable[[], AccountSnapshot], max_age: float = 0
+    ) -> AccountSnapshot:
+        """
+        :param load: 读取新快照的函数
+        :param max_age: 可以接受的快照最长时间，单位为秒，0 表示每次都重新读取
+        :return: AccountSnapshot
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and max_age > 0:
+                if snapshot.age <= max_age:
+                    return snapshot
+            snapshot = self._snapshot = load()
+            return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from .log import log
+
+
+class StrategyAssets:
+    """
+    按初始资产 × 组合净值计算的策略资金，由 NetValueRefresher 在后台更新
+
+    更新时整体替换 value 属性，修整调仓记录时直接读取，不需要加锁
+    """
+
+    def __init__(self, initial_assets, value):
+        """
+        :param initial_assets: 组合对应的初始资产
+        :param value: 当前的策略资金
+        """
+        self.initial_assets = initial_assets
+        self.value = value
+
+    def update(self, net_value):
+        self.value = self.initial_assets * net_value
+
+
+class NetValueRefresher:
+    """
+    定时批量查询全部组合的净值，更新对应的 StrategyAssets
+    """
+
+    def __init__(self, fetch_net_values, interval=600):
+        """
+        :param fetch_net_values: 批量查询净值的函数, 参数为组合代码列表, 返回 {组合代码: 净值}
+        :param interval: 刷新间隔，单位为秒
+        """
+        self.fetch_net_values = fetch_net_values
+        self.interval = interval
+        self._assets = {}
+        self._stopped = threading.Event()
+        self._worker = None
+
+    def add(self, code, assets):
+        """
+        :param code: 组合代码
+        :param assets: StrategyAssets 对象
+        """
+        self._assets[code] = assets
+
+    def refresh(self):
+        """
+        刷新一次全部组合的资金
+        :return: int 更新的组合数
+        """
+        assets = dict(self._assets)
+        if not assets:
+            return 0
+        try:
+            net_values = self.fetch_net_values(list(assets))
+        # pylint: disable=broad-except
+        except Exception as e:
+            log.warning("刷新组合净值失败, 继续使用上次的资金: %s", e)
+            return 0
+        updated = 0
+        for code, net_value in net_values.items():
+            if code not in assets:
+                continue
+            try:
+                net_value = float(net_value)
+            except (TypeError, ValueError):
+                log.warning("组合 %s 的净值无效: %s", code, net_value)
+                continue
+            if net_value <= 0:
+                log.warning("组合 %s 的净值无效: %s", code, net_value)
+                continue
+            assets[code].update(net_value)
+            updated += 1
+        log.debug("刷新组合净值完成, 更新 %s/%s 个组合", updated, len(assets))
+        return updated
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stopped.clear()
+        self._worker = threading.Thread(target=self._refresh_worker)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _refresh_worker(self):
+        # 启动时的净值可能来自缓存，先刷新一次
+        while True:
+            self.refresh()
+            if self._stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stopped.set()
+        self._worker = None
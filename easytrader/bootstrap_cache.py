@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+import time
+
+from .log import log
+
+
+class BootstrapCache:
+    """
+    保存在 json 文件中的策略启动信息缓存，类似策略名、组合净值
+
+    每条记录保存写入时间，超过 ttl 秒后失效，交易时段内重启时可以跳过对应的网络请求
+    """
+
+    def __init__(self, path, ttl=6 * 3600):
+        """
+        :param path: 缓存文件路径
+        :param ttl: 缓存有效时间，单位为秒
+        """
+        self.path = path
+        self.ttl = ttl
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except ValueError:
+            log.warning("策略启动信息缓存 %s 无法解析, 已忽略", self.path)
+            self._entries = {}
+
+    def get(self, kind, key):
+        """
+        :param kind: 缓存类别，类似 'name', 'net_value'
+        :param key: 策略 url 或 id
+        :return: 未过期的缓存值，不存在或已过期时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(kind, {}).get(key)
+        if entry is None:
+            return None
+        value, saved = entry
+        if time.time() - saved > self.ttl:
+            return None
+        return value
+
+    def set(self, kind, key, value):
+        with self._lock:
+            self._entries.setdefault(kind, {})[key] = [value, time.time()]
+            self._dirty = True
+
+    def save(self):
+        """有新的缓存值时写入文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            entries = {
+                kind: {
+                    key: entry
+                    for key, entry in values.items()
+                    if now - entry[1] <= self.ttl
+                }
+                for kind, values in self._entries.items()
+            }
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import abc
-import functools
 import os
 import sys
 import time
@@ -8,8 +7,10 @@ from typing import Type
 
 import easyutils
 
-from . import grid_strategies, helpers, pop_dialog_handler
+from . import account_snapshot, grid_strategies, helpers, pop_dialog_handler
 from .config import client
+from .control_registry import ControlRegistry
+from .log import log
 
 if not sys.platform.startswith("darwin"):
     import pywinauto
@@ -40,6 +41,10 @@ class IClientTrader(abc.ABC):
         """Wait for operation return"""
         pass
 
+    def wait_until(self, name: str, condition, timeout: float) -> bool:
+        """Wait until condition() is true or timeout"""
+        return helpers.wait_until(condition, timeout).ok
+
     @abc.abstractmethod
     def refresh(self):
         """Refresh data"""
@@ -49,11 +54,29 @@ class IClientTrader(abc.ABC):
 class ClientTrader(IClientTrader):
     # The strategy to use for getting grid data
     grid_strategy: Type[grid_strategies.IGridStrategy] = grid_strategies.Copy
+    # 是否缓存主窗口中的控件，关闭后每次操作都重新查找控件
+    cache_controls = True
+    # 停留在同一菜单页时，数据超过该时长才按 F5 刷新，单位为秒, 0 表示每次都刷新
+    menu_freshness = 1.0
+    # 条件等待时检查条件的间隔，单位为秒
+    wait_interval = 0.01
+    # snapshot() 默认可以使用的缓存快照的最长时间，单位为秒，0 表示每次都重新读取
+    snapshot_ttl = 0
 
     def __init__(self):
         self._config = client.create(self.broker_type)
         self._app = None
         self._main = None
+        self._controls = ControlRegistry(
+            lambda: self._main, enabled=self.cache_controls
+        )
+        # 左侧菜单树的 wrapper 对象，当前显示的菜单页及最后一次刷新的时间
+        self._left_menus = None
+        self._menu_path = None
+        self._menu_refreshed = 0.0
+        # 各条件等待最近一次实际等待的时间, 单位为秒
+        self.wait_durations = {}
+        self._snapshots = account_snapshot.AccountSnapshotCache()
 
     @property
     def app(self):
@@ -84,6 +107,8 @@ class ClientTrader(IClientTrader):
         )
         self._close_prompt_windows()
         self._main = self._app.top_window()
+        self._invalidate_menu()
+        self._snapshots.invalidate()
 
     @property
     def broker_type(self):
@@ -95,16 +120,26 @@ class ClientTrader(IClientTrader):
 
         return self._get_balance_from_statics()
 
+    def _get_balance_data(self):
+        """读取当前页面中的资金数据，调用前需要切换到 BALANCE_MENU_PATH"""
+        return self._get_balance_from_statics()
+
     def _get_balance_from_statics(self):
         result = {}
         for key, control_id in self._config.BALANCE_CONTROL_ID_GROUP.items():
             result[key] = float(
-                self._main.child_window(
-                    control_id=control_id, class_name="Static"
-                ).window_text()
+                self._control(control_id, "Static").window_text()
             )
         return result
 
+    def _control(self, control_id, class_name=None):
+        """
+        获取主窗口中的控件，查找过的控件会被缓存
+        :param control_id: 控件 id
+        :param class_name: 控件类名
+        """
+        return self._controls.get(control_id, class_name)
+
     @property
     def position(self):
         self._switch_left_menus(["查询[F4]", "资金股票"])
@@ -123,6 +158,35 @@ class ClientTrader(IClientTrader):
 
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
+    def snapshot(self, max_age=None):
+        """
+        一次读取资金、持仓、当日委托及当日成交，每个菜单页只切换并刷新一次,
+        资金和持仓在同一页面时从同一次刷新中读取
+        :param max_age: 可以接受的缓存快照的最长时间，单位为秒，默认为 snapshot_ttl,
+            0 表示重新读取，下单、撤单后缓存失效
+        :return: AccountSnapshot, 包含 timestamp, balance, position,
+            today_entrusts, today_trades, started
+        """
+        if max_age is None:
+            max_age = self.snapshot_ttl
+        return self._snapshots.get(self._take_snapshot, max_age)
+
+    def _take_snapshot(self):
+        config = self._config
+
+        def grid():
+            return self._get_grid_data(config.COMMON_GRID_CONTROL_ID)
+
+        return account_snapshot.take_snapshot(
+            [
+                (config.BALANCE_MENU_PATH, "balance", self._get_balance_data),
+                (config.POSITION_MENU_PATH, "position", grid),
+                (config.TODAY_ENTRUSTS_MENU_PATH, "today_entrusts", grid),
+                (config.TODAY_TRADES_MENU_PATH, "today_trades", grid),
+            ],
+            self._switch_left_menus,
+        )
+
     @property
     def cancel_entrusts(self):
         self.refresh()
@@ -203,9 +267,8 @@ class ClientTrader(IClientTrader):
 
     def _set_market_trade_type(self, ttype):
         """根据选择的市价交易类型选择对应的下拉选项"""
-        selects = self._main.child_window(
-            control_id=self._config.TRADE_MARKET_TYPE_CONTROL_ID,
-            class_name="ComboBox",
+        selects = self._control(
+            self._config.TRADE_MARKET_TYPE_CONTROL_ID, "ComboBox"
         )
         for i, text in selects.texts():
             # skip 0 index, because 0 index is current select index
@@ -254,11 +317,12 @@ class ClientTrader(IClientTrader):
             class_name="CVirtualGridCtrl",
         ).click(coords=(x, y))
 
-    def _is_exist_pop_dialog(self):
-        self.wait(0.2)  # wait dialog display
-        return (
-            self._main.wrapper_object()
-            != self._app.top_window().wrapper_object()
+    def _is_exist_pop_dialog(self, timeout=0.2):
+        return self.wait_until(
+            "pop_dialog",
+            lambda: self._main.wrapper_object()
+            != self._app.top_window().wrapper_object(),
+            timeout,
         )
 
     def _run_exe_path(self, exe_path):
@@ -267,15 +331,43 @@ class ClientTrader(IClientTrader):
     def wait(self, seconds):
         time.sleep(seconds)
 
+    def wait_until(self, name, condition, timeout):
+        """
+        每隔 wait_interval 秒检查一次 condition，满足条件后立即返回
+        :param name: 等待的名称，实际等待的时间记录在 wait_durations[name] 中
+        :param condition: 返回 bool 的函数
+        :param timeout: 最长等待时间，单位为秒
+        :return: bool 是否满足条件，超时返回 False
+        """
+        result = helpers.wait_until(condition, timeout, self.wait_interval)
+        self.wait_durations[name] = result.elapsed
+        log.debug(
+            "等待 %s %s, 耗时 %.3f 秒",
+            name,
+            "完成" if result.ok else "超时",
+            result.elapsed,
+        )
+        return result.ok
+
     def exit(self):
         self._app.kill()
 
     def _close_prompt_windows(self):
-        self.wait(1)
-        for window in self._app.windows(class_name="#32770"):
-            if window.window_text() != self._config.TITLE:
-                window.close()
-        self.wait(1)
+        self._invalidate_menu()
+        # 等待登录后的提示窗口弹出
+        self.wait_until("prompt_windows", self._prompt_windows, 1)
+        for window in self._prompt_windows():
+            window.close()
+        self.wait_until(
+            "prompt_windows_closed", lambda: not self._prompt_windows(), 1
+        )
+
+    def _prompt_windows(self):
+        return [
+            window
+            for window in self._app.windows(class_name="#32770")
+            if window.window_text() != self._config.TITLE
+        ]
 
     def trade(self, security, price, amount):
         self._set_trade_params(security, price, amount)
@@ -287,16 +379,15 @@ class ClientTrader(IClientTrader):
         )
 
     def _click(self, control_id):
+        # 按钮可能在弹窗等其他窗口中，不使用主窗口的控件缓存
         self._app.top_window().child_window(
             control_id=control_id, class_name="Button"
         ).click()
 
     def _submit_trade(self):
-        time.sleep(0.05)
-        self._main.child_window(
-            control_id=self._config.TRADE_SUBMIT_CONTROL_ID,
-            class_name="Button",
-        ).click()
+        button = self._control(self._config.TRADE_SUBMIT_CONTROL_ID, "Button")
+        self.wait_until("submit_enabled", button.is_enabled, 0.5)
+        button.click()
 
     def _get_pop_dialog_title(self):
         return (
@@ -308,10 +399,11 @@ class ClientTrader(IClientTrader):
     def _set_trade_params(self, security, price, amount):
         code = security[-6:]
 
+        # 清空价格，输入证券代码后客户端会自动填入当前价格，
+        # 不自动填入价格的客户端最多等待原来固定的 0.1 秒
+        self._type_keys(self._config.TRADE_PRICE_CONTROL_ID, "")
         self._type_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
-
-        # wait security input finish
-        self.wait(0.1)
+        self._wait_price_filled(0.1)
 
         self._type_keys(
             self._config.TRADE_PRICE_CONTROL_ID,
@@ -324,30 +416,68 @@ class ClientTrader(IClientTrader):
 
         self._type_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
 
-        # wait security input finish
+        # 市价委托页面不一定有价格输入框，没有可以判断的条件, 仍然等待固定的时间
         self.wait(0.1)
 
         self._type_keys(self._config.TRADE_AMOUNT_CONTROL_ID, str(int(amount)))
 
+    def _wait_price_filled(self, timeout):
+        """等待证券代码输入完成，客户端自动填入价格"""
+        price = self._control(self._config.TRADE_PRICE_CONTROL_ID, "Edit")
+        return self.wait_until(
+            "price_filled", lambda: price.window_text().strip(), timeout
+        )
+
     def _get_grid_data(self, control_id):
         return self.grid_strategy(self).get(control_id)
 
     def _type_keys(self, control_id, text):
-        self._main.child_window(
-            control_id=control_id, class_name="Edit"
-        ).set_edit_text(text)
+        self._control(control_id, "Edit").set_edit_text(text)
 
     def _switch_left_menus(self, path, sleep=0.2):
-        self._get_left_menus_handle().get_item(path).click()
+        """
+        切换到左侧菜单对应的页面并刷新数据，已经在该页面且数据未超过 menu_freshness 时跳过
+        :param path: 菜单路径，类似 ["查询[F4]", "资金股票"]
+        :param sleep: 刷新后等待数据加载的时间，单位为秒
+        """
+        path = list(path)
+        if path == self._menu_path and self._is_menu_selected(path):
+            if time.time() - self._menu_refreshed <= self.menu_freshness:
+                return
+        else:
+            self._get_left_menus_handle().get_item(path).click()
+        self._menu_path = path
+        self._menu_refreshed = time.time()
         self._app.top_window().type_keys('{F5}')
         self.wait(sleep)
 
+    def _is_menu_selected(self, path):
+        # 防止菜单被手动或其他程序切换
+        try:
+            return self._get_left_menus_handle().get_item(path).is_selected()
+        # pylint: disable=broad-except
+        except Exception:
+            return False
+
+    def _invalidate_menu(self):
+        """界面可能被切换或重新连接后调用，下次切换菜单时重新查找菜单树、点击并刷新"""
+        self._menu_path = None
+        self._left_menus = None
+
     def _switch_left_menus_by_shortcut(self, shortcut, sleep=0.5):
+        self._invalidate_menu()
         self._app.top_window().type_keys(shortcut)
         self.wait(sleep)
 
-    @functools.lru_cache()
     def _get_left_menus_handle(self):
+        # 菜单树被重绘或销毁后重新查找
+        if self._left_menus is None or not ControlRegistry.is_valid(
+            self._left_menus
+        ):
+            self._left_menus = self._find_left_menus_handle()
+        return self._left_menus
+
+    def _find_left_menus_handle(self):
         while True:
             try:
                 handle = self._main.child_window(
@@ -355,7 +485,7 @@ class ClientTrader(IClientTrader):
                 )
                 # sometime can't find handle ready, must retry
                 handle.wait("ready", 2)
-                return handle
+                return handle.wrapper_object()
             # pylint: disable=broad-except
             except Exception:
                 pass
@@ -372,19 +502,31 @@ class ClientTrader(IClientTrader):
         ).double_click(coords=(x, y))
 
     def refresh(self):
+        self._invalidate_menu()
         self._switch_left_menus(["买入[F1]"], sleep=0.05)
 
     def _handle_pop_dialogs(
         self, handler_class=pop_dialog_handler.PopDialogHandler
     ):
+        # 下单、撤单及申购后账户数据发生变化
+        self._snapshots.invalidate()
         handler = handler_class(self._app)
 
         while self._is_exist_pop_dialog():
+            dialog = self._app.top_window().wrapper_object()
             title = self._get_pop_dialog_title()
 
             result = handler.handle(title)
+            if handler.closed_unknown_dialog:
+                self._invalidate_menu()
             if result:
                 return result
+            # 等待当前弹窗关闭后再检查下一个弹窗，防止重复处理正在关闭的弹窗
+            self.wait_until(
+                "pop_dialog_closed",
+                lambda: self._app.top_window().wrapper_object() != dialog,
+                1,
+            )
         return {"message": "success"}
 
 
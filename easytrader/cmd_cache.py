@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+from .log import log
+
+
+class CmdJournal:
+    """
+    追加写入的已执行指令日志，每条指令一行
+
+    写入时只追加一行并 flush 到系统缓存，进程崩溃不会丢失已写入的记录;
+    fsync 由后台线程按 fsync_interval 批量执行，避免每条指令都等待磁盘。
+    写入中途崩溃最多留下不完整的最后一行，回放时会被忽略。
+    日志中的无效记录超过一定比例后在后台线程中压缩重写
+    """
+
+    def __init__(
+        self,
+        path,
+        fsync_interval=1.0,
+        compact_ratio=4,
+        compact_min_records=10000,
+    ):
+        """
+        :param path: 日志文件路径
+        :param fsync_interval: 批量 fsync 的间隔，单位为秒
+        :param compact_ratio: 日志记录数超过有效记录数的倍数时触发压缩
+        :param compact_min_records: 日志记录数小于该值时不触发压缩
+        """
+        self.path = path
+        self._fsync_interval = fsync_interval
+        self._compact_ratio = compact_ratio
+        self._compact_min_records = compact_min_records
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._records = 0
+        self._dirty = False
+        self._closed = threading.Event()
+        self._flusher = None
+        self._compacting = False
+        self._appended_during_compaction = None
+
+    def replay(self):
+        """
+        读取日志中的全部记录
+        :return: [] 记录列表
+        """
+        keys = []
+        if not os.path.exists(self.path):
+            return keys
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    log.warning("指令日志 %s 最后一行不完整, 已忽略", self.path)
+                    break
+                try:
+                    keys.append(json.loads(line))
+                except ValueError:
+                    log.warning("指令日志 %s 存在无法解析的记录, 已忽略: %s", self.path, line)
+        self._records = len(keys)
+        return keys
+
+    def open(self, truncate=False):
+        """
+        打开日志准备追加写入
+        :param truncate: 是否清空已有记录
+        """
+        with self._lock:
+            if self._file is not None:
+                return
+            if truncate:
+                self._records = 0
+            self._file = self._open_file(truncate)
+            self._closed.clear()
+            self._flusher = threading.Thread(target=self._flush_worker)
+            self._flusher.daemon = True
+            self._flusher.start()
+
+    def _open_file(self, truncate=False):
+        f = open(self.path, "w" if truncate else "a", encoding="utf-8")
+        # 截断最后一行不完整的记录，保证新记录从新的一行开始
+        if not truncate and f.tell() > 0:
+            with open(self.path, "rb") as r:
+                r.seek(-1, os.SEEK_END)
+                if r.read(1) != b"\n":
+                    f.write("\n")
+        return f
+
+    def append(self, key, live_count=None):
+        """
+        追加一条记录
+        :param key: 记录内容
+        :param live_count: 当前有效记录数，用于判断是否需要压缩
+        """
+        line = json.dumps(key, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._records += 1
+            self._dirty = True
+            if self._appended_during_compaction is not None:
+                self._appended_during_compaction.append(line)
+        return self._need_compact(live_count)
+
+    def _need_compact(self, live_count):
+        if live_count is None or self._compacting:
+            return False
+        return (
+            self._records >= self._compact_min_records
+            and self._records > live_count * self._compact_ratio
+        )
+
+    def compact_in_background(self, live_keys_getter):
+        """
+        在后台线程中压缩日志
+        :param live_keys_getter: 返回当前有效记录集合的函数
+        """
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        worker = threading.Thread(target=self.compact, args=[live_keys_getter])
+        worker.daemon = True
+        worker.start()
+
+    def compact(self, live_keys_getter):
+        """
+        用当前有效记录重写日志，重写期间新追加的记录会在替换前补写到新文件
+        :param live_keys_getter: 返回当前有效记录集合的函数
+        """
+        with self._lock:
+            self._compacting = True
+            self._appended_during_compaction = []
+        tmp_path = self.path + ".tmp"
+        try:
+            live_keys = live_keys_getter()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key in live_keys:
+                    f.write(json.dumps(key, ensure_ascii=False) + "\n")
+                with self._lock:
+                    pending = self._appended_during_compaction
+                    for line in pending:
+                        f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    reopen = self._file is not None
+                    if reopen:
+                        self._file.close()
+                    os.replace(tmp_path, self.path)
+                    if reopen:
+                        self._file = open(self.path, "a", encoding="utf-8")
+                    self._records = len(live_keys) + len(pending)
+                    self._dirty = False
+            log.info("指令日志 %s 压缩完成, 剩余记录 %s 条", self.path, self._records)
+        # pylint: disable=broad-except
+        except Exception as e:
+            log.exception("指令日志 %s 压缩失败: %s", self.path, e)
+        finally:
+            with self._lock:
+                self._appended_during_compaction = None
+                self._compacting = False
+
+    def sync(self):
+        """将已写入的记录 fsync 到磁盘"""
+        with self._lock:
+            if self._file is None or not self._dirty:
+                return
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def _flush_worker(self):
+        while not self._closed.wait(self._fsync_interval):
+            try:
+                self.sync()
+            # pylint: disable=broad-except
+            except Exception as e:
+                log.warning("指令日志 %s fsync 失败: %s", self.path, e)
+
+    def close(self):
+        self._closed.set()
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ExpiredCmdIndex:
+    """
+    按信号日期分桶的已执行指令索引
+
+    指令 key 只保存固定长度的摘要。信号日期早于 horizon 的桶会被整桶淘汰，
+    这些指令已经超过过期时间，不可能再被执行，is_beyond_horizon 会直接将其视为已执行
+    """
+
+    DIGEST_SIZE = 16
+    # 是否自行持久化，为 False 时由 follower 写入指令日志
+    durable = False
+    DATE_FORMAT = "%Y-%m-%d"
+
+    def __init__(self, horizon=None):
+        """
+        :param horizon: 指令保留时长，单位为秒，None 表示不淘汰
+        """
+        self.horizon = horizon
+        self.clock = datetime.datetime.now
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def digest(cls, key):
+        return hashlib.blake2b(
+            key.encode("utf-8"), digest_size=cls.DIGEST_SIZE
+        ).digest()
+
+    def _cutoff(self, now=None):
+        if self.horizon is None:
+            return None
+        now = now or self.clock()
+        return now - datetime.timedelta(seconds=self.horizon)
+
+    def is_beyond_horizon(self, signal_datetime, now=None):
+        cutoff = self._cutoff(now)
+        return cutoff is not None and signal_datetime < cutoff
+
+    def contains(self, key, signal_datetime):
+        bucket = self._buckets.get(signal_datetime.date())
+        return bucket is not None and self.digest(key) in bucket
+
+    def add(self, key, signal_datetime):
+        """
+        添加指令
+        :param key: 指令 key
+        :param signal_datetime: 信号产生时间
+        :return: [信号日期, 摘要] 用于写入指令日志的记录
+        """
+        digest = self.digest(key)
+        self._add_digest(signal_datetime.date(), digest)
+        return [signal_datetime.strftime(self.DATE_FORMAT), digest.hex()]
+
+    def add_record(self, record):
+        """
+        添加指令日志中的记录
+        :param record: add 返回的记录，或旧版本保存的完整指令 key
+        """
+        if isinstance(record, str):
+            self._add_digest(self._date_from_key(record), self.digest(record))
+            return
+        date_str, digest_hex = record
+        date = datetime.datetime.strptime(date_str, self.DATE_FORMAT).date()
+        self._add_digest(date, bytes.fromhex(digest_hex))
+
+    def _add_digest(self, date, digest):
+        with self._lock:
+            bucket = self._buckets.get(date)
+            if bucket is None:
+                bucket = self._buckets[date] = set()
+                self._evict_locked()
+            bucket.add(digest)
+
+    @classmethod
+    def _date_from_key(cls, key):
+        # 旧版本 key 以 str(datetime) 结尾, 类似 xxx_2019-01-02 10:00:00
+        try:
+            return datetime.datetime.strptime(
+                key.rsplit("_", 1)[-1][:10], cls.DATE_FORMAT
+            ).date()
+        except ValueError:
+            return datetime.date.today()
+
+    def evict(self, now=None):
+        """
+        淘汰超过 horizon 的日期桶
+        :return: 淘汰的指令数
+        """
+        with self._lock:
+            return self._evict_locked(now)
+
+    def _evict_locked(self, now=None):
+        cutoff = self._cutoff(now)
+        if cutoff is None:
+            return 0
+        expired_dates = [d for d in self._buckets if d < cutoff.date()]
+        evicted = 0
+        for date in expired_dates:
+            evicted += len(self._buckets.pop(date))
+        return evicted
+
+    def records(self):
+        """:return: [[信号日期, 摘要]] 当前全部记录"""
+        with self._lock:
+            return [
+                [date.strftime(self.DATE_FORMAT), digest.hex()]
+                for date, bucket in self._buckets.items()
+                for digest in bucket
+            ]
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in list(self._buckets.values()))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+
+class ControlRegistry:
+    """
+    缓存窗口中控件的 wrapper 对象，避免每次操作都通过 child_window 重新查找控件
+
+    使用缓存前检查控件是否仍然可见，控件被销毁或切换页面后被隐藏时重新查找
+    """
+
+    def __init__(self, window_getter, enabled=True):
+        """
+        :param window_getter: 返回控件所在窗口的函数，窗口变化时清空缓存
+        :param enabled: 是否缓存，关闭后每次都重新查找控件
+        """
+        self._window_getter = window_getter
+        self.enabled = enabled
+        self._window = None
+        self._controls = {}
+        self.resolve_count = 0
+
+    def get(self, control_id, class_name=None):
+        """
+        :param control_id: 控件 id
+        :param class_name: 控件类名
+        :return: 控件的 wrapper 对象
+        """
+        window = self._window_getter()
+        if not self.enabled:
+            return self._resolve(window, control_id, class_name)
+        if window is not self._window:
+            self._controls.clear()
+            self._window = window
+
+        key = (control_id, class_name)
+        control = self._controls.get(key)
+        if control is None or not self.is_valid(control):
+            control = self._controls[key] = self._resolve(
+                window, control_id, class_name
+            )
+        return control
+
+    def _resolve(self, window, control_id, class_name):
+        self.resolve_count += 1
+        criteria = {"control_id": control_id}
+        if class_name is not None:
+            criteria["class_name"] = class_name
+        return window.child_window(**criteria).wrapper_object()
+
+    @staticmethod
+    def is_valid(control):
+        """:return: 控件是否仍然存在并且可见"""
+        try:
+            return control.is_visible()
+        # 控件已被销毁
+        # pylint: disable=broad-except
+        except Exception:
+            return False
+
+    def invalidate(self):
+        self._controls.clear()
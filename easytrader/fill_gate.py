@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from .log import log
+
+
+class PendingSell:
+    def __init__(self, strategies, entrust_no, amount):
+        self.strategies = strategies
+        self.entrust_no = entrust_no
+        self.amount = amount
+        self.sent = time.time()
+
+
+class SellFillGate:
+    """
+    买入指令等待同一策略已下单的卖出指令成交后再下单
+
+    卖出下单成功后记录委托编号，买入前轮询账户的当日成交(或当日委托)，
+    同一账户中同一策略的卖出全部成交，或等待超过 timeout 秒后再买入。
+    合并后的指令策略名为 '策略1+策略2'，与其中任一策略相同即视为同一策略
+    """
+
+    ENTRUST_NO_FIELDS = ("合同编号", "委托编号", "contract_no", "entrust_no")
+    FILLED_AMOUNT_FIELDS = ("成交数量", "tx_shares", "business_amount")
+
+    def __init__(self, timeout=30, poll_interval=0.5, query="today_trades"):
+        """
+        :param timeout: 买入等待卖出成交的最长时间，单位为秒，超时后直接买入
+        :param poll_interval: 查询成交的间隔，单位为秒
+        :param query: 查询成交使用的账户属性, 'today_trades' 或 'today_entrusts'
+        """
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.query = query
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _strategies(trade_cmd):
+        return set(str(trade_cmd["strategy"]).split("+"))
+
+    def register_sell(self, account, trade_cmd, response):
+        """
+        记录下单成功的卖出指令
+        :param account: 账户名
+        :param trade_cmd: 交易指令
+        :param response: 下单接口的返回, 类似 {'entrust_no': '委托单号'}
+        """
+        entrust_no = None
+        if isinstance(response, dict):
+            entrust_no = response.get("entrust_no")
+        if entrust_no is None:
+            log.warning(
+                "%s 卖出 %s 的返回中没有委托编号, 买入时将等待 %s 秒",
+                account,
+                trade_cmd["stock_code"],
+                self.timeout,
+            )
+        now = time.time()
+        with self._lock:
+            # 超时的卖出不会再被等待
+            pending = [
+                p
+                for p in self._pending.get(account, [])
+                if now - p.sent < self.timeout
+            ]
+            pending.append(
+                PendingSell(
+                    self._strategies(trade_cmd),
+                    str(entrust_no) if entrust_no is not None else None,
+                    trade_cmd["amount"],
+                )
+            )
+            self._pending[account] = pending
+
+    def _filled_amounts(self, user):
+        filled = {}
+        for row in getattr(user, self.query):
+            entrust_no = next(
+                (row[f] for f in self.ENTRUST_NO_FIELDS if f in row), None
+            )
+            amount = next(
+                (row[f] for f in self.FILLED_AMOUNT_FIELDS if f in row), 0
+            )
+            if entrust_no is None:
+                continue
+            try:
+                amount = float(amount)
+            except (TypeError, ValueError):
+                continue
+            entrust_no = str(entrust_no)
+            filled[entrust_no] = filled.get(entrust_no, 0) + amount
+        return filled
+
+    def wait_for_sells(self, account, user, trade_cmd):
+        """
+        等待买入指令依赖的卖出指令成交
+        :param account: 账户名
+        :param user: 账户对象
+        :param trade_cmd: 买入指令
+        :return: bool 依赖的卖出是否全部成交，超时返回 False
+        """
+        strategies = self._strategies(trade_cmd)
+        with self._lock:
+            depends = [
+                p
+                for p in self._pending.get(account, [])
+                if p.strategies & strategies
+            ]
+        if not depends:
+            return True
+
+        start = time.time()
+        while True:
+            if any(p.entrust_no is not None for p in depends):
+                try:
+                    filled = self._filled_amounts(user)
+                # pylint: disable=broad-except
+                except Exception as e:
+                    log.warning("%s 查询成交失败: %s", account, e)
+                    filled = {}
+                depends = [
+                    p
+                    for p in depends
+                    if p.entrust_no is None
+                    or filled.get(p.entrust_no, 0) < p.amount
+                ]
+            if not depends:
+                self._remove(account, strategies)
+                log.info(
+                    "%s 策略 [%s] 卖出已全部成交, 等待 %.3f 秒后买入 %s",
+                    account,
+                    trade_cmd["strategy_name"],
+                    time.time() - start,
+                    trade_cmd["stock_code"],
+                )
+                return True
+            if time.time() - start >= self.timeout:
+                self._remove(account, strategies)
+                log.warning(
+                    "%s 策略 [%s] 等待卖出成交超过 %s 秒, 未成交委托: %s, 直接买入 %s",
+                    account,
+                    trade_cmd["strategy_name"],
+                    self.timeout,
+                    [p.entrust_no for p in depends],
+                    trade_cmd["stock_code"],
+                )
+                return False
+            time.sleep(self.poll_interval)
+
+    def _remove(self, account, strategies):
+        with self._lock:
+            self._pending[account] = [
+                p
+                for p in self._pending.get(account, [])
+                if not p.strategies & strategies
+            ]
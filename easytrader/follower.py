@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import abc
+import concurrent.futures
 import datetime
+import hashlib
 import os
 import pickle
 import queue
@@ -10,9 +12,23 @@ import time
 from typing import List
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from . import exceptions
+from .bootstrap_cache import BootstrapCache
+from .cmd_cache import CmdJournal, ExpiredCmdIndex
+from .fill_gate import SellFillGate
+from .latency import LatencyRecorder
 from .log import log
+from .order_netting import OrderNetter
+from .poll_scheduler import FixedIntervalScheduler, PollState
+from .polling_engine import AsyncPollingEngine
+from .rate_limiter import AccountRateLimiter
+from .history_record import HistoryRecorder
+from .sharding import SharedCmdStore, StrategyShardPool
+from .trade_dispatcher import AccountDispatcher
+from .trade_queue import TradeCmdQueue
+from .trade_store import TradeCmdStore
 
 
 class BaseFollower(metaclass=abc.ABCMeta):
@@ -23,18 +39,54 @@ class BaseFollower(metaclass=abc.ABCMeta):
     LOGIN_PAGE = ""
     LOGIN_API = ""
     TRANSACTION_API = ""
-    CMD_CACHE_FILE = "cmd_cache.pk"
+    CMD_CACHE_FILE = "cmd_cache.journal"
+    # 旧版本使用 pickle 整体保存的指令缓存，加载时自动迁移到 CMD_CACHE_FILE
+    LEGACY_CMD_CACHE_FILE = "cmd_cache.pk"
+    # 多进程跟踪策略时各进程共享的已执行指令库
+    SHARED_CMD_CACHE_FILE = "cmd_cache.db"
+    # 策略名、组合净值等启动信息的缓存
+    BOOTSTRAP_CACHE_FILE = "bootstrap_cache.json"
     WEB_REFERER = ""
     WEB_ORIGIN = ""
+    POLLING_ENGINES = ("thread", "asyncio")
+    # 交易线程空闲时检查是否需要退出的间隔，单位为秒
+    TRADER_STOP_CHECK_INTERVAL = 0.1
 
     def __init__(self):
-        self.trade_queue = queue.Queue()
-        self.expired_cmds = set()
+        self.trade_queue = TradeCmdQueue()
+        self.expired_cmds = ExpiredCmdIndex()
+        self._cmd_journal = None
+        self._cmd_journal_lock = threading.Lock()
+        # 策略 -> (调仓记录摘要, ETag, Last-Modified)，用于跳过未变化的调仓记录
+        self._history_fingerprints = {}
+        # 策略 -> 已处理到的调仓记录位置，用于只修整新的调仓记录
+        self._history_progress = {}
 
         self.s = requests.Session()
         self.s.verify = False
 
         self.slippage: float = 0.0
+        self._polling_engine = "thread"
+        self._max_concurrency = 16
+        self._parallel_dispatch = False
+        self._dispatcher = AccountDispatcher()
+        self._trader_thread = None
+        self._trader_stopped = threading.Event()
+        self._poll_scheduler = None
+        self._order_netter = None
+        self._fill_gate = None
+        self._rate_limiter = None
+        self.trade_store = None
+        self.latency = LatencyRecorder()
+        self.clock = datetime.datetime.now
+        # 回放时替代调仓接口的数据源，见 replay.ReplaySource
+        self.history_source = None
+        self.history_recorder = None
+        self._shard_pool = None
+        self._bootstrap_concurrency = 8
+        self._bootstrap_cache = None
+        # 分片进程中发送交易指令到主进程的队列
+        self.cmd_sink = None
 
     def login(self, user=None, password=None, **kwargs):
         """
@@ -94,6 +146,24 @@ class BaseFollower(metaclass=abc.ABCMeta):
         trade_cmd_expire_seconds=120,
         cmd_cache=True,
         slippage: float = 0.0,
+        polling_engine="thread",
+        max_concurrency=16,
+        cmd_cache_horizon=None,
+        parallel_dispatch=False,
+        poll_scheduler=None,
+        netting_window=None,
+        metrics_sink=None,
+        latency_log_interval=None,
+        record_history=None,
+        history_source=None,
+        wait_sell_fill=False,
+        sell_fill_timeout=30,
+        rate_limits=None,
+        trade_cmd_store=None,
+        strategy_processes=None,
+        bootstrap_concurrency=8,
+        bootstrap_cache=True,
+        bootstrap_cache_ttl=6 * 3600,
         **kwargs
     ):
         """跟踪平台对应的模拟交易，支持多用户多策略
@@ -109,8 +179,114 @@ class BaseFollower(metaclass=abc.ABCMeta):
         :param trade_cmd_expire_seconds: 交易指令过期时间, 单位为秒
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param slippage: 滑点，0.0 表示无滑点, 0.05 表示滑点为 5%
+        :param cmd_cache_horizon: 历史指令的保留时长，单位为秒，默认为 trade_cmd_expire_seconds。
+            信号产生时间超过该时长的指令不会再被执行，也不再保存
+        :param polling_engine: 策略轮询方式, 'thread' 为每个策略一个线程,
+            'asyncio' 为所有策略共用一个事件循环, 适合跟踪大量策略
+        :param max_concurrency: polling_engine 为 'asyncio' 时同时查询策略的最大并发数
+        :param parallel_dispatch: 是否将交易指令同时分发给所有 users，每个 user 串行执行自己的指令，
+            开启后 send_interval 作用于单个 user 的相邻两条指令之间
+        :param poll_scheduler: 决定策略轮询间隔的对象，类似 poll_scheduler.TradingSessionScheduler,
+            默认按 track_interval 固定间隔轮询
+        :param netting_window: 合并不同策略对同一股票交易指令的时间窗口，单位为秒,
+            窗口内的买卖指令合并为一条净额指令后再下单, 默认为 None 不合并
+        :param metrics_sink: 接收各阶段耗时的对象，需要实现 latency.MetricsSink 的 observe 方法
+        :param latency_log_interval: 输出各阶段耗时统计日志的间隔，单位为秒, 默认为 None 不输出
+        :param record_history: 保存调仓接口原始返回的文件路径, 用于 replay.ReplayHarness 回放,
+            默认为 None 不保存
+        :param history_source: 调仓记录的数据源，类似 shared_poller.SharedPollerSource,
+            设置后不再直接查询平台的调仓接口
+        :param wait_sell_fill: 买入前是否等待同一策略已下单的卖出成交，通过轮询账户的 today_trades 确认,
+            可以代替 send_interval 固定的等待时间, 需要同时开启 parallel_dispatch
+        :param sell_fill_timeout: 买入等待卖出成交的最长时间，单位为秒，超时后直接买入
+        :param rate_limits: 按账户限制下单频率, 格式 {账户名或账户类名: (每秒次数, 连续次数)},
+            类似 {'XueQiuTrader': (0.5, 2), '*': (5, 10)}，见 rate_limiter.AccountRateLimiter,
+            需要同时开启 parallel_dispatch
+        :param trade_cmd_store: 保存交易队列中指令状态的 SQLite 文件路径, 类似 'trade_cmds.db',
+            重启时恢复未过期且未执行完的指令，默认为 None 不保存
+        :param strategy_processes: 轮询及修整策略调仓的进程数, 大于 1 时策略平均分配到多个进程中,
+            交易指令发送回当前进程下单, 已执行指令保存在各进程共享的 SHARED_CMD_CACHE_FILE 中,
+            适合跟踪大量策略，不支持 record_history 及 history_source，默认为 None 在当前进程中跟踪
+        :param bootstrap_concurrency: 启动时同时获取策略名、组合净值等信息的最大线程数
+        :param bootstrap_cache: 是否将策略名、组合净值等启动信息缓存到 BOOTSTRAP_CACHE_FILE,
+            有效期内重启时不再重新获取
+        :param bootstrap_cache_ttl: 启动信息缓存的有效时间，单位为秒
         """
+        if polling_engine not in self.POLLING_ENGINES:
+            raise ValueError(
+                "不支持的 polling_engine: {}, 可选 {}".format(
+                    polling_engine, self.POLLING_ENGINES
+                )
+            )
+        if wait_sell_fill and not parallel_dispatch:
+            # 串行下单时等待会阻塞所有账户及其他策略的指令
+            raise ValueError("wait_sell_fill 需要同时开启 parallel_dispatch")
+        if rate_limits and not parallel_dispatch:
+            # 串行下单时受限账户的等待会拖慢其他账户
+            raise ValueError("rate_limits 需要同时开启 parallel_dispatch")
+        sharded = strategy_processes and strategy_processes > 1
+        if sharded and (record_history or history_source is not None):
+            # 分片进程直接查询平台的调仓接口，也不保存原始返回
+            raise ValueError(
+                "record_history 及 history_source 不支持 strategy_processes"
+            )
         self.slippage = slippage
+        if sharded:
+            store = SharedCmdStore(self.SHARED_CMD_CACHE_FILE)
+            store.clock = self.expired_cmds.clock
+            if not cmd_cache:
+                store.clear()
+            self.expired_cmds = store
+            self._shard_pool = StrategyShardPool(self, strategy_processes)
+        self.expired_cmds.horizon = (
+            trade_cmd_expire_seconds
+            if cmd_cache_horizon is None
+            else cmd_cache_horizon
+        )
+        self._polling_engine = polling_engine
+        self._max_concurrency = max_concurrency
+        self._parallel_dispatch = parallel_dispatch
+        self._poll_scheduler = poll_scheduler
+        self._bootstrap_concurrency = bootstrap_concurrency
+        if bootstrap_cache:
+            self._bootstrap_cache = BootstrapCache(
+                self.BOOTSTRAP_CACHE_FILE, ttl=bootstrap_cache_ttl
+            )
+        self.latency.sink = metrics_sink
+        if latency_log_interval:
+            self.latency.start_periodic_log(latency_log_interval)
+        if record_history:
+            self.history_recorder = HistoryRecorder(record_history)
+        if history_source is not None:
+            self.history_source = history_source
+        if wait_sell_fill:
+            self._fill_gate = SellFillGate(timeout=sell_fill_timeout)
+        if rate_limits:
+            self._rate_limiter = AccountRateLimiter(rate_limits)
+        if trade_cmd_store:
+            self.trade_store = TradeCmdStore(trade_cmd_store)
+            self.trade_queue.store = self.trade_store
+        if netting_window:
+            self._order_netter = OrderNetter(
+                self.trade_queue, window=netting_window
+            )
+            self._order_netter.store = self.trade_store
+        if polling_engine == "asyncio":
+            # 所有策略共用 self.s, 连接池大小需要与并发数一致，否则多余的连接会被丢弃重建
+            adapter = HTTPAdapter(
+                pool_connections=max_concurrency, pool_maxsize=max_concurrency
+            )
+            self.s.mount("https://", adapter)
+            self.s.mount("http://", adapter)
+
+    def set_clock(self, clock):
+        """
+        设置获取当前时间的函数，回放历史调仓记录时用于模拟时间
+        :param clock: 返回 datetime.datetime 的函数
+        """
+        self.clock = clock
+        self.trade_queue.clock = clock
+        self.expired_cmds.clock = clock
 
     def _calculate_price_by_slippage(self, action: str, price: float) -> float:
         """
@@ -126,9 +302,32 @@ class BaseFollower(metaclass=abc.ABCMeta):
         return price
 
     def load_expired_cmd_cache(self):
-        if os.path.exists(self.CMD_CACHE_FILE):
-            with open(self.CMD_CACHE_FILE, "rb") as f:
-                self.expired_cmds = pickle.load(f)
+        journal = CmdJournal(self.CMD_CACHE_FILE)
+        records = journal.replay()
+        need_compact = False
+        if not os.path.exists(self.CMD_CACHE_FILE) and os.path.exists(
+            self.LEGACY_CMD_CACHE_FILE
+        ):
+            with open(self.LEGACY_CMD_CACHE_FILE, "rb") as f:
+                records = pickle.load(f)
+            log.info(
+                "迁移指令缓存 %s 到 %s",
+                self.LEGACY_CMD_CACHE_FILE,
+                self.CMD_CACHE_FILE,
+            )
+            need_compact = True
+        for record in records:
+            if isinstance(record, str):
+                need_compact = True
+            self.expired_cmds.add_record(record)
+        if self.expired_cmds.durable:
+            # 历史指令已导入共享指令库，不再写入指令日志
+            self.expired_cmds.evict()
+            return
+        if self.expired_cmds.evict() or need_compact:
+            journal.compact(self.expired_cmds.records)
+        journal.open()
+        self._cmd_journal = journal
 
     def start_trader_thread(
         self,
@@ -137,6 +336,9 @@ class BaseFollower(metaclass=abc.ABCMeta):
         entrust_prop="limit",
         send_interval=0,
     ):
+        self.trade_queue.expire_seconds = trade_cmd_expire_seconds
+        if self.trade_store is not None:
+            self.resume_trade_cmds(users, trade_cmd_expire_seconds)
         trader = threading.Thread(
             target=self.trade_worker,
             args=[users],
@@ -147,8 +349,63 @@ class BaseFollower(metaclass=abc.ABCMeta):
             },
         )
         trader.setDaemon(True)
+        self._trader_stopped.clear()
+        self._trader_thread = trader
         trader.start()
 
+    def stop_trader_thread(self, timeout=None):
+        """
+        停止 start_trader_thread 启动的交易线程及各账户的执行通道,
+        交易队列中剩余的指令不再执行
+        :param timeout: 等待交易线程退出的最长时间，单位为秒
+        """
+        self._trader_stopped.set()
+        trader, self._trader_thread = self._trader_thread, None
+        if trader is not None:
+            trader.join(timeout)
+        self._dispatcher.shutdown()
+
+    def resume_trade_cmds(self, users, expire_seconds):
+        """
+        将上次退出时未执行完的指令重新放入交易队列，只发送给还没有下单的账户
+        :param users: 账户列表
+        :param expire_seconds: 交易指令过期时间, 单位为秒
+        """
+        accounts = [
+            self._dispatcher.account_name(user, index)
+            for index, user in enumerate(users)
+        ]
+        now = self.clock()
+        for trade_cmd, todo, unknown in self.trade_store.pending(accounts):
+            if unknown:
+                log.warning(
+                    "策略 [%s] 指令(股票: %s 动作: %s 数量: %s) 在账户 %s 已发送但没有返回结果, 不会重新下单, 请确认是否已经委托",
+                    trade_cmd["strategy_name"],
+                    trade_cmd["stock_code"],
+                    trade_cmd["action"],
+                    trade_cmd["amount"],
+                    sorted(unknown),
+                )
+            if not todo:
+                self.trade_store.set_state(trade_cmd, "done")
+                continue
+            if (now - trade_cmd["datetime"]).total_seconds() > expire_seconds:
+                self.trade_store.set_state(trade_cmd, "expired")
+                continue
+            trade_cmd.pop("timestamps", None)
+            trade_cmd["skip_accounts"] = sorted(set(accounts) - todo)
+            log.info(
+                "恢复策略 [%s] 未执行完的指令, 股票: %s 动作: %s 数量: %s 价格: %s 信号产生时间: %s, 下单账户: %s",
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+                sorted(todo),
+            )
+            self.trade_queue.put(trade_cmd)
+
     @staticmethod
     def warp_list(value):
         if not isinstance(value, list):
@@ -172,51 +429,171 @@ class BaseFollower(metaclass=abc.ABCMeta):
         """
         pass
 
+    def bootstrap_strategies(self, strategies, bootstrap):
+        """
+        启动跟踪前并发获取各策略的信息，并发数由 bootstrap_concurrency 限制
+        :param strategies: 策略列表
+        :param bootstrap: 获取单个策略信息的函数，任一策略失败时抛出异常
+        :return: [] 与 strategies 顺序一致的 bootstrap 结果
+        """
+        try:
+            if self._bootstrap_concurrency <= 1 or len(strategies) <= 1:
+                return [bootstrap(strategy) for strategy in strategies]
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._bootstrap_concurrency
+            ) as pool:
+                return list(pool.map(bootstrap, strategies))
+        finally:
+            if self._bootstrap_cache is not None:
+                self._bootstrap_cache.save()
+
+    def cached_bootstrap_value(self, kind, key, fetch):
+        """
+        优先从启动信息缓存中获取，未缓存或已过期时调用 fetch(key) 并保存结果
+        :param kind: 缓存类别，类似 'name', 'net_value'
+        :param key: 策略 url 或 id
+        :param fetch: 获取信息的函数
+        """
+        cache = self._bootstrap_cache
+        if cache is None:
+            return fetch(key)
+        value = cache.get(kind, key)
+        if value is None:
+            value = fetch(key)
+            cache.set(kind, key, value)
+        return value
+
+    def start_strategy_workers(self, strategy_workers, track_interval):
+        """按照 polling_engine 启动策略跟踪
+        :param strategy_workers: [(策略id, 策略名, 传递给 query_strategy_transaction 的参数)]
+        :param track_interval: 轮询策略的时间间隔，单位为秒
+        :return: [threading.Thread] 启动的线程列表
+        """
+        if self._shard_pool is not None:
+            return self._shard_pool.start(strategy_workers, track_interval)
+        workers = []
+        if self._polling_engine == "asyncio":
+            engine = AsyncPollingEngine(
+                self, max_concurrency=self._max_concurrency
+            )
+            for strategy_id, strategy_name, kwargs in strategy_workers:
+                engine.add_strategy(
+                    strategy_id, strategy_name, track_interval, **kwargs
+                )
+                log.info("开始跟踪策略: %s", strategy_name)
+            worker = threading.Thread(target=engine.run)
+            worker.start()
+            workers.append(worker)
+            return workers
+
+        for strategy_id, strategy_name, kwargs in strategy_workers:
+            strategy_worker = threading.Thread(
+                target=self.track_strategy_worker,
+                args=[strategy_id, strategy_name],
+                kwargs=dict(kwargs, interval=track_interval),
+            )
+            strategy_worker.start()
+            workers.append(strategy_worker)
+            log.info("开始跟踪策略: %s", strategy_name)
+        return workers
+
+    def shard_state(self):
+        """
+        :return: dict 分片进程中的 follower 需要复制的属性，子类可以覆盖以添加登录状态等
+        """
+        return {
+            "s": self.s,
+            "_polling_engine": self._polling_engine,
+            "_max_concurrency": self._max_concurrency,
+            "_poll_scheduler": self._poll_scheduler,
+        }
+
+    def stop_strategy_shards(self):
+        """结束轮询策略的分片进程"""
+        if self._shard_pool is not None:
+            self._shard_pool.stop()
+
+    def create_poll_scheduler(self, interval):
+        """
+        :param interval: 轮询策略的时间间隔，单位为秒
+        :return: 决定策略轮询间隔的对象
+        """
+        if self._poll_scheduler is not None:
+            return self._poll_scheduler
+        return FixedIntervalScheduler(interval)
+
     def track_strategy_worker(self, strategy, name, interval=10, **kwargs):
         """跟踪下单worker
         :param strategy: 策略id
         :param name: 策略名字
         :param interval: 轮询策略的时间间隔，单位为秒"""
+        scheduler = self.create_poll_scheduler(interval)
+        state = PollState()
         while True:
+            state.record(self.poll_strategy(strategy, name, **kwargs))
             try:
-                transactions = self.query_strategy_transaction(
-                    strategy, **kwargs
-                )
-            # pylint: disable=broad-except
-            except Exception as e:
-                log.exception("无法获取策略 %s 调仓信息, 错误: %s, 跳过此次调仓查询", name, e)
-                time.sleep(3)
-                continue
-            for transaction in transactions:
-                trade_cmd = {
-                    "strategy": strategy,
-                    "strategy_name": name,
-                    "action": transaction["action"],
-                    "stock_code": transaction["stock_code"],
-                    "amount": transaction["amount"],
-                    "price": transaction["price"],
-                    "datetime": transaction["datetime"],
-                }
-                if self.is_cmd_expired(trade_cmd):
-                    continue
-                log.info(
-                    "策略 [%s] 发送指令到交易队列, 股票: %s 动作: %s 数量: %s 价格: %s 信号产生时间: %s",
-                    name,
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    trade_cmd["price"],
-                    trade_cmd["datetime"],
-                )
-                self.trade_queue.put(trade_cmd)
-                self.add_cmd_to_expired_cmds(trade_cmd)
-            try:
-                for _ in range(interval):
-                    time.sleep(1)
+                time.sleep(scheduler.next_delay(state, self.clock()))
             except KeyboardInterrupt:
                 log.info("程序退出")
                 break
 
+    def poll_strategy(self, strategy, name, **kwargs):
+        """查询一次策略调仓，并将未执行过的交易指令发送到交易队列
+        :param strategy: 策略id
+        :param name: 策略名字
+        :return: int 发送到交易队列的指令数, 查询失败时返回 None
+        """
+        try:
+            transactions = self.query_strategy_transaction(strategy, **kwargs)
+        # pylint: disable=broad-except
+        except Exception as e:
+            log.exception("无法获取策略 %s 调仓信息, 错误: %s, 跳过此次调仓查询", name, e)
+            return None
+        fetched = time.time()
+        new_cmds = 0
+        for transaction in transactions:
+            trade_cmd = {
+                "strategy": strategy,
+                "strategy_name": name,
+                "action": transaction["action"],
+                "stock_code": transaction["stock_code"],
+                "amount": transaction["amount"],
+                "price": transaction["price"],
+                "datetime": transaction["datetime"],
+            }
+            if self.is_cmd_expired(trade_cmd):
+                continue
+            log.info(
+                "策略 [%s] 发送指令到交易队列, 股票: %s 动作: %s 数量: %s 价格: %s 信号产生时间: %s",
+                name,
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+            )
+            self.latency.mark(trade_cmd, "fetched", fetched)
+            self.latency.record_fetched(trade_cmd)
+            self.put_trade_cmd(trade_cmd)
+            self.add_cmd_to_expired_cmds(trade_cmd)
+            new_cmds += 1
+        return new_cmds
+
+    def put_trade_cmd(self, trade_cmd):
+        """发送交易指令到交易队列，开启指令合并时先进入合并窗口"""
+        if self.cmd_sink is not None:
+            self.cmd_sink.put(trade_cmd)
+            return
+        if self.trade_store is not None:
+            trade_cmd["cmd_key"] = self.generate_expired_cmd_key(trade_cmd)
+            # 在写入指令缓存前落盘，进程退出后可以恢复
+            self.trade_store.add(trade_cmd)
+        self.latency.mark(trade_cmd, "enqueued")
+        if self._order_netter is not None:
+            self._order_netter.put(trade_cmd)
+        else:
+            self.trade_queue.put(trade_cmd)
+
     @staticmethod
     def generate_expired_cmd_key(cmd):
         return "{}_{}_{}_{}_{}_{}".format(
@@ -229,15 +606,26 @@ class BaseFollower(metaclass=abc.ABCMeta):
         )
 
     def is_cmd_expired(self, cmd):
+        if self.expired_cmds.is_beyond_horizon(cmd["datetime"]):
+            return True
         key = self.generate_expired_cmd_key(cmd)
-        return key in self.expired_cmds
+        return self.expired_cmds.contains(key, cmd["datetime"])
 
     def add_cmd_to_expired_cmds(self, cmd):
         key = self.generate_expired_cmd_key(cmd)
-        self.expired_cmds.add(key)
-
-        with open(self.CMD_CACHE_FILE, "wb") as f:
-            pickle.dump(self.expired_cmds, f)
+        record = self.expired_cmds.add(key, cmd["datetime"])
+        if self.expired_cmds.durable:
+            return
+
+        with self._cmd_journal_lock:
+            if self._cmd_journal is None:
+                # 未加载历史指令缓存时，重新开始记录
+                self._cmd_journal = CmdJournal(self.CMD_CACHE_FILE)
+                self._cmd_journal.open(truncate=True)
+        if self._cmd_journal.append(
+            record, live_count=len(self.expired_cmds)
+        ):
+            self._cmd_journal.compact_in_background(self.expired_cmds.records)
 
     @staticmethod
     def _is_number(s):
@@ -256,91 +644,180 @@ class BaseFollower(metaclass=abc.ABCMeta):
         :param expire_seconds:
         :param entrust_prop:
         :param send_interval:
-        :return:
+        :return: [concurrent.futures.Future] 并行分发时各账户的执行结果, 串行执行时为空
         """
-        for user in users:
-            # check expire
-            now = datetime.datetime.now()
-            expire = (now - trade_cmd["datetime"]).total_seconds()
-            if expire > expire_seconds:
-                log.warning(
-                    "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 超过设置的最大过期时间 %s 秒, 被丢弃",
-                    trade_cmd["strategy_name"],
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    trade_cmd["price"],
-                    trade_cmd["datetime"],
-                    now,
+        skip_accounts = trade_cmd.get("skip_accounts", ())
+        if not self._parallel_dispatch:
+            for index, user in enumerate(users):
+                account = self._dispatcher.account_name(user, index)
+                if account in skip_accounts:
+                    continue
+                if not self._check_trade_cmd(trade_cmd, expire_seconds):
+                    self._set_trade_cmd_state(trade_cmd, "dropped")
+                    break
+                self._send_trade_cmd(trade_cmd, user, account, entrust_prop)
+            return []
+
+        if not self._check_trade_cmd(trade_cmd, expire_seconds):
+            self._set_trade_cmd_state(trade_cmd, "dropped")
+            return []
+        futures = []
+        for index, user in enumerate(users):
+            account = self._dispatcher.account_name(user, index)
+            if account in skip_accounts:
+                continue
+            futures.append(
+                self._dispatcher.submit(
+                    account,
+                    self._execute_trade_cmd_in_lane,
+                    trade_cmd,
+                    user,
+                    account,
                     expire_seconds,
+                    entrust_prop,
+                    send_interval,
                 )
-                break
+            )
+        return futures
 
-            # check price
-            price = trade_cmd["price"]
-            if not self._is_number(price) or price <= 0:
-                log.warning(
-                    "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 价格无效 , 被丢弃",
-                    trade_cmd["strategy_name"],
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    trade_cmd["price"],
-                    trade_cmd["datetime"],
-                    now,
-                )
-                break
+    def _execute_trade_cmd_in_lane(
+        self,
+        trade_cmd,
+        user,
+        account,
+        expire_seconds,
+        entrust_prop,
+        send_interval,
+    ):
+        # 账户通道中可能有排队的指令，执行前需要重新检查是否过期
+        if not self._check_trade_cmd(trade_cmd, expire_seconds):
+            self._set_trade_cmd_state(trade_cmd, "dropped")
+            return
+        self._send_trade_cmd(trade_cmd, user, account, entrust_prop)
+        time.sleep(send_interval)
+
+    def _set_trade_cmd_state(self, trade_cmd, state, account=None):
+        if self.trade_store is None:
+            return
+        if account is None:
+            self.trade_store.set_state(trade_cmd, state)
+        else:
+            self.trade_store.set_account_state(trade_cmd, account, state)
+
+    def _check_trade_cmd(self, trade_cmd, expire_seconds):
+        """检查交易指令是否过期，价格及数量是否有效
+        :return: bool 指令是否可以执行
+        """
+        # check expire
+        now = self.clock()
+        expire = (now - trade_cmd["datetime"]).total_seconds()
+        if expire > expire_seconds:
+            log.warning(
+                "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 超过设置的最大过期时间 %s 秒, 被丢弃",
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+                now,
+                expire_seconds,
+            )
+            return False
 
-            # check amount
-            if trade_cmd["amount"] <= 0:
-                log.warning(
-                    "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 买入股数无效 , 被丢弃",
-                    trade_cmd["strategy_name"],
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    trade_cmd["price"],
-                    trade_cmd["datetime"],
-                    now,
-                )
-                break
+        # check price
+        price = trade_cmd["price"]
+        if not self._is_number(price) or price <= 0:
+            log.warning(
+                "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 价格无效 , 被丢弃",
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+                now,
+            )
+            return False
 
-            actual_price = self._calculate_price_by_slippage(
-                trade_cmd["action"], trade_cmd["price"]
+        # check amount
+        if trade_cmd["amount"] <= 0:
+            log.warning(
+                "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 买入股数无效 , 被丢弃",
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+                now,
             )
-            args = {
-                "security": trade_cmd["stock_code"],
-                "price": actual_price,
-                "amount": trade_cmd["amount"],
-                "entrust_prop": entrust_prop,
-            }
-            try:
-                response = getattr(user, trade_cmd["action"])(**args)
-            except exceptions.TradeError as e:
-                trader_name = type(user).__name__
-                err_msg = "{}: {}".format(type(e).__name__, e.args)
-                log.error(
-                    "%s 执行 策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格(考虑滑点): %s 指令产生时间: %s) 失败, 错误信息: %s",
-                    trader_name,
-                    trade_cmd["strategy_name"],
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    actual_price,
-                    trade_cmd["datetime"],
-                    err_msg,
-                )
-            else:
-                log.info(
-                    "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格(考虑滑点): %s 指令产生时间: %s) 执行成功, 返回: %s",
-                    trade_cmd["strategy_name"],
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    actual_price,
-                    trade_cmd["datetime"],
-                    response,
-                )
+            return False
+
+        return True
+
+    def _send_trade_cmd(self, trade_cmd, user, account, entrust_prop):
+        actual_price = self._calculate_price_by_slippage(
+            trade_cmd["action"], trade_cmd["price"]
+        )
+        args = {
+            "security": trade_cmd["stock_code"],
+            "price": actual_price,
+            "amount": trade_cmd["amount"],
+            "entrust_prop": entrust_prop,
+        }
+        if trade_cmd["action"] == "buy" and self._fill_gate is not None:
+            self._fill_gate.wait_for_sells(account, user, trade_cmd)
+        if self._rate_limiter is not None:
+            waited = self._rate_limiter.acquire(account, user)
+            if waited is not None:
+                self.latency.observe("rate_limit", "account", account, waited)
+        self._set_trade_cmd_state(trade_cmd, "dispatched", account)
+        dispatched = time.time()
+        try:
+            response = getattr(user, trade_cmd["action"])(**args)
+        except exceptions.TradeError as e:
+            self._set_trade_cmd_state(trade_cmd, "failed", account)
+            err_msg = "{}: {}".format(type(e).__name__, e.args)
+            log.error(
+                "%s 执行 策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格(考虑滑点): %s 指令产生时间: %s) 失败, 错误信息: %s",
+                account,
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                actual_price,
+                trade_cmd["datetime"],
+                err_msg,
+            )
+        else:
+            acked = time.time()
+            self._set_trade_cmd_state(trade_cmd, "acked", account)
+            self.latency.record_ack(trade_cmd, account, dispatched, acked)
+            if trade_cmd["action"] == "sell" and self._fill_gate is not None:
+                self._fill_gate.register_sell(account, trade_cmd, response)
+            self.on_trade_cmd_sent(trade_cmd, user, response)
+            log.info(
+                "%s 执行 策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格(考虑滑点): %s 指令产生时间: %s) 成功, 耗时 %.3f 秒, 返回: %s",
+                account,
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                actual_price,
+                trade_cmd["datetime"],
+                acked - dispatched,
+                response,
+            )
+
+    def on_trade_cmd_sent(self, trade_cmd, user, response):
+        """
+        交易指令下单成功后调用，子类可以覆盖，类似根据成交更新缓存的持仓
+        :param trade_cmd: 交易指令
+        :param user: 下单的账户
+        :param response: 下单接口的返回
+        """
+        pass
 
     def trade_worker(
         self, users, expire_seconds=120, entrust_prop="limit", send_interval=0
@@ -348,23 +825,118 @@ class BaseFollower(metaclass=abc.ABCMeta):
         """
         :param send_interval: 交易发送间隔， 默认为0s。调大可防止卖出买入时买出单没有及时成交导致的买入金额不足
         """
-        while True:
-            trade_cmd = self.trade_queue.get()
+        while not self._trader_stopped.is_set():
+            try:
+                trade_cmd = self.trade_queue.get(
+                    timeout=self.TRADER_STOP_CHECK_INTERVAL
+                )
+            except queue.Empty:
+                continue
+            self._set_trade_cmd_state(trade_cmd, "active")
+            self.latency.mark(trade_cmd, "dequeued")
+            self.latency.record_dequeued(trade_cmd)
             self._execute_trade_cmd(
                 trade_cmd, users, expire_seconds, entrust_prop, send_interval
             )
-            time.sleep(send_interval)
+            self.trade_queue.task_done()
+            if not self._parallel_dispatch:
+                time.sleep(send_interval)
 
     def query_strategy_transaction(self, strategy, **kwargs):
-        params = self.create_query_transaction_params(strategy)
-
-        rep = self.s.get(self.TRANSACTION_API, params=params)
+        rep = self.fetch_transaction_history(strategy)
+        # 调仓记录未变化时跳过解析、修整及去重
+        if rep.status_code == 304:
+            return []
+        digest = self.digest_history(rep.content)
+        if self.is_history_unchanged(strategy, digest):
+            return []
         history = rep.json()
 
-        transactions = self.extract_transactions(history)
+        transactions, progress = self.extract_new_transactions(
+            strategy, history
+        )
         self.project_transactions(transactions, **kwargs)
+        self.update_history_fingerprint(strategy, digest, rep.headers)
+        if progress is not None:
+            self._history_progress[strategy] = progress
         return self.order_transactions_sell_first(transactions)
 
+    def extract_new_transactions(self, strategy, history):
+        """
+        抽取上次处理之后新增的调仓记录，默认返回全部调仓记录
+        :param strategy: 策略 id
+        :param history: 调仓接口返回信息的字典对象
+        :return: ([] 新增的调仓记录, 处理到的位置), 位置在调仓记录修整成功后保存,
+            下次通过 self._history_progress[strategy] 获取，None 表示不保存
+        """
+        return self.extract_transactions(history), None
+
+    def fetch_transaction_history(self, strategy):
+        """
+        获取策略调仓接口的原始返回，设置 history_source 时从回放数据源获取,
+        设置 history_recorder 时保存每次的返回
+        :param strategy: 策略 id
+        :return: requests.Response 或 history_record.RecordedResponse
+        """
+        if self.history_source is not None:
+            return self.history_source.fetch(strategy)
+        rep = self.request_transaction_history(strategy)
+        if self.history_recorder is not None:
+            self.history_recorder.record(strategy, rep)
+        return rep
+
+    def request_transaction_history(self, strategy):
+        """
+        请求策略调仓接口
+        :param strategy: 策略 id
+        :return: 接口返回的 response 对象
+        """
+        params = self.create_query_transaction_params(strategy)
+        return self.s.get(
+            self.TRANSACTION_API,
+            params=params,
+            headers=self._conditional_request_headers(strategy),
+        )
+
+    @staticmethod
+    def digest_history(content: bytes) -> bytes:
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    def is_history_unchanged(self, strategy, digest):
+        """
+        :param strategy: 策略 id
+        :param digest: 本次调仓记录的摘要
+        :return: bool 调仓记录是否与上次成功处理的相同
+        """
+        fingerprint = self._history_fingerprints.get(strategy)
+        return fingerprint is not None and fingerprint[0] == digest
+
+    def update_history_fingerprint(self, strategy, digest, headers=None):
+        """
+        调仓记录处理成功后更新摘要，处理失败时保持不变，保证下次查询会重新处理
+        :param strategy: 策略 id
+        :param digest: 调仓记录的摘要
+        :param headers: 接口返回的 headers, 用于条件请求
+        """
+        headers = headers or {}
+        self._history_fingerprints[strategy] = (
+            digest,
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+        )
+
+    def _conditional_request_headers(self, strategy):
+        fingerprint = self._history_fingerprints.get(strategy)
+        if fingerprint is None:
+            return {}
+        _, etag, last_modified = fingerprint
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
     def extract_transactions(self, history) -> List[str]:
         """
         抽取接口返回中的调仓记录列表
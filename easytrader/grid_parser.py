@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+解析客户端 grid 复制或另存得到的制表符分隔文本，代替 pandas.read_csv
+
+类型推断与 pandas.read_csv(delimiter='\\t', dtype=dtype, na_filter=False) 一致:
+dtype 中指定的列按指定类型转换，其他列全部为整数时为 int，全部为数字时为 float,
+全部为 True/False 时为 bool，否则保持为 str; 空表头命名为 'Unnamed: 列序号',
+重复的表头依次加上 '.1', '.2' 后缀
+"""
+import functools
+import math
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+_FLOAT_PATTERN = re.compile(
+    r"\s*[+-]?((\d+\.?\d*|\.\d+)(e[+-]?\d+)?|inf|infinity)\s*$", re.I
+)
+_BOOLS = {"true": True, "false": False}
+
+
+class Grid(NamedTuple):
+    """按列保存的 grid 数据"""
+
+    columns: Tuple[str, ...]
+    values: Tuple[list, ...]
+
+    def __len__(self):
+        return len(self.values[0]) if self.values else 0
+
+    def column(self, name: str) -> list:
+        return self.values[self.columns.index(name)]
+
+    def records(self) -> List[Dict]:
+        """:return: [{列名: 值}] 与 DataFrame.to_dict('records') 相同的格式"""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in zip(*self.values)]
+
+
+def _mangle_columns(names: List[str]) -> Tuple[str, ...]:
+    names = [
+        name or "Unnamed: {}".format(i) for i, name in enumerate(names)
+    ]
+    header = set(names)
+    columns = []
+    counts: Dict[str, int] = {}
+    for name in names:
+        column = name
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            column = "{}.{}".format(name, count)
+            # 跳过表头中已有的列名
+            count = count + 1 if column in header else counts.get(column, 0)
+        counts[column] = count + 1
+        columns.append(column)
+    return tuple(columns)
+
+
+def _infer_column(values: List[str]) -> list:
+    if not values:
+        return values
+    # int(), float() 还接受 '1_0', 'nan' 等 pandas 不视为数字的写法
+    plain = "_" not in "".join(values)
+    if plain:
+        try:
+            return [int(v) for v in values]
+        except ValueError:
+            pass
+    try:
+        floats = [float(v) for v in values]
+    except ValueError:
+        floats = None
+    if floats is not None:
+        if plain and all(map(math.isfinite, floats)):
+            return floats
+        if all(_FLOAT_PATTERN.match(v) for v in values):
+            return floats
+    try:
+        return [_BOOLS[v.lower()] for v in values]
+    except KeyError:
+        return values
+
+
+def _str_column(values: List[str]) -> list:
+    return values
+
+
+def _typed_column(type_: Callable, values: List[str]) -> list:
+    return [type_(v) for v in values]
+
+
+class GridParser:
+    """
+    按列名预先生成各列的转换函数，解析多次时复用
+    """
+
+    def __init__(self, dtype: Optional[Dict[str, Callable]] = None):
+        """
+        :param dtype: {列名: 类型}，类似 config.GRID_DTYPE，其他列自动推断类型,
+            重复的列名按加上后缀后的列名匹配
+        """
+        self.dtype = dict(dtype or {})
+        self._converters: Dict[str, Callable[[List[str]], list]] = {}
+
+    def _converter(self, column: str) -> Callable[[List[str]], list]:
+        converter = self._converters.get(column)
+        if converter is None:
+            type_ = self.dtype.get(column)
+            if type_ is None:
+                converter = _infer_column
+            elif type_ is str:
+                converter = _str_column
+            else:
+                converter = functools.partial(_typed_column, type_)
+            self._converters[column] = converter
+        return converter
+
+    def parse(self, text: str) -> Grid:
+        """
+        :param text: 第一行为表头的制表符分隔文本
+        :return: Grid
+        """
+        lines = [line for line in text.splitlines() if line]
+        if not lines:
+            return Grid((), ())
+        names = lines[0].split("\t")
+        width = len(names)
+        rows = [line.split("\t") for line in lines[1:]]
+        for row in rows:
+            if len(row) != width:
+                # 缺少的单元格按空值处理，多出的单元格忽略
+                row[width:] = []
+                row.extend([""] * (width - len(row)))
+
+        columns = _mangle_columns(names)
+        raw_columns = list(zip(*rows)) if rows else [()] * width
+        values = tuple(
+            self._converter(columns[i])(list(raw_columns[i]))
+            for i in range(width)
+        )
+        return Grid(columns, values)
+
+    def read(self, path: str, encoding: str = "gbk") -> Grid:
+        with open(path, encoding=encoding) as f:
+            return self.parse(f.read())
+
+
+def parse_grid(
+    text: str, dtype: Optional[Dict[str, Callable]] = None
+) -> Grid:
+    return GridParser(dtype).parse(text)
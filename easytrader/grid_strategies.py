@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 import abc
-import io
+import functools
+import os
 import tempfile
 from typing import TYPE_CHECKING, Dict, List
 
-import pandas as pd
 import pywinauto.clipboard
 
+from .grid_parser import GridParser
 from .log import log
 
 if TYPE_CHECKING:
@@ -26,6 +27,11 @@ class IGridStrategy(abc.ABC):
         pass
 
 
+@functools.lru_cache()
+def _grid_parser(config) -> GridParser:
+    return GridParser(config.GRID_DTYPE)
+
+
 class BaseStrategy(IGridStrategy):
     def __init__(self, trader: "clienttrader.IClientTrader") -> None:
         self._trader = trader
@@ -38,6 +44,9 @@ class BaseStrategy(IGridStrategy):
         """
         pass
 
+    def _get_parser(self) -> GridParser:
+        return _grid_parser(self._trader.config)
+
     def _get_grid(self, control_id: int):
         grid = self._trader.main.child_window(
             control_id=control_id, class_name="CVirtualGridCtrl"
@@ -57,13 +66,7 @@ class Copy(BaseStrategy):
         return self._format_grid_data(content)
 
     def _format_grid_data(self, data: str) -> List[Dict]:
-        df = pd.read_csv(
-            io.StringIO(data),
-            delimiter="\t",
-            dtype=self._trader.config.GRID_DTYPE,
-            na_filter=False,
-        )
-        return df.to_dict("records")
+        return self._get_parser().parse(data).records()
 
     def _get_clipboard_data(self) -> str:
         while True:
@@ -85,7 +88,7 @@ class Xls(BaseStrategy):
 
         # ctrl+s 保存 grid 内容为 xls 文件
         grid.type_keys("^s")
-        self._trader.wait(1)
+        self._trader.wait_until("save_dialog", self._is_top_window_changed, 1)
 
         temp_path = tempfile.mktemp(suffix=".csv")
         self._trader.app.top_window().type_keys(self.normalize_path(temp_path))
@@ -95,19 +98,23 @@ class Xls(BaseStrategy):
 
         # alt+s保存，alt+y替换已存在的文件
         self._trader.app.top_window().type_keys("%{s}%{y}")
-        # Wait until file save complete otherwise pandas can not find file
-        self._trader.wait(0.2)
+        # Wait until file save complete otherwise the file can not be found
+        self._trader.wait_until(
+            "grid_file_saved",
+            lambda: os.path.exists(temp_path)
+            and not self._is_top_window_changed(),
+            2,
+        )
         return self._format_grid_data(temp_path)
 
+    def _is_top_window_changed(self) -> bool:
+        return (
+            self._trader.app.top_window().wrapper_object()
+            != self._trader.main.wrapper_object()
+        )
+
     def normalize_path(self, temp_path: str) -> str:
         return temp_path.replace("~", "{~}")
 
     def _format_grid_data(self, data: str) -> List[Dict]:
-        df = pd.read_csv(
-            data,
-            encoding="gbk",
-            delimiter="\t",
-            dtype=self._trader.config.GRID_DTYPE,
-            na_filter=False,
-        )
-        return df.to_dict("records")
+        return self._get_parser().read(data, encoding="gbk").records()
@@ -3,12 +3,40 @@ import datetime
 import json
 import random
 import re
+import time
+from typing import NamedTuple
 
 import requests
 
 from . import exceptions
 
 
+class WaitResult(NamedTuple):
+    ok: bool
+    elapsed: float
+
+
+def wait_until(condition, timeout, interval=0.01):
+    """
+    每隔 interval 秒检查一次 condition，满足条件或超时后立即返回，代替固定时长的 sleep
+    :param condition: 返回 bool 的函数，抛出异常视为不满足
+    :param timeout: 最长等待时间，单位为秒
+    :param interval: 检查间隔，单位为秒
+    :return: WaitResult(是否满足条件, 实际等待的秒数)
+    """
+    start = time.perf_counter()
+    while True:
+        try:
+            ok = bool(condition())
+        # pylint: disable=broad-except
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        if ok or elapsed >= timeout:
+            return WaitResult(ok, elapsed)
+        time.sleep(min(interval, timeout - elapsed))
+
+
 def parse_cookies_str(cookies):
     """
     parse cookies str to dict
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+调仓接口原始返回的录制格式
+
+follower 录制时使用 HistoryRecorder, replay 及 shared_poller 回放或转发时使用 HistoryRecord,
+各 follower 转换缓存的返回时使用 RecordedResponse
+"""
+import json
+import threading
+import time
+from typing import NamedTuple
+
+from .log import log
+
+
+class RecordedResponse:
+    """与 requests.Response 接口相同的录制返回"""
+
+    def __init__(self, status_code=200, headers=None, content=b""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class HistoryRecord(NamedTuple):
+    time: float
+    strategy: str
+    status_code: int
+    headers: dict
+    content: bytes
+
+    def to_response(self):
+        return RecordedResponse(self.status_code, self.headers, self.content)
+
+
+class HistoryRecorder:
+    """
+    按行保存调仓接口的原始返回，每行为一个 json 对象
+
+    只保存条件请求使用的 ETag 及 Last-Modified 两个 header，不保存 cookie 等登录信息
+    """
+
+    HEADERS = ("ETag", "Last-Modified")
+
+    def __init__(self, path):
+        """
+        :param path: 保存的文件路径，已存在时追加
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf8")
+
+    def record(self, strategy, response, fetched=None):
+        """
+        :param strategy: 策略 id
+        :param response: 调仓接口返回的 response 对象
+        :param fetched: 查询时间, 默认为当前时间
+        """
+        line = json.dumps(
+            {
+                "time": fetched or time.time(),
+                "strategy": strategy,
+                "status_code": response.status_code,
+                "headers": {
+                    key: response.headers[key]
+                    for key in self.HEADERS
+                    if response.headers.get(key)
+                },
+                "content": response.content.decode("utf8", "surrogateescape"),
+            }
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load_history_records(path):
+    """
+    读取录制文件
+    :param path: HistoryRecorder 保存的文件路径
+    :return: [HistoryRecord] 按查询时间排序的录制记录
+    """
+    records = []
+    with open(path, encoding="utf8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                # 录制进程退出时最后一行可能不完整
+                log.warning("跳过无法解析的录制记录: %s", line[:100])
+                continue
+            records.append(
+                HistoryRecord(
+                    time=data["time"],
+                    strategy=data["strategy"],
+                    status_code=data["status_code"],
+                    headers=data["headers"],
+                    content=data["content"].encode("utf8", "surrogateescape"),
+                )
+            )
+    records.sort(key=lambda r: r.time)
+    return records
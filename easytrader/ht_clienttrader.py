@@ -59,13 +59,3 @@ class HTClientTrader(clienttrader.BaseLoginClientTrader):
         self._switch_left_menus(self._config.BALANCE_MENU_PATH)
 
         return self._get_balance_from_statics()
-
-    def _get_balance_from_statics(self):
-        result = {}
-        for key, control_id in self._config.BALANCE_CONTROL_ID_GROUP.items():
-            result[key] = float(
-                self._main.child_window(
-                    control_id=control_id, class_name="Static"
-                ).window_text()
-            )
-        return result
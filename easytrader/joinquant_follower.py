@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import re
 from datetime import datetime
-from threading import Thread
 
 from . import exceptions
 from .follower import BaseFollower
@@ -40,6 +39,7 @@ class JoinQuantFollower(BaseFollower):
         cmd_cache=True,
         entrust_prop="limit",
         send_interval=0,
+        **kwargs
     ):
         """跟踪joinquant对应的模拟交易，支持多用户多策略
         :param users: 支持easytrader的用户对象，支持使用 [] 指定多个用户
@@ -50,7 +50,16 @@ class JoinQuantFollower(BaseFollower):
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param entrust_prop: 委托方式, 'limit' 为限价，'market' 为市价, 仅在银河实现
         :param send_interval: 交易发送间隔， 默认为0s。调大可防止卖出买入时卖出单没有及时成交导致的买入金额不足
+        :param kwargs: 其他参数见 BaseFollower.follow
         """
+        super().follow(
+            users=users,
+            strategies=strategies,
+            track_interval=track_interval,
+            trade_cmd_expire_seconds=trade_cmd_expire_seconds,
+            cmd_cache=cmd_cache,
+            **kwargs
+        )
         users = self.warp_list(users)
         strategies = self.warp_list(strategies)
 
@@ -61,25 +70,24 @@ class JoinQuantFollower(BaseFollower):
             users, trade_cmd_expire_seconds, entrust_prop, send_interval
         )
 
-        workers = []
-        for strategy_url in strategies:
-            try:
-                strategy_id = self.extract_strategy_id(strategy_url)
-                strategy_name = self.extract_strategy_name(strategy_url)
-            except:
-                log.error("抽取交易id和策略名失败, 无效的模拟交易url: %s", strategy_url)
-                raise
-            strategy_worker = Thread(
-                target=self.track_strategy_worker,
-                args=[strategy_id, strategy_name],
-                kwargs={"interval": track_interval},
-            )
-            strategy_worker.start()
-            workers.append(strategy_worker)
-            log.info("开始跟踪策略: %s", strategy_name)
+        strategy_workers = self.bootstrap_strategies(
+            strategies, self._bootstrap_strategy
+        )
+        workers = self.start_strategy_workers(strategy_workers, track_interval)
         for worker in workers:
             worker.join()
 
+    def _bootstrap_strategy(self, strategy_url):
+        try:
+            strategy_id = self.extract_strategy_id(strategy_url)
+            strategy_name = self.cached_bootstrap_value(
+                "name", strategy_url, self.extract_strategy_name
+            )
+        except:
+            log.error("抽取交易id和策略名失败, 无效的模拟交易url: %s", strategy_url)
+            raise
+        return strategy_id, strategy_name, {}
+
     @staticmethod
     def extract_strategy_id(strategy_url):
         return re.search(r"(?<=backtestId=)\w+", strategy_url).group()
@@ -99,6 +107,46 @@ class JoinQuantFollower(BaseFollower):
         transactions = history["data"]["transaction"]
         return transactions
 
+    def extract_new_transactions(self, strategy, history):
+        # 只修整高水位之后的记录，当日早些时候的记录无需重复解析及去重
+        return self.transactions_after_high_water_mark(
+            self.extract_transactions(history),
+            self._history_progress.get(strategy),
+        )
+
+    @staticmethod
+    def _transaction_time(transaction):
+        # 格式为 2019-01-02 10:00, 可以直接按字符串比较
+        return "{} {}".format(transaction["date"], transaction["time"])
+
+    def transactions_after_high_water_mark(self, transactions, mark):
+        """
+        筛选高水位之后的成交记录
+        :param transactions: 当日全部成交记录
+        :param mark: (已处理的最新成交时间, 该时间的成交记录数), None 表示全部为新记录
+        :return: ([] 新的成交记录, 新的高水位)
+        """
+        if not transactions:
+            return [], mark
+        times = [self._transaction_time(t) for t in transactions]
+        latest = max(times)
+        new_mark = (latest, times.count(latest))
+        if mark is None:
+            return transactions, new_mark
+
+        mark_time, mark_count = mark
+        if latest < mark_time:
+            return [], mark
+        # 最新一分钟内有新成交时，该分钟的记录全部重新处理，已执行的由指令缓存去重
+        mark_time_changed = times.count(mark_time) != mark_count
+        new_transactions = [
+            transaction
+            for transaction, time_str in zip(transactions, times)
+            if time_str > mark_time
+            or (time_str == mark_time and mark_time_changed)
+        ]
+        return new_transactions, new_mark
+
     @staticmethod
     def stock_shuffle_to_prefix(stock):
         assert (
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import bisect
+import collections
+import threading
+import time
+
+from .log import log
+
+
+class MetricsSink:
+    """
+    指标输出接口，可以继承后对接 statsd / prometheus 等监控系统
+    """
+
+    def observe(self, name, value, tags):
+        """
+        :param name: 指标名
+        :param value: 耗时，单位为秒
+        :param tags: dict 指标维度，类似 {'strategy': '策略名'} 或 {'account': '账户名'}
+        """
+        pass
+
+
+class RollingHistogram:
+    """保留最近 window 秒内样本的耗时分布"""
+
+    BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+    def __init__(self, window=300, max_samples=10000):
+        self.window = window
+        self._samples = collections.deque(maxlen=max_samples)
+
+    def add(self, value, now=None):
+        self._samples.append((now or time.time(), value))
+
+    def values(self, now=None):
+        cutoff = (now or time.time()) - self.window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return sorted(v for _, v in self._samples)
+
+    def summary(self, now=None):
+        """
+        :return: dict 样本数, 分位数, 最大值, 及各个上限对应的样本数, 没有样本时返回 None
+        """
+        values = self.values(now)
+        if not values:
+            return None
+
+        def percentile(p):
+            return values[min(int(len(values) * p), len(values) - 1)]
+
+        return {
+            "count": len(values),
+            "p50": percentile(0.5),
+            "p90": percentile(0.9),
+            "p99": percentile(0.99),
+            "max": values[-1],
+            "buckets": {
+                bound: bisect.bisect_right(values, bound)
+                for bound in self.BUCKETS
+            },
+        }
+
+
+class LatencyRecorder:
+    """
+    记录交易指令在跟踪流程中各阶段的时间并统计耗时
+
+    各阶段时间保存在 trade_cmd['timestamps'] 中:
+    signal 信号产生 -> fetched 查询到调仓 -> enqueued 发送到交易队列 -> dequeued 交易线程取出
+    -> 各账户 dispatched 开始下单 -> acked 券商返回
+
+    统计以下耗时，按策略及账户分别保存最近 window 秒的分布:
+    fetch 信号产生到查询到调仓, queue 在交易队列中等待的时间,
+    dispatch 交易线程取出到账户开始下单, broker 券商下单耗时, total 信号产生到券商返回,
+    开启 rate_limits 时还有 rate_limit 账户下单频率限制的等待时间
+    """
+
+    def __init__(self, sink=None, window=300, max_samples=10000):
+        """
+        :param sink: MetricsSink 对象，每个耗时样本都会输出到 sink
+        :param window: 统计最近多少秒内的样本
+        :param max_samples: 每个统计项最多保留的样本数
+        """
+        self.sink = sink
+        self._window = window
+        self._max_samples = max_samples
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._reporter = None
+
+    @staticmethod
+    def mark(trade_cmd, stage, timestamp=None):
+        """
+        记录交易指令到达某个阶段的时间
+        :param trade_cmd: 交易指令
+        :param stage: 阶段名
+        """
+        timestamps = trade_cmd.setdefault("timestamps", {})
+        timestamps[stage] = timestamp or time.time()
+
+    def observe(self, name, tag_key, tag_value, value):
+        with self._lock:
+            histogram = self._histograms.get((name, tag_key, tag_value))
+            if histogram is None:
+                histogram = self._histograms[
+                    (name, tag_key, tag_value)
+                ] = RollingHistogram(self._window, self._max_samples)
+            histogram.add(value)
+        if self.sink is not None:
+            try:
+                self.sink.observe(name, value, {tag_key: tag_value})
+            # pylint: disable=broad-except
+            except Exception as e:
+                log.warning("输出指标 %s 失败: %s", name, e)
+
+    def record_fetched(self, trade_cmd):
+        timestamps = trade_cmd.get("timestamps", {})
+        if "fetched" not in timestamps:
+            return
+        signal = trade_cmd["datetime"].timestamp()
+        self.observe(
+            "fetch",
+            "strategy",
+            trade_cmd["strategy_name"],
+            max(timestamps["fetched"] - signal, 0),
+        )
+
+    def record_dequeued(self, trade_cmd):
+        timestamps = trade_cmd.get("timestamps", {})
+        if "enqueued" not in timestamps or "dequeued" not in timestamps:
+            return
+        self.observe(
+            "queue",
+            "strategy",
+            trade_cmd["strategy_name"],
+            timestamps["dequeued"] - timestamps["enqueued"],
+        )
+
+    def record_ack(self, trade_cmd, account, dispatched, acked):
+        """
+        记录单个账户下单完成
+        :param trade_cmd: 交易指令
+        :param account: 账户名
+        :param dispatched: 开始下单的时间
+        :param acked: 券商返回的时间
+        """
+        strategy = trade_cmd["strategy_name"]
+        timestamps = trade_cmd.get("timestamps", {})
+        if "dequeued" in timestamps:
+            self.observe(
+                "dispatch",
+                "account",
+                account,
+                dispatched - timestamps["dequeued"],
+            )
+        self.observe("broker", "account", account, acked - dispatched)
+        total = max(acked - trade_cmd["datetime"].timestamp(), 0)
+        self.observe("total", "strategy", strategy, total)
+        self.observe("total", "account", account, total)
+
+    def summary(self):
+        """
+        :return: {(耗时名, 维度, 维度值): 耗时分布}
+        """
+        result = {}
+        with self._lock:
+            for key, histogram in self._histograms.items():
+                summary = histogram.summary()
+                if summary is not None:
+                    result[key] = summary
+        return result
+
+    def log_summary(self):
+        for (name, tag_key, tag_value), summary in sorted(
+            self.summary().items()
+        ):
+            log.info(
+                "耗时统计 %s [%s: %s] 样本数: %s p50: %.3fs p90: %.3fs p99: %.3fs 最大: %.3fs",
+                name,
+                tag_key,
+                tag_value,
+                summary["count"],
+                summary["p50"],
+                summary["p90"],
+                summary["p99"],
+                summary["max"],
+            )
+
+    def start_periodic_log(self, interval=60):
+        """启动后台线程，每隔 interval 秒输出一次耗时统计日志"""
+        if self._reporter is not None:
+            return
+
+        def report():
+            while True:
+                time.sleep(interval)
+                self.log_summary()
+
+        self._reporter = threading.Thread(target=report)
+        self._reporter.daemon = True
+        self._reporter.start()
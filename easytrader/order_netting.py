@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import collections
+import threading
+
+from .log import log
+
+
+class OrderNetter:
+    """
+    合并短时间内不同策略对同一证券的交易指令
+
+    第一条指令到达后开始计时，window 秒内到达的指令按证券汇总买卖数量，
+    合并为一条净额指令后再发送到交易队列，买卖完全抵消时不发送。
+    每条指令都会发送给所有 users，因此按证券合并即为按账户及证券合并。
+    合并后的指令通过 sources 字段保留原始指令，用于追溯到各个策略
+    """
+
+    def __init__(self, output_queue, window=1.0, history_size=1000):
+        """
+        :param output_queue: 合并后指令发送到的队列
+        :param window: 合并窗口，单位为秒
+        :param history_size: 保留的最近合并记录数
+        """
+        self._output_queue = output_queue
+        self.window = window
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+        self.records = collections.deque(maxlen=history_size)
+        # 设置后合并的原始指令在 trade_store.TradeCmdStore 中替换为合并后的指令
+        self.store = None
+
+    def put(self, trade_cmd):
+        with self._lock:
+            self._pending.setdefault(trade_cmd["stock_code"], []).append(
+                trade_cmd
+            )
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """合并当前窗口内的全部指令并发送到交易队列"""
+        with self._lock:
+            pending = self._pending
+            self._pending = collections.OrderedDict()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        # 先发送卖出指令
+        netted_cmds = []
+        for cmds in pending.values():
+            netted_cmd = self.net(cmds)
+            if self.store is not None and len(cmds) > 1:
+                self.store.replace(cmds, netted_cmd)
+            netted_cmds.append(netted_cmd)
+        for trade_cmd in sorted(
+            (c for c in netted_cmds if c is not None),
+            key=lambda c: c["action"] != "sell",
+        ):
+            self._output_queue.put(trade_cmd)
+
+    def net(self, trade_cmds):
+        """
+        合并同一证券的交易指令
+        :param trade_cmds: 同一证券的交易指令列表
+        :return: 合并后的指令, 完全抵消时返回 None
+        """
+        if len(trade_cmds) == 1:
+            return trade_cmds[0]
+
+        net_amount = sum(
+            c["amount"] if c["action"] == "buy" else -c["amount"]
+            for c in trade_cmds
+        )
+        sources = [self._attribution(c) for c in trade_cmds]
+        stock_code = trade_cmds[0]["stock_code"]
+        if net_amount == 0:
+            log.info(
+                "股票 %s 的买卖指令完全抵消, 不发送交易指令, 原始指令: %s",
+                stock_code,
+                sources,
+            )
+            self.records.append(
+                {"stock_code": stock_code, "sources": sources}
+            )
+            return None
+
+        action = "buy" if net_amount > 0 else "sell"
+        same_side = [c for c in trade_cmds if c["action"] == action]
+        earliest = min(same_side, key=lambda c: c["datetime"])
+        netted_cmd = {
+            "strategy": self._join_unique(c["strategy"] for c in trade_cmds),
+            "strategy_name": self._join_unique(
+                c["strategy_name"] for c in trade_cmds
+            ),
+            "action": action,
+            "stock_code": stock_code,
+            "amount": abs(net_amount),
+            # 使用同方向最新指令的价格，最早的信号时间用于判断过期
+            "price": same_side[-1]["price"],
+            "datetime": earliest["datetime"],
+            "sources": sources,
+        }
+        if "timestamps" in earliest:
+            netted_cmd["timestamps"] = dict(earliest["timestamps"])
+        if all("cmd_key" in c for c in trade_cmds):
+            netted_cmd["cmd_key"] = "+".join(c["cmd_key"] for c in trade_cmds)
+        log.info(
+            "合并股票 %s 的 %s 条指令为: 动作 %s 数量 %s 价格 %s, 原始指令: %s",
+            stock_code,
+            len(trade_cmds),
+            action,
+            netted_cmd["amount"],
+            netted_cmd["price"],
+            sources,
+        )
+        self.records.append(
+            {
+                "stock_code": stock_code,
+                "action": action,
+                "amount": netted_cmd["amount"],
+                "sources": sources,
+            }
+        )
+        return netted_cmd
+
+    @staticmethod
+    def _join_unique(values):
+        unique_values = []
+        for value in values:
+            if value not in unique_values:
+                unique_values.append(value)
+        return "+".join(str(v) for v in unique_values)
+
+    @staticmethod
+    def _attribution(trade_cmd):
+        return {
+            key: trade_cmd[key]
+            for key in (
+                "strategy",
+                "strategy_name",
+                "action",
+                "amount",
+                "price",
+                "datetime",
+            )
+        }
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import datetime
+import random
+
+from . import helpers
+
+
+class PollState:
+    """单个策略的轮询状态"""
+
+    def __init__(self):
+        self.errors = 0
+        self.idle_polls = 0
+
+    def record(self, new_cmds):
+        """
+        记录一次轮询结果
+        :param new_cmds: 本次发送到交易队列的指令数, None 表示查询失败
+        """
+        if new_cmds is None:
+            self.errors += 1
+            return
+        self.errors = 0
+        self.idle_polls = 0 if new_cmds else self.idle_polls + 1
+
+
+class FixedIntervalScheduler:
+    """
+    固定间隔轮询，查询失败时等待 error_interval 秒后重试
+    """
+
+    def __init__(self, interval=10, error_interval=3):
+        """
+        :param interval: 轮询策略的时间间隔，单位为秒
+        :param error_interval: 查询失败后的重试间隔，单位为秒
+        """
+        self.interval = interval
+        self.error_interval = error_interval
+
+    def next_delay(self, state, now=None):
+        """
+        :param state: PollState 策略的轮询状态
+        :param now: 当前时间，follower 传入自己的 clock(), 回放时为回放时间
+        :return: 距离下次轮询的秒数
+        """
+        return self.error_interval if state.errors else self.interval
+
+
+class TradingSessionScheduler(FixedIntervalScheduler):
+    """
+    根据 A 股交易时段调整轮询间隔
+
+    * 非交易日及非交易时段(包括午间休市)暂停轮询，直到下一个交易时段开始
+    * 每个交易时段开始及结束前 fast_window 秒内使用 fast_interval 轮询
+    * 查询失败及策略长时间没有新指令时按指数退避并加入随机抖动
+    """
+
+    SESSIONS = (
+        (datetime.time(9, 15), datetime.time(11, 30)),
+        (datetime.time(13, 0), datetime.time(15, 0)),
+    )
+
+    def __init__(
+        self,
+        interval=10,
+        fast_interval=None,
+        fast_window=300,
+        error_interval=3,
+        max_error_interval=60,
+        idle_threshold=30,
+        max_idle_interval=None,
+        jitter=0.2,
+        sessions=None,
+        holidays=None,
+        calendar_file=None,
+    ):
+        """
+        :param interval: 交易时段内的轮询间隔，单位为秒
+        :param fast_interval: 开盘及收盘附近的轮询间隔，默认为 interval 的一半
+        :param fast_window: 交易时段开始后及结束前使用 fast_interval 的时长，单位为秒
+        :param error_interval: 第一次查询失败后的重试间隔，之后每次失败翻倍
+        :param max_error_interval: 查询失败重试间隔的上限
+        :param idle_threshold: 连续多少次轮询没有新指令后开始退避
+        :param max_idle_interval: 无新指令时轮询间隔的上限，默认为 interval 的 4 倍
+        :param jitter: 退避间隔的随机抖动比例，0.2 表示 ±20%
+        :param sessions: 交易时段 [(开始时间, 结束时间)], 默认为 SESSIONS
+        :param holidays: 非周末的休市日期列表，格式为 '2019-10-01' 或 datetime.date
+        :param calendar_file: 休市日期文件，内容为 json 格式的日期列表, 类似 ["2019-10-01"]
+        """
+        super().__init__(interval, error_interval)
+        self.fast_interval = (
+            fast_interval if fast_interval is not None else interval / 2
+        )
+        self.fast_window = datetime.timedelta(seconds=fast_window)
+        self.max_error_interval = max_error_interval
+        self.idle_threshold = idle_threshold
+        self.max_idle_interval = (
+            max_idle_interval
+            if max_idle_interval is not None
+            else interval * 4
+        )
+        self.jitter = jitter
+        self.sessions = sessions or self.SESSIONS
+
+        holidays = list(holidays or [])
+        if calendar_file is not None:
+            holidays.extend(helpers.file2dict(calendar_file))
+        self.holidays = {self._to_date(d) for d in holidays}
+
+    @staticmethod
+    def _to_date(value):
+        if isinstance(value, datetime.date):
+            return value
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+    def is_trading_day(self, date):
+        return date.weekday() < 5 and date not in self.holidays
+
+    def _session_ranges(self, date):
+        for start, end in self.sessions:
+            yield (
+                datetime.datetime.combine(date, start),
+                datetime.datetime.combine(date, end),
+            )
+
+    def current_session(self, now):
+        """:return: 当前所处交易时段的 (开始时间, 结束时间), 非交易时段返回 None"""
+        if not self.is_trading_day(now.date()):
+            return None
+        for start, end in self._session_ranges(now.date()):
+            if start <= now < end:
+                return start, end
+        return None
+
+    def next_session_start(self, now):
+        date = now.date()
+        # 最长的长假也不会超过 30 天
+        for _ in range(30):
+            if self.is_trading_day(date):
+                for start, _ in self._session_ranges(date):
+                    if start > now:
+                        return start
+            date += datetime.timedelta(days=1)
+        raise ValueError("30 天内没有交易日，请检查休市日期设置")
+
+    def _with_jitter(self, delay):
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def next_delay(self, state, now=None):
+        now = now or datetime.datetime.now()
+        session = self.current_session(now)
+        if session is None:
+            return (self.next_session_start(now) - now).total_seconds()
+        start, end = session
+
+        if state.errors:
+            delay = min(
+                self.error_interval * 2 ** (state.errors - 1),
+                self.max_error_interval,
+            )
+            return self._with_jitter(delay)
+
+        fast_start, fast_end = start + self.fast_window, end - self.fast_window
+        if now < fast_start or now >= fast_end:
+            return self.fast_interval
+
+        delay = self.interval
+        if state.idle_polls >= self.idle_threshold:
+            backoff = 2 ** min(state.idle_polls // self.idle_threshold, 8)
+            delay = self._with_jitter(
+                min(self.interval * backoff, self.max_idle_interval)
+            )
+        # 不错过收盘前的快速轮询时段
+        return min(delay, (fast_end - now).total_seconds())
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .log import log
+from .poll_scheduler import PollState
+
+
+class AsyncPollingEngine:
+    """
+    使用单个 asyncio 事件循环轮询所有策略，替代每个策略一个线程的方式
+
+    每个策略对应一个协程，协程大部分时间挂起在 asyncio.sleep 上，
+    真正的查询通过 follower.poll_strategy 在一个大小为 max_concurrency 的线程池中执行，
+    因此同时进行的查询数受 max_concurrency 限制，线程数不再随策略数增长。
+
+    查询仍然是阻塞的 requests 调用，策略数不超过 max_concurrency 时线程数与每个策略一个线程相同,
+    事件循环及线程池调度的 CPU 开销更高，且每秒查询数上限约为 max_concurrency / 接口延迟，
+    因此只适合策略数远大于 max_concurrency 的场景，默认仍然使用每个策略一个线程的方式
+    """
+
+    def __init__(self, follower, max_concurrency=16):
+        """
+        :param follower: BaseFollower 对象
+        :param max_concurrency: 同时查询策略调仓的最大并发数
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency 必须大于 0")
+        self._follower = follower
+        self._max_concurrency = max_concurrency
+        self._strategies = []
+        self._loop = None
+        self._stop_event = None
+        self._stopped = threading.Event()
+
+    def add_strategy(self, strategy, name, interval=10, **kwargs):
+        """
+        添加需要轮询的策略
+        :param strategy: 策略id
+        :param name: 策略名字
+        :param interval: 轮询策略的时间间隔，单位为秒
+        :param kwargs: 传递给 query_strategy_transaction 的参数
+        """
+        self._strategies.append((strategy, name, interval, kwargs))
+
+    def run(self):
+        """在当前线程运行事件循环，直到 stop 被调用"""
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        loop.set_default_executor(executor)
+        try:
+            loop.run_until_complete(self._run_all())
+        finally:
+            executor.shutdown(wait=False)
+            loop.close()
+
+    def stop(self):
+        """停止所有策略的轮询，可在其他线程中调用"""
+        self._stopped.set()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup)
+
+    def _wakeup(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def _run_all(self):
+        self._stop_event = asyncio.Event()
+        if self._stopped.is_set():
+            self._stop_event.set()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        tasks = [
+            asyncio.ensure_future(
+                self._track_strategy(semaphore, strategy, name, interval, kwargs)
+            )
+            for strategy, name, interval, kwargs in self._strategies
+        ]
+        try:
+            await self._stop_event.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _track_strategy(self, semaphore, strategy, name, interval, kwargs):
+        loop = asyncio.get_event_loop()
+        scheduler = self._follower.create_poll_scheduler(interval)
+        state = PollState()
+        while not self._stopped.is_set():
+            async with semaphore:
+                new_cmds = await loop.run_in_executor(
+                    None,
+                    lambda: self._follower.poll_strategy(
+                        strategy, name, **kwargs
+                    ),
+                )
+            state.record(new_cmds)
+            await asyncio.sleep(
+                scheduler.next_delay(state, self._follower.clock())
+            )
+        log.info("策略 [%s] 停止跟踪", name)
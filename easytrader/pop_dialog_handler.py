@@ -9,6 +9,8 @@ from . import exceptions
 class PopDialogHandler:
     def __init__(self, app):
         self._app = app
+        # 是否关闭过无法识别的弹窗，此时客户端的界面状态未知
+        self.closed_unknown_dialog = False
 
     def handle(self, title):
         if any(s in title for s in {"提示信息", "委托确认", "网上交易用户协议"}):
@@ -37,6 +39,7 @@ class PopDialogHandler:
         self._app.top_window().type_keys("%Y")
 
     def _close(self):
+        self.closed_unknown_dialog = True
         self._app.top_window().close()
 
 
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+class PositionSnapshotCache:
+    """
+    缓存账户持仓
+
+    客户端每次读取持仓都需要切换菜单、刷新并复制表格，
+    ttl 秒内的重复读取返回同一份持仓，下单成功后调用 invalidate 使缓存失效
+    """
+
+    def __init__(self, ttl=5):
+        """
+        :param ttl: 持仓缓存的有效时间，单位为秒，0 表示不缓存
+        """
+        self.ttl = ttl
+        self._position = None
+        self._fetched = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, user):
+        """
+        :param user: 账户对象
+        :return: 缓存的持仓，过期时重新读取 user.position
+        """
+        # 在锁内读取持仓，同时到达的多个请求只读取一次，invalidate 也会等待读取完成
+        with self._lock:
+            if (
+                self._position is not None
+                and time.time() - self._fetched < self.ttl
+            ):
+                return self._position
+            self._position = user.position
+            self._fetched = time.time()
+            return self._position
+
+    def invalidate(self):
+        with self._lock:
+            self._position = None
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶，平均每秒 rate 次，最多连续 burst 次
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: 每秒补充的令牌数
+        :param burst: 令牌桶容量，即允许连续发送的次数
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate 必须大于 0, burst 必须不小于 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        获取一个令牌，令牌不足时等待
+        :return: 等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # 先扣除令牌再等待，并发请求按顺序排队
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class AccountRateLimiter:
+    """
+    按账户限制下单频率，每个账户一个令牌桶，互不影响
+
+    limits 的 key 可以是账户名(类似 'XueQiuTrader#0')、账户类名(类似 'XueQiuTrader')
+    或 '*' 表示其他账户，依次匹配，value 为 (每秒次数, 连续次数)
+    """
+
+    def __init__(self, limits):
+        """
+        :param limits: {账户名或账户类名: (每秒次数, 连续次数)}
+        """
+        self.limits = dict(limits)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, account, user):
+        for key in (account, type(user).__name__, "*"):
+            if key in self.limits:
+                return self.limits[key]
+        return None
+
+    def acquire(self, account, user):
+        """
+        :param account: 账户名
+        :param user: 账户对象
+        :return: 等待的秒数，没有限制时返回 None
+        """
+        with self._lock:
+            bucket = self._buckets.get(account)
+            if bucket is None:
+                limit = self._limit(account, user)
+                if limit is None:
+                    return None
+                bucket = self._buckets[account] = TokenBucket(*limit)
+        return bucket.acquire()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+录制及回放策略调仓接口的原始返回
+
+录制: follow 时设置 record_history='history.jsonl'，每次查询调仓接口的返回都会追加保存到文件
+回放: ReplayHarness 将录制的返回按录制时间依次交给 follower，
+    经过未修改的 poll_strategy -> 交易队列 -> trade_worker 流程下单到 ReplayUser，
+    用于在没有实盘平台时测试及对比跟踪流程的性能
+"""
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from .follower import BaseFollower
+
+# 兼容从 replay 导入录制相关的类
+# pylint: disable=unused-import
+from .history_record import (  # noqa: F401
+    HistoryRecord,
+    HistoryRecorder,
+    RecordedResponse,
+    load_history_records,
+)
+
+
+class ReplaySource:
+    """
+    回放录制的调仓接口返回，替代 follower 的 history_source
+
+    回放时间从第一条记录的查询时间开始，speed 为 1 时与录制时相同，
+    100 时快 100 倍，None 时不等待，尽快回放全部记录。
+    fetch 返回策略在当前回放时间之前最后一次查询的返回
+    """
+
+    def __init__(self, records, speed=1.0):
+        """
+        :param records: [HistoryRecord] 或录制文件路径
+        :param speed: 回放速度倍数, None 表示尽快回放
+        """
+        if isinstance(records, str):
+            records = load_history_records(records)
+        self.records = records
+        self.speed = speed
+        self._latest = {}
+        self._virtual_start = records[0].time if records else time.time()
+        self._position = self._virtual_start
+        self._wall_start = None
+
+    @property
+    def strategies(self):
+        """:return: [策略 id] 按首次出现的顺序"""
+        strategies = []
+        for record in self.records:
+            if record.strategy not in strategies:
+                strategies.append(record.strategy)
+        return strategies
+
+    @property
+    def duration(self):
+        """:return: 录制的时长，单位为秒"""
+        if not self.records:
+            return 0
+        return self.records[-1].time - self.records[0].time
+
+    def start(self):
+        self._wall_start = time.time()
+
+    def virtual_time(self):
+        if self.speed is None or self._wall_start is None:
+            return self._position
+        return (
+            self._virtual_start
+            + (time.time() - self._wall_start) * self.speed
+        )
+
+    def now(self):
+        """:return: datetime.datetime 当前回放时间，用于 follower.set_clock"""
+        return datetime.datetime.fromtimestamp(self.virtual_time())
+
+    def wait_until(self, record_time):
+        """按回放速度等待到 record_time"""
+        if self.speed is None:
+            return
+        delay = (record_time - self.virtual_time()) / self.speed
+        if delay > 0:
+            time.sleep(delay)
+
+    def advance(self, record):
+        """回放到 record，之后 fetch 对应策略时返回该记录"""
+        self._latest[record.strategy] = record
+        self._position = max(self._position, record.time)
+
+    def fetch(self, strategy):
+        record = self._latest.get(strategy)
+        if record is None:
+            raise ValueError(
+                "策略 {} 在当前回放时间之前没有录制记录".format(strategy)
+            )
+        return record.to_response()
+
+
+class ReplayUser:
+    """
+    记录收到的下单指令的模拟账户, 用于回放时代替券商账户
+    """
+
+    def __init__(self, delay=0.0, position=None):
+        """
+        :param delay: 模拟每次下单的耗时，单位为秒
+        :param position: position 属性返回的持仓列表
+        """
+        self.delay = delay
+        self.position = position or []
+        self.orders = []
+        self._lock = threading.Lock()
+
+    def buy(self, security, price, amount, entrust_prop="limit", **kwargs):
+        return self._order("buy", security, price, amount, entrust_prop)
+
+    def sell(self, security, price, amount, entrust_prop="limit", **kwargs):
+        return self._order("sell", security, price, amount, entrust_prop)
+
+    def _order(self, action, security, price, amount, entrust_prop):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.orders.append(
+                {
+                    "action": action,
+                    "security": security,
+                    "price": price,
+                    "amount": amount,
+                    "entrust_prop": entrust_prop,
+                }
+            )
+            return {"entrust_no": str(len(self.orders))}
+
+
+class ReplayHarness:
+    """
+    回放录制的调仓记录，驱动 follower 完整的去重及下单流程
+
+    按录制时间依次调用 follower.poll_strategy，follower 的时间由回放时间代替，
+    因此录制时未过期的指令在回放时同样不会过期。
+    尽快回放时，每当回放时间前进超过 drain_interval 秒，先等待已发出的指令全部下单完成，
+    避免交易队列中的指令因为回放时间前进过快而被判断为过期
+    """
+
+    def __init__(
+        self,
+        follower,
+        source,
+        users=None,
+        strategy_names=None,
+        strategy_kwargs=None,
+        drain_interval=1.0,
+        cmd_cache_file=None,
+        entrust_prop="limit",
+        send_interval=0,
+        **follow_options
+    ):
+        """
+        :param follower: 未登录的 follower 对象，类似 JoinQuantFollower()
+        :param source: ReplaySource 对象
+        :param users: 下单的账户列表，默认为一个 ReplayUser
+        :param strategy_names: {策略 id: 策略名}，默认使用策略 id
+        :param strategy_kwargs: {策略 id: 传递给 query_strategy_transaction 的参数},
+            雪球需要设置 {'ZH000001': {'assets': 10000}}
+        :param drain_interval: 尽快回放时等待下单完成的间隔，单位为回放时间的秒数
+        :param cmd_cache_file: 指令缓存文件路径，默认使用临时文件，回放结束后删除
+        :param entrust_prop: 委托方式
+        :param send_interval: 交易发送间隔
+        :param follow_options: 其他参数见 BaseFollower.follow
+        """
+        self.follower = follower
+        self.source = source
+        self.users = users if users is not None else [ReplayUser()]
+        self.strategy_names = strategy_names or {}
+        self.strategy_kwargs = strategy_kwargs or {}
+        self.drain_interval = drain_interval
+        self.cmd_cache_file = cmd_cache_file
+        self.entrust_prop = entrust_prop
+        self.send_interval = send_interval
+        self.follow_options = follow_options
+
+    def drain(self):
+        """等待已经发送到交易队列的指令全部执行完成"""
+        follower = self.follower
+        # pylint: disable=protected-access
+        if follower._order_netter is not None:
+            follower._order_netter.flush()
+        follower.trade_queue.join()
+        if follower._parallel_dispatch:
+            follower._dispatcher.wait()
+
+    def run(self):
+        """
+        回放全部录制记录
+        :return: dict 回放统计, 各账户的下单记录见 ReplayUser.orders
+        """
+        follower = self.follower
+        expire_seconds = self.follow_options.get(
+            "trade_cmd_expire_seconds", 120
+        )
+        # 子类的 follow 会查询策略信息并阻塞，这里只设置跟踪参数
+        BaseFollower.follow(
+            follower,
+            users=self.users,
+            strategies=self.source.strategies,
+            cmd_cache=False,
+            **self.follow_options
+        )
+        follower.history_source = self.source
+        follower.set_clock(self.source.now)
+
+        cache_dir = None
+        if self.cmd_cache_file is None:
+            cache_dir = tempfile.mkdtemp(prefix="easytrader_replay_")
+            follower.CMD_CACHE_FILE = os.path.join(cache_dir, "cmd_cache")
+        else:
+            follower.CMD_CACHE_FILE = self.cmd_cache_file
+
+        follower.start_trader_thread(
+            self.users, expire_seconds, self.entrust_prop, self.send_interval
+        )
+
+        polls = commands = failed_polls = 0
+        started = time.time()
+        self.source.start()
+        drained_at = self.source.virtual_time()
+        for record in self.source.records:
+            if self.source.speed is None:
+                if record.time - drained_at >= self.drain_interval:
+                    self.drain()
+                    drained_at = record.time
+            else:
+                self.source.wait_until(record.time)
+            self.source.advance(record)
+            new_cmds = follower.poll_strategy(
+                record.strategy,
+                self.strategy_names.get(record.strategy, record.strategy),
+                **self.strategy_kwargs.get(record.strategy, {})
+            )
+            polls += 1
+            if new_cmds is None:
+                failed_polls += 1
+            else:
+                commands += new_cmds
+        self.drain()
+        elapsed = time.time() - started
+        follower.stop_trader_thread()
+
+        # pylint: disable=protected-access
+        if follower._cmd_journal is not None:
+            follower._cmd_journal.close()
+            follower._cmd_journal = None
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        orders = sum(
+            len(user.orders) for user in self.users if hasattr(user, "orders")
+        )
+        return {
+            "polls": polls,
+            "failed_polls": failed_polls,
+            "commands": commands,
+            "orders": orders,
+            "elapsed": elapsed,
+            "virtual_elapsed": self.source.duration,
+            "polls_per_second": polls / elapsed if elapsed else 0,
+            "commands_per_second": commands / elapsed if elapsed else 0,
+        }
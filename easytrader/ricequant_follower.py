@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import json
 from datetime import datetime
-from threading import Thread
 
 from .follower import BaseFollower
 from .log import log
+from .history_record import RecordedResponse
 
 
 class RiceQuantFollower(BaseFollower):
@@ -17,6 +18,9 @@ class RiceQuantFollower(BaseFollower):
 
         self.client = RQOpenClient(user, password, logger=log)
 
+    def shard_state(self):
+        return dict(super().shard_state(), client=self.client)
+
     def follow(
         self,
         users,
@@ -26,6 +30,7 @@ class RiceQuantFollower(BaseFollower):
         cmd_cache=True,
         entrust_prop="limit",
         send_interval=0,
+        **kwargs
     ):
         """跟踪ricequant对应的模拟交易，支持多用户多策略
         :param users: 支持easytrader的用户对象，支持使用 [] 指定多个用户
@@ -35,7 +40,16 @@ class RiceQuantFollower(BaseFollower):
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param entrust_prop: 委托方式, 'limit' 为限价，'market' 为市价, 仅在银河实现
         :param send_interval: 交易发送间隔， 默认为0s。调大可防止卖出买入时卖出单没有及时成交导致的买入金额不足
+        :param kwargs: 其他参数见 BaseFollower.follow
         """
+        super().follow(
+            users=users,
+            strategies=run_id,
+            track_interval=track_interval,
+            trade_cmd_expire_seconds=trade_cmd_expire_seconds,
+            cmd_cache=cmd_cache,
+            **kwargs
+        )
         users = self.warp_list(users)
         run_ids = self.warp_list(run_id)
 
@@ -46,20 +60,19 @@ class RiceQuantFollower(BaseFollower):
             users, trade_cmd_expire_seconds, entrust_prop, send_interval
         )
 
-        workers = []
-        for id_ in run_ids:
-            strategy_name = self.extract_strategy_name(id_)
-            strategy_worker = Thread(
-                target=self.track_strategy_worker,
-                args=[id_, strategy_name],
-                kwargs={"interval": track_interval},
-            )
-            strategy_worker.start()
-            workers.append(strategy_worker)
-            log.info("开始跟踪策略: %s", strategy_name)
+        strategy_workers = self.bootstrap_strategies(
+            run_ids, self._bootstrap_strategy
+        )
+        workers = self.start_strategy_workers(strategy_workers, track_interval)
         for worker in workers:
             worker.join()
 
+    def _bootstrap_strategy(self, run_id):
+        strategy_name = self.cached_bootstrap_value(
+            "name", run_id, self.extract_strategy_name
+        )
+        return run_id, strategy_name, {}
+
     def extract_strategy_name(self, run_id):
         ret_json = self.client.get_positions(run_id)
         if ret_json["code"] != 200:
@@ -82,9 +95,20 @@ class RiceQuantFollower(BaseFollower):
             raise RuntimeError(ret_json["msg"])
         return ret_json["resp"]["trades"]
 
+    def request_transaction_history(self, strategy):
+        trades = self.extract_day_trades(strategy)
+        return RecordedResponse(
+            content=json.dumps(trades, ensure_ascii=False).encode("utf8")
+        )
+
     def query_strategy_transaction(self, strategy, **kwargs):
-        transactions = self.extract_day_trades(strategy)
-        transactions = self.project_transactions(transactions, **kwargs)
+        rep = self.fetch_transaction_history(strategy)
+        # 当日成交未变化时跳过修整及去重
+        digest = self.digest_history(rep.content)
+        if self.is_history_unchanged(strategy, digest):
+            return []
+        transactions = self.project_transactions(rep.json(), **kwargs)
+        self.update_history_fingerprint(strategy, digest)
         return self.order_transactions_sell_first(transactions)
 
     @staticmethod
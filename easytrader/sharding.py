@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+将策略分配到多个进程中轮询及修整
+
+每个分片进程创建自己的 follower 对象，复制主进程的登录状态后跟踪分配到的策略,
+产生的交易指令通过队列发送回主进程，由主进程的交易线程统一下单;
+主进程将指令落盘后才写入各进程共享的 SharedCmdStore
+"""
+import multiprocessing
+import sqlite3
+import threading
+
+from .cmd_cache import ExpiredCmdIndex
+from .log import log
+
+
+class SharedCmdStore(ExpiredCmdIndex):
+    """
+    保存在 SQLite(WAL 模式) 中的已执行指令索引，可以被多个进程同时使用
+
+    接口与 ExpiredCmdIndex 相同，每条指令写入后立即提交，不再需要指令日志
+    """
+
+    durable = True
+
+    def __init__(self, path, horizon=None):
+        """
+        :param path: 数据库文件路径
+        :param horizon: 指令保留时长，单位为秒，None 表示不淘汰
+        """
+        super().__init__(horizon)
+        self.path = path
+        self._dates = set()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS executed_cmds ("
+            "digest BLOB PRIMARY KEY, date TEXT)"
+        )
+        self._conn.commit()
+
+    def contains(self, key, signal_datetime):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM executed_cmds WHERE digest = ? AND date = ?",
+                (
+                    self.digest(key),
+                    signal_datetime.strftime(self.DATE_FORMAT),
+                ),
+            ).fetchone()
+        return row is not None
+
+    def _add_digest(self, date, digest):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO executed_cmds VALUES (?, ?)",
+                (digest, date.strftime(self.DATE_FORMAT)),
+            )
+            if date not in self._dates:
+                self._dates.add(date)
+                self._evict_locked()
+
+    def _evict_locked(self, now=None):
+        cutoff = self._cutoff(now)
+        if cutoff is None:
+            return 0
+        return self._conn.execute(
+            "DELETE FROM executed_cmds WHERE date < ?",
+            (cutoff.strftime(self.DATE_FORMAT),),
+        ).rowcount
+
+    def evict(self, now=None):
+        with self._lock, self._conn:
+            return self._evict_locked(now)
+
+    def records(self):
+        with self._lock:
+            return [
+                [date, digest.hex()]
+                for digest, date in self._conn.execute(
+                    "SELECT digest, date FROM executed_cmds"
+                )
+            ]
+
+    def clear(self):
+        """清空全部记录"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM executed_cmds")
+            self._dates.clear()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM executed_cmds"
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ShardCmdIndex(ExpiredCmdIndex):
+    """
+    分片进程中的已执行指令索引
+
+    查询时同时检查 SharedCmdStore，新发送的指令只记录在内存中,
+    由主进程在指令落盘后写入 SharedCmdStore，
+    指令在发送回主进程前丢失时，重启后会重新发送
+    """
+
+    durable = True
+
+    def __init__(self, shared, horizon=None):
+        """
+        :param shared: 各进程共享的 SharedCmdStore
+        :param horizon: 指令保留时长，单位为秒，None 表示不淘汰
+        """
+        super().__init__(horizon)
+        self.shared = shared
+
+    def contains(self, key, signal_datetime):
+        return super().contains(key, signal_datetime) or self.shared.contains(
+            key, signal_datetime
+        )
+
+
+def run_strategy_shard(
+    follower_cls,
+    state,
+    store_path,
+    horizon,
+    strategy_workers,
+    track_interval,
+    cmds,
+):
+    """
+    分片进程的入口，跟踪分配到的策略直到进程退出
+    :param follower_cls: follower 类
+    :param state: follower.shard_state() 返回的属性
+    :param store_path: SharedCmdStore 的文件路径
+    :param horizon: 历史指令的保留时长，单位为秒
+    :param strategy_workers: [(策略id, 策略名, 传递给 query_strategy_transaction 的参数)]
+    :param track_interval: 轮询策略的时间间隔，单位为秒
+    :param cmds: 发送交易指令到主进程的队列
+    """
+    follower = follower_cls()
+    follower.__dict__.update(state)
+    follower.expired_cmds = ShardCmdIndex(
+        SharedCmdStore(store_path, horizon=horizon), horizon=horizon
+    )
+    follower.cmd_sink = cmds
+    workers = follower.start_strategy_workers(strategy_workers, track_interval)
+    for worker in workers:
+        worker.join()
+
+
+class StrategyShardPool:
+    """
+    将策略平均分配到 processes 个进程中轮询及修整，交易指令发送回当前进程下单
+    """
+
+    def __init__(self, follower, processes):
+        """
+        :param follower: 主进程中负责下单的 follower 对象
+        :param processes: 分片进程数
+        """
+        self.follower = follower
+        self.processes = processes
+        self._cmds = None
+        self._procs = []
+
+    def start(self, strategy_workers, track_interval):
+        """
+        :param strategy_workers: [(策略id, 策略名, 传递给 query_strategy_transaction 的参数)]
+        :param track_interval: 轮询策略的时间间隔，单位为秒
+        :return: [threading.Thread] 接收交易指令的线程
+        """
+        # fork 会复制主进程中的锁及后台线程的状态，使用 spawn 启动干净的进程
+        ctx = multiprocessing.get_context("spawn")
+        self._cmds = ctx.Queue()
+        follower = self.follower
+        state = follower.shard_state()
+        for index in range(self.processes):
+            shard = strategy_workers[index :: self.processes]
+            if not shard:
+                continue
+            proc = ctx.Process(
+                target=run_strategy_shard,
+                args=(
+                    type(follower),
+                    state,
+                    follower.expired_cmds.path,
+                    follower.expired_cmds.horizon,
+                    shard,
+                    track_interval,
+                    self._cmds,
+                ),
+                name="strategy-shard-{}".format(index),
+            )
+            proc.daemon = True
+            proc.start()
+            self._procs.append(proc)
+            log.info(
+                "策略分片进程 %s 开始跟踪策略: %s",
+                proc.pid,
+                [strategy_name for _, strategy_name, _ in shard],
+            )
+        # 接收线程不是 daemon 线程，主线程返回后进程继续运行直到调用 stop
+        receiver = threading.Thread(target=self._receive_worker)
+        receiver.start()
+        return [receiver]
+
+    def _receive_worker(self):
+        while True:
+            trade_cmd = self._cmds.get()
+            if trade_cmd is None:
+                break
+            self.follower.latency.record_fetched(trade_cmd)
+            self.follower.put_trade_cmd(trade_cmd)
+            # 指令写入 trade_cmd_store 后才标记为已执行
+            self.follower.add_cmd_to_expired_cmds(trade_cmd)
+
+    def stop(self):
+        """结束全部分片进程"""
+        for proc in self._procs:
+            proc.terminate()
+        for proc in self._procs:
+            proc.join()
+        self._procs = []
+        if self._cmds is not None:
+            self._cmds.put(None)
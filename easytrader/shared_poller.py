@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+多个 follower 进程共享同一个调仓查询服务
+
+服务进程对每个被订阅的策略只查询一次调仓接口，将原始返回发布给所有订阅的 follower，
+follower 在本地修整及去重(雪球各账户的资金不同，修整结果也不同)，
+因此平台的查询压力与订阅的 follower 数量无关
+
+multiprocessing.connection 会反序列化收到的 pickle 数据，能够连接并通过认证的进程可以在对方进程中执行代码,
+因此服务只监听本机地址(127.0.0.1 / localhost / ::1、unix socket 或 Windows 命名管道)，
+并且没有默认的认证密钥: 需要传入 authkey，或者由服务进程随机生成并写入只有当前用户可读写(0600)的 authkey_file,
+follower 进程从该文件读取
+
+服务进程::
+
+    server = SharedPollerServer(xq_follower, address=('127.0.0.1', 6001), authkey_file='poller.key', track_interval=10)
+    server.serve_forever()
+
+follower 进程::
+
+    follower.follow(***, history_source=SharedPollerSource(('127.0.0.1', 6001), authkey_file='poller.key'))
+"""
+import collections
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from .log import log
+from .poll_scheduler import PollState
+from .history_record import HistoryRecord
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6001)
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+AUTHKEY_SIZE = 32
+
+
+def write_authkey(path, authkey):
+    """将认证密钥写入只有当前用户可读写的文件"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # 文件已经存在时 os.open 不会修改权限
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(authkey)
+
+
+def read_authkey(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _resolve_authkey(authkey, authkey_file):
+    if authkey is not None:
+        return authkey
+    if authkey_file is not None:
+        return read_authkey(authkey_file)
+    raise ValueError("需要设置 authkey 或 authkey_file")
+
+
+def _check_local_address(address):
+    # 字符串地址为 unix socket 路径或 Windows 命名管道，只能在本机连接
+    if isinstance(address, tuple) and address[0] not in LOOPBACK_HOSTS:
+        raise ValueError(
+            "调仓查询服务只能监听本机地址 {}, 当前地址: {}".format(
+                LOOPBACK_HOSTS, address
+            )
+        )
+
+
+class SharedPollerServer:
+    """
+    按订阅查询策略调仓并发布给订阅者
+
+    每个策略一个轮询线程，调仓记录变化时才发布，新的订阅者会立即收到最近一次的调仓记录，
+    策略没有订阅者后停止轮询
+    """
+
+    def __init__(
+        self,
+        follower,
+        address=DEFAULT_ADDRESS,
+        authkey=None,
+        track_interval=10,
+        authkey_file=None,
+    ):
+        """
+        :param follower: 已登录的 follower 对象，用于查询调仓接口
+        :param address: 监听地址，host 为本机地址的 (host, port) 或 unix socket 路径
+        :param authkey: 订阅者连接时的认证密钥
+        :param track_interval: 轮询策略的时间间隔，单位为秒,
+            设置 follower 的 poll_scheduler 时使用 poll_scheduler
+        :param authkey_file: 未设置 authkey 时随机生成密钥并写入该文件(权限 0600),
+            订阅者从该文件读取密钥
+        """
+        _check_local_address(address)
+        if authkey is None:
+            if authkey_file is None:
+                raise ValueError("需要设置 authkey 或 authkey_file")
+            authkey = os.urandom(AUTHKEY_SIZE)
+            write_authkey(authkey_file, authkey)
+        self.follower = follower
+        self.address = address
+        self.authkey = authkey
+        self.track_interval = track_interval
+        self._subscribers = collections.defaultdict(set)
+        self._latest = {}
+        self._pollers = {}
+        self._send_locks = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stopped = threading.Event()
+
+    def listen(self):
+        if self._listener is None:
+            self._listener = Listener(self.address, authkey=self.authkey)
+            # 端口为 0 时使用系统分配的端口
+            self.address = self._listener.address
+            log.info("调仓查询服务开始监听: %s", self.address)
+
+    def serve_forever(self):
+        self.listen()
+        while not self._stopped.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._stopped.is_set():
+                    break
+                log.exception("接受订阅连接失败")
+                continue
+            # pylint: disable=broad-except
+            except Exception as e:
+                log.warning("订阅连接认证失败: %s", e)
+                continue
+            with self._lock:
+                self._send_locks[conn] = threading.Lock()
+            handler = threading.Thread(target=self._handle_client, args=[conn])
+            handler.daemon = True
+            handler.start()
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self.listen()
+        server = threading.Thread(target=self.serve_forever)
+        server.daemon = True
+        server.start()
+        return server
+
+    def stop(self):
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.close()
+
+    def _handle_client(self, conn):
+        try:
+            while True:
+                command, strategy = conn.recv()
+                if command == "subscribe":
+                    self._subscribe(conn, strategy)
+        # 连接被其他线程关闭后 recv 会抛出 TypeError
+        except (EOFError, OSError, TypeError):
+            pass
+        finally:
+            self._remove_client(conn)
+
+    def _subscribe(self, conn, strategy):
+        with self._lock:
+            self._subscribers[strategy].add(conn)
+            latest = self._latest.get(strategy)
+            if strategy not in self._pollers:
+                poller = threading.Thread(
+                    target=self._poll_worker, args=[strategy]
+                )
+                poller.daemon = True
+                self._pollers[strategy] = poller
+                poller.start()
+                log.info("开始轮询策略: %s", strategy)
+        if latest is not None:
+            self._send(conn, latest)
+
+    def _remove_client(self, conn):
+        with self._lock:
+            for subscribers in self._subscribers.values():
+                subscribers.discard(conn)
+            self._send_locks.pop(conn, None)
+        conn.close()
+
+    def _send(self, conn, record):
+        with self._lock:
+            send_lock = self._send_locks.get(conn)
+        if send_lock is None:
+            return
+        try:
+            with send_lock:
+                conn.send(record)
+        except (EOFError, OSError) as e:
+            log.warning("发布调仓记录失败，断开订阅连接: %s", e)
+            self._remove_client(conn)
+
+    def _poll_worker(self, strategy):
+        scheduler = self.follower.create_poll_scheduler(self.track_interval)
+        state = PollState()
+        while not self._stopped.is_set():
+            with self._lock:
+                if not self._subscribers[strategy]:
+                    del self._pollers[strategy]
+                    log.info("策略 %s 没有订阅者，停止轮询", strategy)
+                    return
+            state.record(self.poll_once(strategy))
+            time.sleep(scheduler.next_delay(state, self.follower.clock()))
+
+    def poll_once(self, strategy):
+        """
+        查询一次策略调仓，变化时发布给订阅者
+        :return: int 发布的次数，0 表示未变化, 查询失败时返回 None
+        """
+        follower = self.follower
+        try:
+            rep = follower.fetch_transaction_history(strategy)
+            if rep.status_code == 304:
+                return 0
+            digest = follower.digest_history(rep.content)
+            if follower.is_history_unchanged(strategy, digest):
+                return 0
+            # 保存处理位置，雪球下次查询时向后翻页到该位置
+            _, progress = follower.extract_new_transactions(
+                strategy, rep.json()
+            )
+        # pylint: disable=broad-except
+        except Exception as e:
+            log.exception("无法获取策略 %s 调仓信息, 错误: %s", strategy, e)
+            return None
+        if progress is not None:
+            # pylint: disable=protected-access
+            follower._history_progress[strategy] = progress
+        follower.update_history_fingerprint(strategy, digest, rep.headers)
+
+        record = HistoryRecord(
+            time=time.time(),
+            strategy=strategy,
+            status_code=rep.status_code,
+            headers={
+                key: rep.headers[key]
+                for key in ("ETag", "Last-Modified")
+                if rep.headers.get(key)
+            },
+            content=rep.content,
+        )
+        with self._lock:
+            self._latest[strategy] = record
+            subscribers = list(self._subscribers[strategy])
+        for conn in subscribers:
+            self._send(conn, record)
+        return 1
+
+
+class SharedPollerSource:
+    """
+    订阅 SharedPollerServer 发布的调仓记录，作为 follower 的 history_source
+
+    每次 fetch 按顺序返回一条未处理的调仓记录，没有新记录时返回最近一次的记录,
+    follower 的 track_interval 只影响本地处理的延迟，不会增加平台的查询次数
+    """
+
+    def __init__(
+        self,
+        address=DEFAULT_ADDRESS,
+        authkey=None,
+        timeout=30,
+        authkey_file=None,
+    ):
+        """
+        :param address: SharedPollerServer 的监听地址
+        :param authkey: 认证密钥
+        :param timeout: 订阅后等待第一条调仓记录的最长时间，单位为秒
+        :param authkey_file: 未设置 authkey 时从该文件读取服务进程生成的密钥
+        """
+        _check_local_address(address)
+        self.address = address
+        self.authkey = _resolve_authkey(authkey, authkey_file)
+        self.timeout = timeout
+        self._conn = None
+        self._pending = collections.defaultdict(collections.deque)
+        self._latest = {}
+        self._subscribed = set()
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        conn = Client(self.address, authkey=self.authkey)
+        for strategy in self._subscribed:
+            conn.send(("subscribe", strategy))
+        self._conn = conn
+        reader = threading.Thread(target=self._read_worker, args=[conn])
+        reader.daemon = True
+        reader.start()
+
+    def _read_worker(self, conn):
+        try:
+            while True:
+                record = conn.recv()
+                with self._cond:
+                    self._pending[record.strategy].append(record)
+                    self._cond.notify_all()
+        except (EOFError, OSError, TypeError) as e:
+            if self._conn is conn:
+                log.error("与调仓查询服务的连接断开: %s", e)
+        with self._cond:
+            if self._conn is conn:
+                self._conn = None
+            self._cond.notify_all()
+
+    def fetch(self, strategy):
+        with self._cond:
+            if self._conn is None:
+                # 断线后重新连接并订阅全部策略
+                self._connect()
+            if strategy not in self._subscribed:
+                self._subscribed.add(strategy)
+                self._conn.send(("subscribe", strategy))
+            self._cond.wait_for(
+                lambda: self._pending[strategy]
+                or strategy in self._latest
+                or self._conn is None,
+                timeout=self.timeout,
+            )
+            if self._pending[strategy]:
+                self._latest[strategy] = self._pending[strategy].popleft()
+            record = self._latest.get(strategy)
+        if record is None:
+            raise TimeoutError(
+                "{} 秒内没有收到策略 {} 的调仓记录".format(self.timeout, strategy)
+            )
+        return record.to_response()
+
+    def close(self):
+        with self._cond:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .log import log
+
+
+class AccountDispatcher:
+    """
+    将交易指令同时分发到多个账户
+
+    每个账户对应一个只有一个线程的执行通道，同一账户的指令按分发顺序串行执行
+    (客户端 GUI 不支持并发操作)，不同账户之间并行执行，互不等待
+    """
+
+    def __init__(self):
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def account_name(user, index):
+        """
+        :param user: 账户对象
+        :param index: 账户在 users 中的位置
+        :return: str 用于日志及统计的账户名
+        """
+        return "{}#{}".format(type(user).__name__, index)
+
+    def submit(self, account, fn, *args, **kwargs):
+        """
+        提交任务到账户对应的执行通道
+        :param account: 账户名
+        :param fn: 执行的函数
+        :return: concurrent.futures.Future
+        """
+        with self._lock:
+            lane = self._lanes.get(account)
+            if lane is None:
+                lane = self._lanes[account] = ThreadPoolExecutor(max_workers=1)
+        future = lane.submit(fn, *args, **kwargs)
+        future.add_done_callback(
+            lambda f: self._log_lane_exception(account, f)
+        )
+        return future
+
+    @staticmethod
+    def _log_lane_exception(account, future):
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            log.error(
+                "账户 %s 执行交易指令出现未处理的异常: %s",
+                account,
+                exception,
+                exc_info=(type(exception), exception, exception.__traceback__),
+            )
+
+    def wait(self):
+        """等待所有账户通道中已提交的任务执行完成"""
+        with self._lock:
+            lanes = list(self._lanes.values())
+        for lane in lanes:
+            lane.submit(lambda: None).result()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            lanes = list(self._lanes.values())
+            self._lanes = {}
+        for lane in lanes:
+            lane.shutdown(wait=wait)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import datetime
+import heapq
+import itertools
+import queue
+import time
+
+from .log import log
+
+
+class TradeCmdQueue(queue.Queue):
+    """
+    跨策略的交易指令优先队列
+
+    所有策略的卖出指令排在买入指令之前，同一动作按距离过期时间由近到远排序，
+    出队时直接丢弃已经过期的指令，不再交给券商执行
+    """
+
+    def __init__(self, expire_seconds=120, maxsize=0):
+        """
+        :param expire_seconds: 交易指令过期时间, 单位为秒
+        :param maxsize: 队列最大长度，0 表示不限制
+        """
+        self.expire_seconds = expire_seconds
+        self.clock = datetime.datetime.now
+        # 设置后出队时过期的指令状态会保存到 trade_store.TradeCmdStore
+        self.store = None
+        super().__init__(maxsize)
+
+    # pylint: disable=attribute-defined-outside-init
+    def _init(self, maxsize):
+        self.queue = []
+        self._counter = itertools.count()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        heapq.heappush(
+            self.queue, (self._priority(item), next(self._counter), item)
+        )
+
+    def _get(self):
+        return heapq.heappop(self.queue)[-1]
+
+    def deadline(self, trade_cmd):
+        return trade_cmd["datetime"] + datetime.timedelta(
+            seconds=self.expire_seconds
+        )
+
+    def _priority(self, trade_cmd):
+        return (
+            0 if trade_cmd["action"] == "sell" else 1,
+            self.deadline(trade_cmd),
+        )
+
+    def get(self, block=True, timeout=None):
+        """获取下一条未过期的交易指令, 过期的指令会被丢弃, timeout 为总的等待时间"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+            trade_cmd = super().get(block, timeout)
+            now = self.clock()
+            if now <= self.deadline(trade_cmd):
+                return trade_cmd
+            log.warning(
+                "策略 [%s] 指令(股票: %s 动作: %s 数量: %s 价格: %s)超时，指令产生时间: %s 当前时间: %s, 超过设置的最大过期时间 %s 秒, 出队时被丢弃",
+                trade_cmd["strategy_name"],
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+                now,
+                self.expire_seconds,
+            )
+            if self.store is not None:
+                self.store.set_state(trade_cmd, "expired")
+            self.task_done()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import queue
+import sqlite3
+import threading
+
+from .log import log
+
+
+class TradeCmdStore:
+    """
+    保存在 SQLite(WAL 模式) 中的交易指令状态，用于重启后恢复未执行完的指令
+
+    指令状态: queued 进入交易队列, active 交易线程已取出, expired 过期, dropped 无效被丢弃,
+    done 重启时已没有需要下单的账户;
+    各账户状态: dispatched 已发送给券商, acked 下单成功, failed 下单失败。
+    新指令及 dispatched 状态在返回前提交，保证写入指令缓存及调用券商接口前已经落盘,
+    其他状态由后台线程批量提交，不等待磁盘
+    """
+
+    TERMINAL_STATES = ("expired", "dropped", "done")
+
+    def __init__(self, path, batch_size=500):
+        """
+        :param path: 数据库文件路径
+        :param batch_size: 后台线程每次提交的最大写入数
+        """
+        self.path = path
+        self._batch_size = batch_size
+        self._writes = queue.Queue()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS trade_cmds ("
+            "key TEXT PRIMARY KEY, cmd TEXT, state TEXT, updated REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS account_states ("
+            "key TEXT, account TEXT, state TEXT, updated REAL, "
+            "PRIMARY KEY (key, account))"
+        )
+        self._conn.commit()
+        self._writer = threading.Thread(target=self._write_worker)
+        self._writer.daemon = True
+        self._writer.start()
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now().timestamp()
+
+    def _insert_cmd(self, trade_cmd):
+        cmd = json.dumps(trade_cmd, default=str, ensure_ascii=False)
+        return (
+            "INSERT OR REPLACE INTO trade_cmds VALUES (?, ?, ?, ?)",
+            (trade_cmd["cmd_key"], cmd, "queued", self._now()),
+        )
+
+    def _write_now(self, writes):
+        """在当前线程中提交写入，返回时已经落盘"""
+        with self._db_lock, self._conn:
+            for write in writes:
+                self._conn.execute(*write)
+
+    def add(self, trade_cmd):
+        """记录新的交易指令, trade_cmd 需要包含 cmd_key"""
+        self._write_now([self._insert_cmd(trade_cmd)])
+
+    def replace(self, trade_cmds, netted_cmd):
+        """
+        用合并后的指令替换原始指令
+        :param trade_cmds: 已经通过 add 记录的原始指令
+        :param netted_cmd: 合并后的指令，买卖完全抵消时为 None
+        """
+        writes = [
+            ("DELETE FROM trade_cmds WHERE key = ?", (c["cmd_key"],))
+            for c in trade_cmds
+            if "cmd_key" in c
+        ]
+        if netted_cmd is not None and "cmd_key" in netted_cmd:
+            writes.append(self._insert_cmd(netted_cmd))
+        self._write_now(writes)
+
+    def set_state(self, trade_cmd, state):
+        if "cmd_key" not in trade_cmd:
+            return
+        self._writes.put(
+            (
+                "UPDATE trade_cmds SET state = ?, updated = ? WHERE key = ?",
+                (state, self._now(), trade_cmd["cmd_key"]),
+            )
+        )
+
+    def set_account_state(self, trade_cmd, account, state):
+        if "cmd_key" not in trade_cmd:
+            return
+        write = (
+            "INSERT OR REPLACE INTO account_states VALUES (?, ?, ?, ?)",
+            (trade_cmd["cmd_key"], account, state, self._now()),
+        )
+        if state == "dispatched":
+            # 下单前落盘，进程在下单后退出时重启不会重复下单
+            self._write_now([write])
+        else:
+            self._writes.put(write)
+
+    def _write_worker(self):
+        while True:
+            writes = [self._writes.get()]
+            while len(writes) < self._batch_size:
+                try:
+                    writes.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            done_events = []
+            try:
+                with self._db_lock, self._conn:
+                    for write in writes:
+                        if isinstance(write, threading.Event):
+                            done_events.append(write)
+                        else:
+                            self._conn.execute(*write)
+            # pylint: disable=broad-except
+            except Exception as e:
+                log.exception("保存交易指令状态失败: %s", e)
+            for event in done_events:
+                event.set()
+
+    def flush(self, timeout=None):
+        """等待已提交的写入全部完成"""
+        done = threading.Event()
+        self._writes.put(done)
+        return done.wait(timeout)
+
+    def pending(self, accounts):
+        """
+        查询未执行完的指令，并清理已经结束的指令
+        :param accounts: 当前的账户名列表
+        :return: [(trade_cmd, 需要下单的账户名集合, 状态不确定的账户名集合)]
+        """
+        self.flush()
+        with self._db_lock, self._conn:
+            account_states = {}
+            for key, account, state in self._conn.execute(
+                "SELECT key, account, state FROM account_states"
+            ):
+                account_states.setdefault(key, {})[account] = state
+            rows = self._conn.execute(
+                "SELECT key, cmd FROM trade_cmds WHERE state IN (?, ?)",
+                ("queued", "active"),
+            ).fetchall()
+
+            result = []
+            for key, cmd in rows:
+                states = account_states.get(key, {})
+                todo = {a for a in accounts if a not in states}
+                # 已发送但没有结果的下单可能已经成功，不自动重发
+                unknown = {
+                    a for a in accounts if states.get(a) == "dispatched"
+                }
+                if not todo and not unknown:
+                    self._conn.execute(
+                        "UPDATE trade_cmds SET state = ? WHERE key = ?",
+                        ("done", key),
+                    )
+                    continue
+                trade_cmd = json.loads(cmd)
+                trade_cmd["datetime"] = datetime.datetime.fromisoformat(
+                    trade_cmd["datetime"]
+                )
+                result.append((trade_cmd, todo, unknown))
+
+            self._conn.execute(
+                "DELETE FROM trade_cmds WHERE state IN (?, ?, ?)",
+                self.TERMINAL_STATES,
+            )
+            self._conn.execute(
+                "DELETE FROM account_states "
+                "WHERE key NOT IN (SELECT key FROM trade_cmds)"
+            )
+        return result
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -5,11 +5,13 @@ import json
 import re
 from datetime import datetime
 from numbers import Number
-from threading import Thread
 
 from . import helpers
+from .asset_sizer import NetValueRefresher, StrategyAssets
 from .follower import BaseFollower
 from .log import log
+from .position_cache import PositionSnapshotCache
+from .history_record import RecordedResponse
 
 
 class XueQiuFollower(BaseFollower):
@@ -17,12 +19,20 @@ class XueQiuFollower(BaseFollower):
     LOGIN_API = 'https://xueqiu.com/snowman/login'
     TRANSACTION_API = 'https://xueqiu.com/cubes/rebalancing/history.json'
     PORTFOLIO_URL = 'https://xueqiu.com/p/'
+    NET_VALUE_API = 'https://xueqiu.com/cubes/quote.json'
+    # 批量查询组合净值时每次请求的组合数
+    NET_VALUE_BATCH_SIZE = 50
     WEB_REFERER = 'https://www.xueqiu.com'
+    # 有游标时每页查询的调仓次数及最多查询的页数
+    REBALANCING_PAGE_SIZE = 20
+    MAX_REBALANCING_PAGES = 5
 
     def __init__(self):
         super().__init__()
         self._adjust_sell = None
         self._users = None
+        self._position_cache = PositionSnapshotCache()
+        self._net_value_refresher = None
 
     def login(self, user=None, password=None, **kwargs):
         """
@@ -55,7 +65,10 @@ class XueQiuFollower(BaseFollower):
             track_interval=10,
             trade_cmd_expire_seconds=120,
             cmd_cache=True,
-            slippage: float = 0.0):
+            slippage: float = 0.0,
+            position_cache_ttl=5,
+            net_value_refresh_interval=600,
+            **kwargs):
         """跟踪 joinquant 对应的模拟交易，支持多用户多策略
         :param users: 支持 easytrader 的用户对象，支持使用 [] 指定多个用户
         :param strategies: 雪球组合名, 类似 ZH123450
@@ -75,17 +88,29 @@ class XueQiuFollower(BaseFollower):
         :param trade_cmd_expire_seconds: 交易指令过期时间, 单位为秒
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param slippage: 滑点，0.0 表示无滑点, 0.05 表示滑点为 5%
+        :param position_cache_ttl: adjust_sell 时持仓缓存的有效时间，单位为秒，
+            第一个 user 下单成功后缓存立即失效
+        :param net_value_refresh_interval: 按 initial_assets 计算资金时，后台批量刷新组合净值的间隔，
+            单位为秒，None 表示只在启动时计算一次
+        :param kwargs: 其他参数见 BaseFollower.follow
         """
+        if adjust_sell and (kwargs.get('strategy_processes') or 0) > 1:
+            raise ValueError('adjust_sell 需要查询账户持仓, 不支持 strategy_processes')
         super().follow(users=users,
                        strategies=strategies,
                        track_interval=track_interval,
                        trade_cmd_expire_seconds=trade_cmd_expire_seconds,
                        cmd_cache=cmd_cache,
-                       slippage=slippage)
+                       slippage=slippage,
+                       **kwargs)
 
         self._adjust_sell = adjust_sell
+        self._position_cache.ttl = position_cache_ttl
 
         self._users = self.warp_list(users)
+        if net_value_refresh_interval:
+            self._net_value_refresher = NetValueRefresher(
+                self.fetch_net_values, interval=net_value_refresh_interval)
 
         strategies = self.warp_list(strategies)
         total_assets = self.warp_list(total_assets)
@@ -96,25 +121,30 @@ class XueQiuFollower(BaseFollower):
 
         self.start_trader_thread(self._users, trade_cmd_expire_seconds)
 
-        for strategy_url, strategy_total_assets, strategy_initial_assets in zip(
-                strategies, total_assets, initial_assets):
-            assets = self.calculate_assets(strategy_url, strategy_total_assets,
-                                           strategy_initial_assets)
-            try:
-                strategy_id = self.extract_strategy_id(strategy_url)
-                strategy_name = self.extract_strategy_name(strategy_url)
-            except:
-                log.error('抽取交易id和策略名失败, 无效模拟交易url: %s', strategy_url)
-                raise
-            strategy_worker = Thread(
-                target=self.track_strategy_worker,
-                args=[strategy_id, strategy_name],
-                kwargs={
-                    'interval': track_interval,
-                    'assets': assets
-                })
-            strategy_worker.start()
-            log.info('开始跟踪策略: %s', strategy_name)
+        strategy_workers = self.bootstrap_strategies(
+            list(zip(strategies, total_assets, initial_assets)),
+            self._bootstrap_strategy)
+        if self._net_value_refresher is not None:
+            self._net_value_refresher.start()
+        self.start_strategy_workers(strategy_workers, track_interval)
+
+    def _bootstrap_strategy(self, strategy):
+        strategy_url, strategy_total_assets, strategy_initial_assets = strategy
+        assets = self.calculate_assets(strategy_url, strategy_total_assets,
+                                       strategy_initial_assets)
+        try:
+            strategy_id = self.extract_strategy_id(strategy_url)
+            strategy_name = self.cached_bootstrap_value(
+                'name', strategy_url, self.extract_strategy_name)
+        except:
+            log.error('抽取交易id和策略名失败, 无效模拟交易url: %s', strategy_url)
+            raise
+        if (strategy_total_assets is None
+                and strategy_initial_assets is not None
+                and self._net_value_refresher is not None):
+            assets = StrategyAssets(strategy_initial_assets, assets)
+            self._net_value_refresher.add(strategy_id, assets)
+        return strategy_id, strategy_name, {'assets': assets}
 
     def calculate_assets(self,
                          strategy_url,
@@ -122,7 +152,8 @@ class XueQiuFollower(BaseFollower):
                          initial_assets=None):
         # 都设置时优先选择 total_assets
         if total_assets is None and initial_assets is not None:
-            net_value = self._get_portfolio_net_value(strategy_url)
+            net_value = self.cached_bootstrap_value(
+                'net_value', strategy_url, self._get_portfolio_net_value)
             total_assets = initial_assets * net_value
         if not isinstance(total_assets, Number):
             raise TypeError('input assets type must be number(int, float)')
@@ -141,23 +172,110 @@ class XueQiuFollower(BaseFollower):
         info_index = 0
         return rep.json()[info_index]['name']
 
-    def extract_transactions(self, history):
+    def extract_new_transactions(self, strategy, history):
+        # 游标为已处理的最新调仓 (created_at, id)
+        cursor = self._history_progress.get(strategy)
+        rebalancings = self.new_rebalancings(history, cursor)
+        return (self._extract_rebalancing_transactions(rebalancings),
+                self.advance_cursor(cursor, rebalancings))
+
+    def request_transaction_history(self, strategy):
+        """
+        查询组合调仓记录，有游标时向后翻页直到游标位置，
+        多页的调仓记录合并为一个返回
+        """
+        cursor = self._history_progress.get(strategy)
+        rep = super().request_transaction_history(strategy)
+        if cursor is None or rep.status_code != 200:
+            return rep
+
+        first_page = rep.json()
+        rebalancings = list(first_page.get('list') or [])
+        page = 1
+        history = first_page
+        while (rebalancings
+               and self._rebalancing_key(rebalancings[-1]) > cursor
+               and self._has_next_page(history, page)):
+            if page >= self.MAX_REBALANCING_PAGES:
+                log.warning('组合 %s 上次查询后的调仓超过 %s 页, 更早的调仓将被忽略',
+                            strategy, self.MAX_REBALANCING_PAGES)
+                break
+            page += 1
+            history = self.s.get(
+                self.TRANSACTION_API,
+                params=self.create_query_transaction_params(
+                    strategy, page)).json()
+            if not history.get('list'):
+                break
+            rebalancings.extend(history['list'])
+        if page == 1:
+            return rep
+
+        log.info('组合 %s 上次查询后有多次调仓, 查询了 %s 页调仓记录', strategy, page)
+        merged = dict(first_page, list=rebalancings, count=len(rebalancings))
+        return RecordedResponse(rep.status_code, rep.headers,
+                                json.dumps(merged).encode('utf8'))
+
+    def _has_next_page(self, history, page):
+        max_page = history.get('maxPage')
+        if max_page is not None:
+            return page < max_page
+        return len(history['list']) >= self.REBALANCING_PAGE_SIZE
+
+    @staticmethod
+    def _rebalancing_key(rebalancing):
+        return rebalancing['created_at'], rebalancing['id']
+
+    def new_rebalancings(self, history, cursor=None):
+        """
+        筛选游标之后的调仓
+        :param history: 调仓接口返回信息的字典对象
+        :param cursor: 已处理的最新调仓 (created_at, id)，None 表示只处理最新一次调仓
+        :return: [] 按时间由早到晚排序的调仓
+        """
         if history['count'] <= 0:
             return []
-        rebalancing_index = 0
-        raw_transactions = history['list'][rebalancing_index][
-            'rebalancing_histories']
+        if cursor is None:
+            return history['list'][:1]
+        return sorted((r for r in history['list']
+                       if self._rebalancing_key(r) > cursor),
+                      key=self._rebalancing_key)
+
+    def advance_cursor(self, cursor, rebalancings):
+        """
+        :param cursor: 当前游标
+        :param rebalancings: 本次处理的调仓，按时间由早到晚排序
+        :return: 新的游标，停在第一个未完成的调仓之前，下次查询时重新处理该调仓
+        """
+        for rebalancing in rebalancings:
+            if rebalancing.get('status') == 'pending':
+                pending_cursor = (rebalancing['created_at'] - 1, 0)
+                return max(cursor, pending_cursor) if cursor else pending_cursor
+            cursor = self._rebalancing_key(rebalancing)
+        return cursor
+
+    def extract_transactions(self, history):
+        return self._extract_rebalancing_transactions(
+            self.new_rebalancings(history))
+
+    @staticmethod
+    def _extract_rebalancing_transactions(rebalancings):
         transactions = []
-        for transaction in raw_transactions:
-            if transaction['price'] is None:
-                log.info('该笔交易无法获取价格，疑似未成交，跳过。交易详情: %s', transaction)
-                continue
-            transactions.append(transaction)
+        for rebalancing in rebalancings:
+            for transaction in rebalancing['rebalancing_histories']:
+                if transaction['price'] is None:
+                    log.info('该笔交易无法获取价格，疑似未成交，跳过。交易详情: %s',
+                             transaction)
+                    continue
+                transactions.append(transaction)
 
         return transactions
 
-    def create_query_transaction_params(self, strategy):
-        params = {'cube_symbol': strategy, 'page': 1, 'count': 1}
+    def create_query_transaction_params(self, strategy, page=1):
+        count = 1
+        if self._history_progress.get(strategy) is not None:
+            count = self.REBALANCING_PAGE_SIZE
+        params = {'cube_symbol': strategy, 'page': page, 'count': count}
         return params
 
     # noinspection PyMethodOverriding
@@ -168,6 +286,9 @@ class XueQiuFollower(BaseFollower):
 
     # noinspection PyMethodOverriding
     def project_transactions(self, transactions, assets):
+        if isinstance(assets, StrategyAssets):
+            # 由后台线程刷新，信号处理时不查询净值
+            assets = assets.value
         for transaction in transactions:
             weight_diff = self.none_to_zero(
                 transaction['weight']) - self.none_to_zero(
@@ -189,6 +310,17 @@ class XueQiuFollower(BaseFollower):
                     transaction['stock_code'],
                     transaction['amount'])
 
+    def _get_position(self):
+        """
+        读取第一个 user 的持仓，position_cache_ttl 秒内使用缓存,
+        同一批调仓记录中的多笔卖出只读取一次持仓
+        """
+        return self._position_cache.get(self._users[0])
+
+    def on_trade_cmd_sent(self, trade_cmd, user, response):
+        if self._users and user is self._users[0]:
+            self._position_cache.invalidate()
+
     def _adjust_sell_amount(self, stock_code, amount):
         """
         根据实际持仓值计算雪球卖出股数
@@ -204,8 +336,7 @@ class XueQiuFollower(BaseFollower):
         :rtype: int
         """
         stock_code = stock_code[-6:]
-        user = self._users[0]
-        position = user.position
+        position = self._get_position()
         try:
             stock = next(s for s in position if s['证券代码'] == stock_code)
         except StopIteration:
@@ -245,3 +376,32 @@ class XueQiuFollower(BaseFollower):
         """
         portfolio_info = self._get_portfolio_info(portfolio_code)
         return portfolio_info['net_value']
+
+    def fetch_net_values(self, portfolio_codes):
+        """
+        批量获取组合净值，批量接口中没有的组合单独查询组合页面
+        :param portfolio_codes: 组合代码列表
+        :return: {组合代码: 净值}
+        """
+        net_values = {}
+        for i in range(0, len(portfolio_codes), self.NET_VALUE_BATCH_SIZE):
+            batch = portfolio_codes[i:i + self.NET_VALUE_BATCH_SIZE]
+            try:
+                rep = self.s.get(self.NET_VALUE_API,
+                                 params={'code': ','.join(batch)})
+                quotes = rep.json()
+            except Exception as e:
+                log.warning('批量获取组合净值失败: %s', e)
+                quotes = {}
+            for code in batch:
+                quote = quotes.get(code)
+                if isinstance(quote, dict) and 'net_value' in quote:
+                    net_values[code] = quote['net_value']
+        for code in portfolio_codes:
+            if code in net_values:
+                continue
+            try:
+                net_values[code] = self._get_portfolio_net_value(code)
+            except Exception as e:
+                log.warning('获取组合 %s 净值失败: %s', code, e)
+        return net_values
@@ -106,4 +106,7 @@ class YHClientTrader(clienttrader.BaseLoginClientTrader):
     def balance(self):
         self._switch_left_menus(self._config.BALANCE_MENU_PATH)
 
+        return self._get_balance_data()
+
+    def _get_balance_data(self):
         return self._get_grid_data(self._config.BALANCE_GRID_CONTROL_ID)
@@ -93,7 +93,6 @@ setup(
         "flask",
         "pywinauto",
         "pillow",
-        "pandas",
     ],
     classifiers=[
         "Development Status :: 4 - Beta",
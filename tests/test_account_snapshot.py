@@ -0,0 +1,89 @@
+# coding:utf-8
+import time
+import unittest
+
+from easytrader.account_snapshot import (
+    AccountSnapshot,
+    AccountSnapshotCache,
+    freeze,
+    take_snapshot,
+)
+
+BALANCE_PAGE = ["查询[F4]", "资金股票"]
+
+
+class TestTakeSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.switched = []
+        self.pages = [
+            (BALANCE_PAGE, "balance", lambda: {"可用金额": 1000.0}),
+            (BALANCE_PAGE, "position", lambda: [{"证券代码": "000001"}]),
+            (["查询[F4]", "当日委托"], "today_entrusts", lambda: []),
+            (["查询[F4]", "当日成交"], "today_trades", lambda: []),
+        ]
+
+    def test_visit_each_page_once(self):
+        snapshot = take_snapshot(self.pages, self.switched.append)
+
+        self.assertEqual(
+            self.switched,
+            [BALANCE_PAGE, ["查询[F4]", "当日委托"], ["查询[F4]", "当日成交"]],
+        )
+        self.assertEqual(snapshot.balance["可用金额"], 1000.0)
+        self.assertEqual(snapshot.position[0]["证券代码"], "000001")
+        self.assertEqual(snapshot.today_trades, ())
+        self.assertLessEqual(snapshot.started, snapshot.timestamp)
+        self.assertLessEqual(snapshot.timestamp, time.time())
+
+    def test_snapshot_is_read_only(self):
+        snapshot = take_snapshot(self.pages, self.switched.append)
+
+        with self.assertRaises(TypeError):
+            snapshot.balance["可用金额"] = 0
+        with self.assertRaises(TypeError):
+            snapshot.position[0]["证券代码"] = "600000"
+        with self.assertRaises(AttributeError):
+            snapshot.position = ()
+
+    def test_age_counts_from_first_page(self):
+        def slow_page():
+            time.sleep(0.05)
+            return []
+
+        self.pages[-1] = (["查询[F4]", "当日成交"], "today_trades", slow_page)
+        snapshot = take_snapshot(self.pages, self.switched.append)
+        self.assertGreaterEqual(snapshot.timestamp - snapshot.started, 0.05)
+        self.assertGreaterEqual(snapshot.age, 0.05)
+
+    def test_freeze_nested(self):
+        frozen = freeze([{"a": [1, {"b": 2}]}])
+        self.assertEqual(frozen[0]["a"][1]["b"], 2)
+        self.assertIsInstance(frozen[0]["a"], tuple)
+
+
+class TestAccountSnapshotCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = AccountSnapshotCache()
+        self.loads = 0
+
+    def load(self, age=0):
+        self.loads += 1
+        now = time.time()
+        return AccountSnapshot(now, {}, (), (), (), started=now - age)
+
+    def test_reload_without_max_age(self):
+        self.cache.get(self.load)
+        self.cache.get(self.load)
+        self.assertEqual(self.loads, 2)
+
+    def test_reuse_within_max_age(self):
+        first = self.cache.get(self.load, max_age=10)
+        self.assertIs(self.cache.get(self.load, max_age=10), first)
+        self.assertEqual(self.loads, 1)
+
+    def test_reload_when_expired_or_invalidated(self):
+        self.cache.get(lambda: self.load(age=20), max_age=10)
+        self.cache.get(self.load, max_age=10)
+        self.cache.invalidate()
+        self.cache.get(self.load, max_age=10)
+        self.assertEqual(self.loads, 3)
@@ -0,0 +1,191 @@
+# coding:utf-8
+import importlib.util
+import sys
+import types
+import unittest
+
+
+def _import_clienttrader():
+    """没有安装 pywinauto 时使用空模块代替，只在导入 clienttrader 期间生效"""
+    stubs = {}
+    if importlib.util.find_spec("pywinauto") is None:
+        pywinauto = types.ModuleType("pywinauto")
+        pywinauto.clipboard = types.ModuleType("pywinauto.clipboard")
+        stubs = {
+            "pywinauto": pywinauto,
+            "pywinauto.clipboard": pywinauto.clipboard,
+        }
+    sys.modules.update(stubs)
+    try:
+        # pylint: disable=import-outside-toplevel
+        from easytrader import clienttrader
+
+        return clienttrader
+    finally:
+        for name in stubs:
+            sys.modules.pop(name, None)
+
+
+clienttrader = _import_clienttrader()
+
+BUY_PAGE = ["买入[F1]"]
+BALANCE_PAGE = ["查询[F4]", "资金股票"]
+
+
+class FakeMenuItem:
+    def __init__(self, app, path):
+        self._app = app
+        self._path = path
+
+    def is_selected(self):
+        return self._app.selected
+
+    def click(self):
+        self._app.clicks.append(self._path)
+
+
+class FakeMenuTree:
+    def __init__(self, app):
+        self._app = app
+
+    def is_visible(self):
+        return True
+
+    def get_item(self, path):
+        return FakeMenuItem(self._app, path)
+
+
+class FakeSpec:
+    def __init__(self, app):
+        self._app = app
+
+    def wait(self, *args, **kwargs):
+        return self
+
+    def wrapper_object(self):
+        self._app.menu_searches += 1
+        return FakeMenuTree(self._app)
+
+
+class FakeWindow:
+    def __init__(self, app):
+        self._app = app
+
+    def wrapper_object(self):
+        return self
+
+    def child_window(self, **criteria):
+        return FakeSpec(self._app)
+
+    def type_keys(self, keys, **kwargs):
+        self._app.keys.append(keys)
+
+
+class FakeApplication:
+    def __init__(self):
+        self.selected = True
+        self.clicks = []
+        self.keys = []
+        self.menu_searches = 0
+        self.window = FakeWindow(self)
+
+    def top_window(self):
+        return self.window
+
+    @property
+    def refreshes(self):
+        return self.keys.count("{F5}")
+
+
+class MenuTrader(clienttrader.ClientTrader):
+    def __init__(self, app):
+        super().__init__()
+        self._app = app
+        self._main = app.window
+
+    def wait(self, seconds):
+        pass
+
+
+class UnknownDialogHandler:
+    def __init__(self, app):
+        self.closed_unknown_dialog = True
+
+    def handle(self, title):
+        return {"message": title}
+
+
+class TestSwitchLeftMenus(unittest.TestCase):
+    def setUp(self):
+        self.app = FakeApplication()
+        self.trader = MenuTrader(self.app)
+        self.trader._switch_left_menus(BALANCE_PAGE)
+
+    def test_first_switch_clicks_and_refreshes(self):
+        self.assertEqual(self.app.clicks, [BALANCE_PAGE])
+        self.assertEqual(self.app.refreshes, 1)
+
+    def test_skip_fresh_page(self):
+        self.trader._switch_left_menus(BALANCE_PAGE)
+
+        self.assertEqual(self.app.clicks, [BALANCE_PAGE])
+        self.assertEqual(self.app.refreshes, 1)
+
+    def test_refresh_stale_page_without_click(self):
+        self.trader._menu_refreshed -= self.trader.menu_freshness + 1
+
+        self.trader._switch_left_menus(BALANCE_PAGE)
+
+        self.assertEqual(self.app.clicks, [BALANCE_PAGE])
+        self.assertEqual(self.app.refreshes, 2)
+
+    def test_click_again_when_not_selected(self):
+        # 菜单被手动切换到其他页面
+        self.app.selected = False
+
+        self.trader._switch_left_menus(BALANCE_PAGE)
+
+        self.assertEqual(self.app.clicks, [BALANCE_PAGE, BALANCE_PAGE])
+        self.assertEqual(self.app.refreshes, 2)
+
+    def test_click_when_switching_page(self):
+        self.trader._switch_left_menus(BUY_PAGE)
+
+        self.assertEqual(self.app.clicks, [BALANCE_PAGE, BUY_PAGE])
+        self.assertEqual(self.app.refreshes, 2)
+
+    def assert_reset(self):
+        self.assertIsNone(self.trader._menu_path)
+        self.assertIsNone(self.trader._left_menus)
+        searches = self.app.menu_searches
+
+        self.trader._switch_left_menus(BALANCE_PAGE)
+
+        self.assertEqual(self.app.clicks[-1], BALANCE_PAGE)
+        self.assertEqual(self.app.menu_searches, searches + 1)
+
+    def test_reset_after_closing_unknown_dialog(self):
+        dialogs = [True]
+        self.trader._is_exist_pop_dialog = lambda: bool(
+            dialogs and dialogs.pop()
+        )
+        self.trader._get_pop_dialog_title = lambda: "未知弹窗"
+
+        result = self.trader._handle_pop_dialogs(UnknownDialogHandler)
+
+        self.assertEqual(result, {"message": "未知弹窗"})
+        self.assert_reset()
+
+    def test_reset_after_refresh(self):
+        self.trader._switch_left_menus(BUY_PAGE)
+
+        self.trader.refresh()
+
+        self.assertEqual(self.app.clicks, [BALANCE_PAGE, BUY_PAGE, BUY_PAGE])
+        self.assertEqual(self.app.refreshes, 3)
+
+    def test_reset_after_shortcut(self):
+        self.trader._switch_left_menus_by_shortcut("{F1}")
+
+        self.assertEqual(self.app.keys[-1], "{F1}")
+        self.assert_reset()
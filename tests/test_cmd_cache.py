@@ -0,0 +1,133 @@
+# coding:utf-8
+import datetime
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from easytrader.cmd_cache import CmdJournal, ExpiredCmdIndex
+from easytrader.follower import BaseFollower
+
+
+class TestCmdJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "cmd_cache.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_append_and_replay(self):
+        journal = CmdJournal(self.path)
+        journal.open()
+        journal.append("策略_sh600000_buy")
+        journal.append("策略_sz000001_sell")
+        journal.close()
+
+        self.assertEqual(
+            CmdJournal(self.path).replay(),
+            ["策略_sh600000_buy", "策略_sz000001_sell"],
+        )
+
+    def test_replay_ignore_torn_last_record(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('"a"\n"b"\n"c')
+        journal = CmdJournal(self.path)
+        self.assertEqual(journal.replay(), ["a", "b"])
+
+        journal.open()
+        journal.append("d")
+        journal.close()
+        self.assertEqual(CmdJournal(self.path).replay(), ["a", "b", "d"])
+
+    def test_compact(self):
+        journal = CmdJournal(self.path, compact_ratio=2, compact_min_records=4)
+        journal.open()
+        need_compact = False
+        for key in "abcd":
+            need_compact = journal.append(key, live_count=1)
+        self.assertTrue(need_compact)
+
+        journal.compact(lambda: {"d"})
+        journal.append("e")
+        journal.close()
+        self.assertEqual(CmdJournal(self.path).replay(), ["d", "e"])
+
+
+class TestFollowerCmdCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.follower = BaseFollower()
+        self.follower.CMD_CACHE_FILE = os.path.join(
+            self.tmp_dir, "cmd_cache.journal"
+        )
+        self.follower.LEGACY_CMD_CACHE_FILE = os.path.join(
+            self.tmp_dir, "cmd_cache.pk"
+        )
+        self.cmd = {
+            "strategy_name": "test_strategy",
+            "stock_code": "sh600000",
+            "action": "buy",
+            "amount": 100,
+            "price": 10.0,
+            "datetime": datetime.datetime(2019, 1, 2, 10, 0),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_reload_expired_cmds(self):
+        self.follower.load_expired_cmd_cache()
+        self.follower.add_cmd_to_expired_cmds(self.cmd)
+        self.follower._cmd_journal.close()
+
+        follower = BaseFollower()
+        follower.CMD_CACHE_FILE = self.follower.CMD_CACHE_FILE
+        follower.load_expired_cmd_cache()
+        self.assertTrue(follower.is_cmd_expired(self.cmd))
+        follower._cmd_journal.close()
+
+    def test_migrate_legacy_pickle_cache(self):
+        key = self.follower.generate_expired_cmd_key(self.cmd)
+        with open(self.follower.LEGACY_CMD_CACHE_FILE, "wb") as f:
+            pickle.dump({key}, f)
+
+        self.follower.load_expired_cmd_cache()
+        self.follower._cmd_journal.close()
+        self.assertTrue(self.follower.is_cmd_expired(self.cmd))
+        self.assertEqual(
+            CmdJournal(self.follower.CMD_CACHE_FILE).replay(),
+            [["2019-01-02", ExpiredCmdIndex.digest(key).hex()]],
+        )
+
+    def test_cmd_beyond_horizon_is_expired(self):
+        self.follower.expired_cmds.horizon = 120
+        self.assertTrue(self.follower.is_cmd_expired(self.cmd))
+
+        self.cmd["datetime"] = datetime.datetime.now()
+        self.assertFalse(self.follower.is_cmd_expired(self.cmd))
+
+
+class TestExpiredCmdIndex(unittest.TestCase):
+    def test_evict_bucket_beyond_horizon(self):
+        index = ExpiredCmdIndex()
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+        now = datetime.datetime.now()
+        index.add("old", yesterday)
+        index.add("new", now)
+        self.assertTrue(index.contains("old", yesterday))
+
+        index.horizon = 120
+        self.assertEqual(index.evict(), 1)
+        self.assertFalse(index.contains("old", yesterday))
+        self.assertTrue(index.contains("new", now))
+        self.assertEqual(len(index), 1)
+
+    def test_add_legacy_key_record(self):
+        index = ExpiredCmdIndex()
+        key = "策略_sh600000_buy_100_10.0_2019-01-02 10:00:00"
+        index.add_record(key)
+        self.assertTrue(
+            index.contains(key, datetime.datetime(2019, 1, 2, 10, 0))
+        )
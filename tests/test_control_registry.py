@@ -0,0 +1,77 @@
+# coding:utf-8
+import unittest
+
+from easytrader.control_registry import ControlRegistry
+
+
+class FakeControl:
+    def __init__(self):
+        self.visible = True
+        self.destroyed = False
+
+    def is_visible(self):
+        if self.destroyed:
+            raise RuntimeError("invalid window handle")
+        return self.visible
+
+
+class FakeSpec:
+    def __init__(self, window, criteria):
+        self._window = window
+        self._criteria = criteria
+
+    def wrapper_object(self):
+        self._window.searches += 1
+        return FakeControl()
+
+
+class FakeWindow:
+    def __init__(self):
+        self.searches = 0
+
+    def child_window(self, **criteria):
+        return FakeSpec(self, criteria)
+
+
+class TestControlRegistry(unittest.TestCase):
+    def setUp(self):
+        self.window = FakeWindow()
+        self.registry = ControlRegistry(lambda: self.window)
+
+    def test_resolve_each_control_once(self):
+        first = self.registry.get(1032, "Edit")
+        for _ in range(10):
+            self.assertIs(self.registry.get(1032, "Edit"), first)
+        self.registry.get(1033, "Edit")
+
+        self.assertEqual(self.window.searches, 2)
+
+    def test_re_resolve_stale_controls(self):
+        hidden = self.registry.get(1032, "Edit")
+        hidden.visible = False
+        self.assertIsNot(self.registry.get(1032, "Edit"), hidden)
+
+        destroyed = self.registry.get(1032, "Edit")
+        destroyed.destroyed = True
+        self.assertIsNot(self.registry.get(1032, "Edit"), destroyed)
+        self.assertEqual(self.window.searches, 3)
+
+    def test_clear_when_window_changes(self):
+        self.registry.get(1032, "Edit")
+        self.window = FakeWindow()
+        self.registry.get(1032, "Edit")
+
+        self.assertEqual(self.window.searches, 1)
+
+    def test_disabled(self):
+        self.registry.enabled = False
+        self.registry.get(1032, "Edit")
+        self.registry.get(1032, "Edit")
+
+        self.assertEqual(self.window.searches, 2)
+
+    def test_is_valid(self):
+        control = FakeControl()
+        self.assertTrue(ControlRegistry.is_valid(control))
+        control.destroyed = True
+        self.assertFalse(ControlRegistry.is_valid(control))
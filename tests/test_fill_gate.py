@@ -0,0 +1,109 @@
+# coding:utf-8
+import datetime
+import time
+import unittest
+
+from easytrader.fill_gate import SellFillGate
+from easytrader.follower import BaseFollower
+
+
+class FillUser:
+    def __init__(self, fill_after):
+        self.fill_after = fill_after
+        self.orders = []
+        self.sent_at = {}
+        self.queries = 0
+
+    def _order(self, action, security, amount):
+        self.orders.append((action, security, amount))
+        entrust_no = str(len(self.orders))
+        self.sent_at[entrust_no] = (time.time(), amount)
+        return {"entrust_no": entrust_no}
+
+    def buy(self, security, price, amount, **kwargs):
+        return self._order("buy", security, amount)
+
+    def sell(self, security, price, amount, **kwargs):
+        return self._order("sell", security, amount)
+
+    @property
+    def today_trades(self):
+        self.queries += 1
+        now = time.time()
+        return [
+            {"合同编号": entrust_no, "成交数量": amount}
+            for entrust_no, (sent, amount) in self.sent_at.items()
+            if now - sent >= self.fill_after
+        ]
+
+
+def trade_cmd(action, stock_code, strategy="s1"):
+    return {
+        "strategy": strategy,
+        "strategy_name": strategy,
+        "action": action,
+        "stock_code": stock_code,
+        "amount": 100,
+        "price": 10.0,
+        "datetime": datetime.datetime.now(),
+    }
+
+
+class TestSellFillGate(unittest.TestCase):
+    def setUp(self):
+        self.follower = BaseFollower()
+        self.follower.follow(
+            users=[],
+            strategies=[],
+            parallel_dispatch=True,
+            wait_sell_fill=True,
+            sell_fill_timeout=2,
+        )
+        self.follower._fill_gate.poll_interval = 0.01
+
+    def execute(self, cmd, user):
+        for future in self.follower._execute_trade_cmd(
+            cmd, [user], 10, "limit", 0
+        ):
+            future.result()
+
+    def test_buy_waits_for_sell_fill(self):
+        user = FillUser(fill_after=0.2)
+        self.execute(trade_cmd("sell", "sh600000"), user)
+        start = time.time()
+        self.execute(trade_cmd("buy", "sh600001"), user)
+        waited = time.time() - start
+        self.assertGreaterEqual(waited, 0.15)
+        self.assertLess(waited, 1)
+        self.assertEqual([o[0] for o in user.orders], ["sell", "buy"])
+
+    def test_buy_of_other_strategy_does_not_wait(self):
+        user = FillUser(fill_after=10)
+        self.execute(trade_cmd("sell", "sh600000", "s1"), user)
+        self.execute(trade_cmd("buy", "sh600001", "s2"), user)
+        self.assertEqual(user.queries, 0)
+
+    def test_require_parallel_dispatch(self):
+        with self.assertRaises(ValueError):
+            BaseFollower().follow(
+                users=[], strategies=[], wait_sell_fill=True
+            )
+
+    def test_timeout(self):
+        gate = SellFillGate(timeout=0.1, poll_interval=0.01)
+        user = FillUser(fill_after=10)
+        gate.register_sell("user#0", trade_cmd("sell", "sh600000"), {})
+        gate.register_sell(
+            "user#0", trade_cmd("sell", "sh600001"), {"entrust_no": "1"}
+        )
+        self.assertFalse(
+            gate.wait_for_sells("user#0", user, trade_cmd("buy", "sh600002"))
+        )
+        # 超时后不再等待相同的卖出
+        self.assertTrue(
+            gate.wait_for_sells("user#0", user, trade_cmd("buy", "sh600003"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,316 @@
+# coding:utf-8
+import datetime
+import os
+import tempfile
+import threading
+import time
+import json
+import unittest
+from unittest import mock
+
+from easytrader.bootstrap_cache import BootstrapCache
+from easytrader.follower import BaseFollower
+from easytrader.joinquant_follower import JoinQuantFollower
+from easytrader.polling_engine import AsyncPollingEngine
+
+
+class FakeFollower(BaseFollower):
+    def __init__(self, query_delay=0.0):
+        super().__init__()
+        self.query_delay = query_delay
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def query_strategy_transaction(self, strategy, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.query_delay)
+        with self._lock:
+            self.running -= 1
+        return [
+            {
+                "action": "buy",
+                "stock_code": "sh600000",
+                "amount": 100,
+                "price": 10.0,
+                "datetime": datetime.datetime(2019, 1, 2, 10, 0),
+            }
+        ]
+
+    def add_cmd_to_expired_cmds(self, cmd):
+        self.expired_cmds.add(
+            self.generate_expired_cmd_key(cmd), cmd["datetime"]
+        )
+
+
+class TestAsyncPollingEngine(unittest.TestCase):
+    def test_poll_all_strategies_with_bounded_concurrency(self):
+        follower = FakeFollower(query_delay=0.05)
+        engine = AsyncPollingEngine(follower, max_concurrency=2)
+        for i in range(6):
+            engine.add_strategy("s{}".format(i), "name{}".format(i), 60)
+
+        worker = threading.Thread(target=engine.run)
+        worker.start()
+        deadline = time.time() + 5
+        while follower.trade_queue.qsize() < 6 and time.time() < deadline:
+            time.sleep(0.01)
+        engine.stop()
+        worker.join(5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(follower.trade_queue.qsize(), 6)
+        self.assertLessEqual(follower.max_running, 2)
+
+    def test_follow_reject_unknown_engine(self):
+        follower = FakeFollower()
+        with self.assertRaises(ValueError):
+            follower.follow(users=[], strategies=[], polling_engine="gevent")
+
+
+class SlowUser:
+    def __init__(self, delay):
+        self.delay = delay
+        self.orders = []
+
+    def buy(self, security, price, amount, **kwargs):
+        time.sleep(self.delay)
+        self.orders.append((security, price, amount))
+        return {"entrust_no": str(len(self.orders))}
+
+
+class TestParallelDispatch(unittest.TestCase):
+    def setUp(self):
+        self.trade_cmd = {
+            "strategy": "test_strategy",
+            "strategy_name": "test_strategy",
+            "action": "buy",
+            "stock_code": "sh600000",
+            "amount": 100,
+            "price": 10.0,
+            "datetime": datetime.datetime.now(),
+        }
+
+    def test_dispatch_to_all_users_at_once(self):
+        follower = FakeFollower()
+        follower._parallel_dispatch = True
+        users = [SlowUser(0.2) for _ in range(4)]
+
+        start = time.time()
+        futures = follower._execute_trade_cmd(
+            self.trade_cmd, users, 10, "limit", 0
+        )
+        for future in futures:
+            future.result()
+        self.assertLess(time.time() - start, 0.6)
+        for user in users:
+            self.assertEqual(user.orders, [("sh600000", 10.0, 100)])
+        summary = follower.latency.summary()
+        self.assertEqual(
+            summary[("broker", "account", "SlowUser#3")]["count"], 1
+        )
+        self.assertGreaterEqual(
+            summary[("broker", "account", "SlowUser#3")]["max"], 0.2
+        )
+        follower._dispatcher.shutdown()
+
+    def test_skip_invalid_cmd_without_dispatch(self):
+        follower = FakeFollower()
+        follower._parallel_dispatch = True
+        user = SlowUser(0)
+        self.trade_cmd["amount"] = 0
+
+        futures = follower._execute_trade_cmd(
+            self.trade_cmd, [user], 10, "limit", 0
+        )
+        self.assertEqual(futures, [])
+        self.assertEqual(user.orders, [])
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200, headers=None):
+        self.content = json.dumps(data).encode("utf8")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content.decode("utf8"))
+
+
+JQ_HISTORY = {
+    "data": {
+        "transaction": [
+            {
+                "date": "2019-01-02",
+                "time": "10:00",
+                "stock": "浦发银行(600000.XSHG)",
+                "transaction": "买",
+                "amount": "100股",
+                "price": 10.0,
+            }
+        ]
+    }
+}
+
+
+class TestHistoryChangeDetection(unittest.TestCase):
+    def setUp(self):
+        self.follower = JoinQuantFollower()
+        self.follower.s = mock.MagicMock()
+
+    def test_skip_unchanged_history(self):
+        self.follower.s.get.return_value = FakeResponse(
+            JQ_HISTORY, headers={"ETag": "v1"}
+        )
+        self.assertEqual(
+            len(self.follower.query_strategy_transaction("backtest")), 1
+        )
+
+        with mock.patch.object(
+            self.follower, "project_transactions"
+        ) as mock_project:
+            result = self.follower.query_strategy_transaction("backtest")
+        self.assertEqual(result, [])
+        mock_project.assert_not_called()
+        _, kwargs = self.follower.s.get.call_args
+        self.assertEqual(kwargs["headers"], {"If-None-Match": "v1"})
+
+    def test_not_modified_response(self):
+        self.follower.s.get.return_value = FakeResponse({}, status_code=304)
+        self.assertEqual(
+            self.follower.query_strategy_transaction("backtest"), []
+        )
+
+    def test_reprocess_history_after_projection_failure(self):
+        self.follower.s.get.return_value = FakeResponse(JQ_HISTORY)
+        with mock.patch.object(
+            self.follower, "project_transactions", side_effect=ValueError
+        ):
+            with self.assertRaises(ValueError):
+                self.follower.query_strategy_transaction("backtest")
+        self.assertEqual(
+            len(self.follower.query_strategy_transaction("backtest")), 1
+        )
+
+
+class TestJoinQuantHighWaterMark(unittest.TestCase):
+    def setUp(self):
+        self.follower = JoinQuantFollower()
+        self.follower.s = mock.MagicMock()
+        self.rows = []
+
+    def transaction(self, time_str, amount):
+        return {
+            "date": "2019-01-02",
+            "time": time_str,
+            "stock": "浦发银行(600000.XSHG)",
+            "transaction": "买",
+            "amount": "{}股".format(amount),
+            "price": 10.0,
+        }
+
+    def query(self, *new_rows):
+        self.rows.extend(self.transaction(*row) for row in new_rows)
+        self.follower.s.get.return_value = FakeResponse(
+            {"data": {"transaction": self.rows}}
+        )
+        with mock.patch.object(
+            self.follower,
+            "project_transactions",
+            wraps=self.follower.project_transactions,
+        ) as mock_project:
+            result = self.follower.query_strategy_transaction("backtest")
+        projected = mock_project.call_args[0][0]
+        return [t["amount"] for t in result], len(projected)
+
+    def test_project_only_new_rows(self):
+        self.assertEqual(
+            self.query(("09:31", 100), ("09:35", 200)), ([100, 200], 2)
+        )
+        self.assertEqual(self.query(("10:00", 300)), ([300], 1))
+        self.assertEqual(self.query(("10:01", 400)), ([400], 1))
+
+    def test_reprocess_latest_minute_when_row_count_changes(self):
+        self.query(("10:00", 100))
+        self.assertEqual(self.query(("10:00", 200)), ([100, 200], 2))
+
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "bootstrap_cache.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def follower(self):
+        follower = JoinQuantFollower()
+        follower.BOOTSTRAP_CACHE_FILE = self.path
+        BaseFollower.follow(
+            follower,
+            users=[],
+            strategies=[],
+            cmd_cache=False,
+            bootstrap_concurrency=4,
+        )
+        follower.requests = 0
+        follower.running = 0
+        follower.max_running = 0
+        lock = threading.Lock()
+
+        def extract_strategy_name(strategy_url):
+            with lock:
+                follower.requests += 1
+                follower.running += 1
+                follower.max_running = max(
+                    follower.max_running, follower.running
+                )
+            time.sleep(0.05)
+            with lock:
+                follower.running -= 1
+            return "name_" + strategy_url[-2:]
+
+        follower.extract_strategy_name = extract_strategy_name
+        return follower
+
+    def test_bootstrap_concurrently_and_cache_names(self):
+        base_url = "https://www.joinquant.com/algorithm/live/index"
+        urls = ["{}?backtestId=b{:02d}".format(base_url, i) for i in range(12)]
+        follower = self.follower()
+        workers = follower.bootstrap_strategies(
+            urls, follower._bootstrap_strategy
+        )
+
+        self.assertEqual(
+            workers,
+            [
+                ("b{:02d}".format(i), "name_{:02d}".format(i), {})
+                for i in range(12)
+            ],
+        )
+        self.assertEqual(follower.max_running, 4)
+        self.assertEqual(follower.requests, 12)
+
+        restarted = self.follower()
+        self.assertEqual(
+            restarted.bootstrap_strategies(
+                urls, restarted._bootstrap_strategy
+            ),
+            workers,
+        )
+        self.assertEqual(restarted.requests, 0)
+
+    def test_expired_cache_is_ignored(self):
+        cache = BootstrapCache(self.path, ttl=60)
+        cache.set("net_value", "ZH000001", 1.5)
+        cache.save()
+        self.assertEqual(
+            BootstrapCache(self.path).get("net_value", "ZH000001"), 1.5
+        )
+
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.assertIsNone(
+                BootstrapCache(self.path, ttl=60).get("net_value", "ZH000001")
+            )
@@ -0,0 +1,76 @@
+# coding:utf-8
+import os
+import tempfile
+import unittest
+
+from easytrader.grid_parser import GridParser, parse_grid
+
+GRID = (
+    "证券代码\t证券名称\t股票余额\t成本价\t可用\t\t证券名称\n"
+    "000001\t平安银行\t100\t10.5\tTrue\t\tA\n"
+    "600000\t浦发银行\t-200\t1e2\tfalse\t\tB\n"
+)
+
+
+class TestGridParser(unittest.TestCase):
+    def test_infer_types_like_pandas(self):
+        records = parse_grid(GRID, dtype={"证券代码": str}).records()
+
+        self.assertEqual(
+            records[0],
+            {
+                "证券代码": "000001",
+                "证券名称": "平安银行",
+                "股票余额": 100,
+                "成本价": 10.5,
+                "可用": True,
+                "Unnamed: 5": "",
+                "证券名称.1": "A",
+            },
+        )
+        self.assertIs(type(records[1]["股票余额"]), int)
+        self.assertEqual(records[1]["成本价"], 100.0)
+        self.assertIs(records[1]["可用"], False)
+
+    def test_infer_without_dtype(self):
+        grid = parse_grid(GRID)
+        self.assertEqual(grid.column("证券代码"), [1, 600000])
+
+    def test_empty_cell_keeps_column_as_str(self):
+        grid = parse_grid("数量\t价格\n100\t\n\t1.5\n")
+        self.assertEqual(grid.column("数量"), ["100", ""])
+        self.assertEqual(grid.column("价格"), ["", "1.5"])
+
+    def test_column_oriented(self):
+        grid = parse_grid(GRID, dtype={"证券代码": str})
+        self.assertEqual(len(grid), 2)
+        self.assertEqual(grid.columns[-1], "证券名称.1")
+        self.assertEqual(grid.column("股票余额"), [100, -200])
+
+    def test_header_only_and_empty(self):
+        self.assertEqual(parse_grid("证券代码\t证券名称\n").records(), [])
+        self.assertEqual(parse_grid("").records(), [])
+
+    def test_ragged_rows(self):
+        grid = parse_grid("a\tb\n1\n2\t3\t4\n")
+        self.assertEqual(
+            grid.records(), [{"a": 1, "b": ""}, {"a": 2, "b": "3"}]
+        )
+
+    def test_read_gbk_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "grid.xls")
+            with open(path, "w", encoding="gbk") as f:
+                f.write(GRID)
+            grid = GridParser({"证券代码": str}).read(path)
+        self.assertEqual(grid.column("证券名称"), ["平安银行", "浦发银行"])
+
+    def test_values_only_python_treats_as_numbers(self):
+        grid = parse_grid("a\tb\tc\n1_000\tnan\t1.5\n2\t1.0\tinf\n")
+        self.assertEqual(grid.column("a"), ["1_000", "2"])
+        self.assertEqual(grid.column("b"), ["nan", "1.0"])
+        self.assertEqual(grid.column("c"), [1.5, float("inf")])
+
+    def test_duplicate_columns_skip_existing_names(self):
+        grid = parse_grid("a\ta\ta.1\n1\t2\t3\n")
+        self.assertEqual(grid.columns, ("a", "a.2", "a.1"))
@@ -0,0 +1,36 @@
+# coding:utf-8
+import time
+import unittest
+
+from easytrader import helpers
+
+
+class TestWaitUntil(unittest.TestCase):
+    def test_return_as_soon_as_condition_holds(self):
+        ready_at = time.perf_counter() + 0.05
+
+        result = helpers.wait_until(
+            lambda: time.perf_counter() >= ready_at, timeout=1, interval=0.005
+        )
+
+        self.assertTrue(result.ok)
+        self.assertLess(result.elapsed, 0.5)
+        self.assertGreaterEqual(result.elapsed, 0.04)
+
+    def test_timeout(self):
+        result = helpers.wait_until(lambda: False, timeout=0.05)
+
+        self.assertFalse(result.ok)
+        self.assertGreaterEqual(result.elapsed, 0.05)
+
+    def test_exception_means_not_ready(self):
+        calls = []
+
+        def condition():
+            calls.append(1)
+            if len(calls) < 3:
+                raise RuntimeError("control not ready")
+            return True
+
+        self.assertTrue(helpers.wait_until(condition, timeout=1).ok)
+        self.assertEqual(len(calls), 3)
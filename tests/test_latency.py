@@ -0,0 +1,48 @@
+# coding:utf-8
+import datetime
+import time
+import unittest
+
+from easytrader.latency import LatencyRecorder, MetricsSink
+
+
+class ListSink(MetricsSink):
+    def __init__(self):
+        self.samples = []
+
+    def observe(self, name, value, tags):
+        self.samples.append((name, tags, value))
+
+
+class TestLatencyRecorder(unittest.TestCase):
+    def test_record_pipeline_stages(self):
+        sink = ListSink()
+        recorder = LatencyRecorder(sink=sink)
+        now = time.time()
+        trade_cmd = {
+            "strategy_name": "test_strategy",
+            "datetime": datetime.datetime.fromtimestamp(now - 10),
+        }
+        recorder.mark(trade_cmd, "fetched", now - 8)
+        recorder.record_fetched(trade_cmd)
+        recorder.mark(trade_cmd, "enqueued", now - 8)
+        recorder.mark(trade_cmd, "dequeued", now - 5)
+        recorder.record_dequeued(trade_cmd)
+        recorder.record_ack(trade_cmd, "user#0", now - 4, now)
+
+        summary = recorder.summary()
+        expected = {
+            ("fetch", "strategy", "test_strategy"): 2,
+            ("queue", "strategy", "test_strategy"): 3,
+            ("dispatch", "account", "user#0"): 1,
+            ("broker", "account", "user#0"): 4,
+            ("total", "strategy", "test_strategy"): 10,
+            ("total", "account", "user#0"): 10,
+        }
+        self.assertEqual(set(summary), set(expected))
+        for key, value in expected.items():
+            self.assertAlmostEqual(summary[key]["p50"], value, places=3)
+        self.assertEqual(len(sink.samples), len(expected))
+        self.assertEqual(
+            sink.samples[0][:2], ("fetch", {"strategy": "test_strategy"})
+        )
@@ -0,0 +1,63 @@
+# coding:utf-8
+import datetime
+import queue
+import unittest
+
+from easytrader.order_netting import OrderNetter
+
+
+def make_cmd(strategy, action, amount, stock_code="sh600000", price=10.0):
+    return {
+        "strategy": strategy,
+        "strategy_name": strategy,
+        "action": action,
+        "stock_code": stock_code,
+        "amount": amount,
+        "price": price,
+        "datetime": datetime.datetime(2019, 1, 2, 10, 0),
+    }
+
+
+class TestOrderNetter(unittest.TestCase):
+    def setUp(self):
+        self.output = queue.Queue()
+        self.netter = OrderNetter(self.output, window=60)
+
+    def get_all(self):
+        result = []
+        while not self.output.empty():
+            result.append(self.output.get_nowait())
+        return result
+
+    def test_net_orders_of_same_stock(self):
+        self.netter.put(make_cmd("a", "buy", 300, price=10.0))
+        self.netter.put(make_cmd("b", "sell", 100, price=9.9))
+        self.netter.put(make_cmd("c", "buy", 100, price=10.1))
+        other = make_cmd("a", "sell", 200, stock_code="sz000001")
+        self.netter.put(other)
+        self.netter.flush()
+
+        result = self.get_all()
+        self.assertEqual(len(result), 2)
+        self.assertIs(result[0], other)
+        netted = result[1]
+        self.assertEqual(netted["action"], "buy")
+        self.assertEqual(netted["amount"], 300)
+        self.assertEqual(netted["price"], 10.1)
+        self.assertEqual(netted["strategy_name"], "a+b+c")
+        self.assertEqual(
+            [s["strategy"] for s in netted["sources"]], ["a", "b", "c"]
+        )
+
+    def test_drop_fully_offset_orders(self):
+        self.netter.put(make_cmd("a", "buy", 200))
+        self.netter.put(make_cmd("b", "sell", 200))
+        self.netter.flush()
+
+        self.assertEqual(self.get_all(), [])
+        self.assertEqual(len(self.netter.records[-1]["sources"]), 2)
+
+    def test_flush_after_window(self):
+        netter = OrderNetter(self.output, window=0.05)
+        netter.put(make_cmd("a", "buy", 200))
+        self.assertEqual(self.output.get(timeout=2)["amount"], 200)
@@ -0,0 +1,94 @@
+# coding:utf-8
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from easytrader.follower import BaseFollower
+from easytrader.poll_scheduler import PollState, TradingSessionScheduler
+
+
+class TestTradingSessionScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = TradingSessionScheduler(
+            interval=10, fast_window=300, jitter=0, holidays=["2019-10-01"]
+        )
+        self.state = PollState()
+
+    def test_suspend_until_next_session(self):
+        lunch = datetime.datetime(2019, 1, 2, 12, 0)
+        self.assertEqual(self.scheduler.next_delay(self.state, lunch), 3600)
+
+        friday_close = datetime.datetime(2019, 1, 4, 15, 0)
+        monday_open = datetime.datetime(2019, 1, 7, 9, 15)
+        self.assertEqual(
+            self.scheduler.next_delay(self.state, friday_close),
+            (monday_open - friday_close).total_seconds(),
+        )
+
+        holiday = datetime.datetime(2019, 10, 1, 10, 0)
+        self.assertIsNone(self.scheduler.current_session(holiday))
+
+    def test_fast_interval_near_open_and_close(self):
+        near_open = datetime.datetime(2019, 1, 2, 13, 1)
+        near_close = datetime.datetime(2019, 1, 2, 14, 58)
+        middle = datetime.datetime(2019, 1, 2, 10, 0)
+        self.assertEqual(self.scheduler.next_delay(self.state, near_open), 5)
+        self.assertEqual(self.scheduler.next_delay(self.state, near_close), 5)
+        self.assertEqual(self.scheduler.next_delay(self.state, middle), 10)
+
+    def test_backoff_on_errors_and_idle(self):
+        middle = datetime.datetime(2019, 1, 2, 10, 0)
+        for _ in range(3):
+            self.state.record(None)
+        self.assertEqual(self.scheduler.next_delay(self.state, middle), 12)
+
+        self.state.record(0)
+        self.assertEqual(self.scheduler.next_delay(self.state, middle), 10)
+        for _ in range(self.scheduler.idle_threshold):
+            self.state.record(0)
+        self.assertEqual(self.scheduler.next_delay(self.state, middle), 20)
+
+        # 退避不会跳过收盘前的快速轮询时段
+        before_close = datetime.datetime(2019, 1, 2, 14, 54, 50)
+        self.assertEqual(
+            self.scheduler.next_delay(self.state, before_close), 10
+        )
+
+    def test_load_calendar_file(self):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".json", delete=False
+        ) as f:
+            json.dump(["2019-02-05"], f)
+        try:
+            scheduler = TradingSessionScheduler(calendar_file=f.name)
+        finally:
+            os.remove(f.name)
+        self.assertFalse(scheduler.is_trading_day(datetime.date(2019, 2, 5)))
+        self.assertTrue(scheduler.is_trading_day(datetime.date(2019, 2, 11)))
+
+
+class StopScheduler:
+    def __init__(self):
+        self.now = None
+
+    def next_delay(self, state, now=None):
+        self.now = now
+        # track_strategy_worker 收到 KeyboardInterrupt 后退出
+        raise KeyboardInterrupt
+
+
+class TestFollowerClock(unittest.TestCase):
+    def test_scheduler_uses_follower_clock(self):
+        scheduler = StopScheduler()
+        follower = BaseFollower()
+        follower.follow(
+            users=[], strategies=[], cmd_cache=False, poll_scheduler=scheduler
+        )
+        replay_time = datetime.datetime(2019, 1, 2, 12, 0)
+        follower.set_clock(lambda: replay_time)
+        follower.poll_strategy = lambda strategy, name, **kwargs: 0
+
+        follower.track_strategy_worker("s", "s")
+        self.assertEqual(scheduler.now, replay_time)
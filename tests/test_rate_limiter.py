@@ -0,0 +1,89 @@
+# coding:utf-8
+import datetime
+import time
+import unittest
+
+from easytrader.follower import BaseFollower
+from easytrader.rate_limiter import AccountRateLimiter, TokenBucket
+
+
+class FastUser:
+    def buy(self, security, price, amount, **kwargs):
+        return {"entrust_no": "1"}
+
+
+class SlowBrokerUser(FastUser):
+    pass
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_sustained_rate(self):
+        bucket = TokenBucket(rate=20, burst=3)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertAlmostEqual(waits[3], 0.05, delta=0.02)
+        self.assertAlmostEqual(waits[4], 0.05, delta=0.02)
+
+    def test_reject_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestAccountRateLimiter(unittest.TestCase):
+    def test_match_account_then_type_then_default(self):
+        limiter = AccountRateLimiter(
+            {"FastUser#1": (100, 1), "SlowBrokerUser": (1, 1), "*": (50, 2)}
+        )
+        self.assertEqual(limiter._limit("FastUser#1", FastUser()), (100, 1))
+        self.assertEqual(
+            limiter._limit("SlowBrokerUser#0", SlowBrokerUser()), (1, 1)
+        )
+        self.assertEqual(limiter._limit("FastUser#2", FastUser()), (50, 2))
+        self.assertIsNone(AccountRateLimiter({}).acquire("a", FastUser()))
+
+    def test_require_parallel_dispatch(self):
+        with self.assertRaises(ValueError):
+            BaseFollower().follow(
+                users=[], strategies=[], rate_limits={"*": (1, 1)}
+            )
+
+    def test_slow_account_does_not_throttle_fast_account(self):
+        follower = BaseFollower()
+        follower.follow(
+            users=[],
+            strategies=[],
+            parallel_dispatch=True,
+            rate_limits={"SlowBrokerUser": (2, 1)},
+        )
+        users = [SlowBrokerUser(), FastUser()]
+        trade_cmd = {
+            "strategy": "s",
+            "strategy_name": "s",
+            "action": "buy",
+            "stock_code": "sh600000",
+            "amount": 100,
+            "price": 10.0,
+            "datetime": datetime.datetime.now(),
+        }
+        start = time.time()
+        futures = []
+        for _ in range(3):
+            futures.extend(
+                follower._execute_trade_cmd(trade_cmd, users, 10, "limit", 0)
+            )
+        futures[-1].result()
+        self.assertLess(time.time() - start, 0.3)
+        for future in futures:
+            future.result()
+        self.assertGreaterEqual(time.time() - start, 0.9)
+
+        summary = follower.latency.summary()
+        waits = summary[("rate_limit", "account", "SlowBrokerUser#0")]
+        self.assertEqual(waits["count"], 3)
+        self.assertGreaterEqual(waits["max"], 0.4)
+        self.assertNotIn(("rate_limit", "account", "FastUser#1"), summary)
+        follower._dispatcher.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+# coding:utf-8
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from easytrader.joinquant_follower import JoinQuantFollower
+from easytrader.replay import (
+    HistoryRecorder,
+    RecordedResponse,
+    ReplayHarness,
+    ReplaySource,
+    ReplayUser,
+    load_history_records,
+)
+
+
+def jq_history(*transactions):
+    return {
+        "data": {
+            "transaction": [
+                {
+                    "date": "2019-01-02",
+                    "time": time_str,
+                    "stock": "浦发银行(600000.XSHG)",
+                    "transaction": action,
+                    "amount": "{}股".format(amount),
+                    "price": 10.0,
+                }
+                for time_str, action, amount in transactions
+            ]
+        }
+    }
+
+
+def response(data, headers=None):
+    return RecordedResponse(
+        headers=headers, content=json.dumps(data).encode("utf8")
+    )
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "history.jsonl")
+        # 2019-01-02 10:00 的时间戳，与 jq_history 中的信号时间一致
+        start = time.mktime((2019, 1, 2, 10, 0, 30, 0, 0, -1))
+        recorder = HistoryRecorder(self.path)
+        first = jq_history(("10:00", "买", 100))
+        second = jq_history(("10:00", "买", 100), ("10:01", "卖", 200))
+        recorder.record("bt1", response(first, {"ETag": "v1"}), start)
+        recorder.record("bt1", response(first), start + 10)
+        recorder.record("bt2", response(first), start + 15)
+        recorder.record("bt1", response(second), start + 40)
+        recorder.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_records_in_time_order(self):
+        with open(self.path, "a", encoding="utf8") as f:
+            f.write('{"time": 1')
+        records = load_history_records(self.path)
+        self.assertEqual(
+            [r.strategy for r in records], ["bt1", "bt1", "bt2", "bt1"]
+        )
+        self.assertEqual(records[0].headers, {"ETag": "v1"})
+        self.assertEqual(
+            records[0].to_response().json(), jq_history(("10:00", "买", 100))
+        )
+
+    def test_replay_through_follower_pipeline(self):
+        user = ReplayUser()
+        harness = ReplayHarness(
+            JoinQuantFollower(),
+            ReplaySource(self.path, speed=None),
+            users=[user],
+            strategy_names={"bt1": "strategy1", "bt2": "strategy2"},
+        )
+        stats = harness.run()
+
+        self.assertEqual(stats["polls"], 4)
+        self.assertEqual(stats["failed_polls"], 0)
+        self.assertEqual(stats["commands"], 3)
+        self.assertEqual(
+            user.orders,
+            [
+                {
+                    "action": "buy",
+                    "security": "sh600000",
+                    "price": 10.0,
+                    "amount": 100,
+                    "entrust_prop": "limit",
+                },
+                {
+                    "action": "buy",
+                    "security": "sh600000",
+                    "price": 10.0,
+                    "amount": 100,
+                    "entrust_prop": "limit",
+                },
+                {
+                    "action": "sell",
+                    "security": "sh600000",
+                    "price": 10.0,
+                    "amount": 200,
+                    "entrust_prop": "limit",
+                },
+            ],
+        )
+
+    def test_accelerated_replay(self):
+        source = ReplaySource(self.path, speed=400)
+        stats = ReplayHarness(JoinQuantFollower(), source).run()
+        self.assertEqual(stats["orders"], 3)
+        self.assertGreaterEqual(stats["elapsed"], source.duration / 400)
+
+    def test_stop_trader_thread_after_run(self):
+        source = ReplaySource(self.path, speed=None)
+        ReplayHarness(JoinQuantFollower(), source).run()
+        threads = threading.active_count()
+        for _ in range(3):
+            ReplayHarness(JoinQuantFollower(), source).run()
+        self.assertLessEqual(threading.active_count(), threads)
+
+    def test_record_live_responses(self):
+        follower = JoinQuantFollower()
+        follower.s = mock.MagicMock()
+        follower.s.get.return_value = response(
+            jq_history(("10:00", "买", 100))
+        )
+        follower.history_recorder = HistoryRecorder(self.path)
+        follower.query_strategy_transaction("bt3")
+        follower.history_recorder.close()
+
+        records = load_history_records(self.path)
+        self.assertEqual(records[-1].strategy, "bt3")
+        self.assertEqual(
+            records[-1].content, follower.s.get.return_value.content
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+# coding:utf-8
+import datetime
+import os
+import tempfile
+import queue
+import time
+import unittest
+from unittest import mock
+
+from easytrader.follower import BaseFollower
+from easytrader.replay import ReplayUser
+from easytrader.sharding import (
+    ShardCmdIndex,
+    SharedCmdStore,
+    StrategyShardPool,
+)
+
+
+class ShardFollower(BaseFollower):
+    """每次查询都返回同一条调仓记录，用于检查跨进程去重"""
+
+    def query_strategy_transaction(self, strategy, **kwargs):
+        return [
+            {
+                "action": "buy",
+                "stock_code": kwargs["stock_code"],
+                "amount": 100,
+                "price": 10.0,
+                "datetime": kwargs["signal"],
+            }
+        ]
+
+
+class TestSharedCmdStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cmd_cache.db")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.tmp_dir.cleanup()
+
+    def store(self, horizon=None):
+        store = SharedCmdStore(self.path, horizon=horizon)
+        self.stores.append(store)
+        return store
+
+    def test_records_are_visible_to_other_connections(self):
+        signal = datetime.datetime(2019, 1, 2, 10, 0)
+        writer, reader = self.store(), self.store()
+        self.assertFalse(reader.contains("a", signal))
+
+        record = writer.add("a", signal)
+
+        self.assertTrue(reader.contains("a", signal))
+        self.assertFalse(reader.contains("b", signal))
+        self.assertEqual(reader.records(), [record])
+        self.assertEqual(len(reader), 1)
+
+    def test_evict_and_clear(self):
+        old = datetime.datetime(2019, 1, 2, 10, 0)
+        now = datetime.datetime(2019, 1, 10, 10, 0)
+        store = self.store(horizon=86400)
+        store.clock = lambda: old
+        store.add("old", old)
+        store.add("new", now)
+
+        self.assertEqual(store.evict(now), 1)
+        self.assertEqual(len(store), 1)
+        self.assertTrue(store.contains("new", now))
+
+        store.clear()
+        self.assertEqual(len(self.store()), 0)
+
+
+class TestShardCmdIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.shared = SharedCmdStore(
+            os.path.join(self.tmp_dir.name, "cmd_cache.db")
+        )
+
+    def tearDown(self):
+        self.shared.close()
+        self.tmp_dir.cleanup()
+
+    def test_add_only_in_memory(self):
+        signal = datetime.datetime(2019, 1, 2, 10, 0)
+        index = ShardCmdIndex(self.shared)
+        self.shared.add("committed", signal)
+
+        index.add("sent", signal)
+
+        self.assertTrue(index.contains("committed", signal))
+        self.assertTrue(index.contains("sent", signal))
+        self.assertFalse(self.shared.contains("sent", signal))
+
+    def test_receiver_commits_after_put(self):
+        follower = mock.MagicMock()
+        pool = StrategyShardPool(follower, 2)
+        pool._cmds = queue.Queue()
+        trade_cmd = {"stock_code": "600000"}
+        pool._cmds.put(trade_cmd)
+        pool._cmds.put(None)
+
+        pool._receive_worker()
+
+        self.assertEqual(
+            [name for name, _, _ in follower.method_calls[1:]],
+            ["put_trade_cmd", "add_cmd_to_expired_cmds"],
+        )
+
+
+class TestStrategyShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.follower = ShardFollower()
+        self.follower.SHARED_CMD_CACHE_FILE = os.path.join(
+            self.tmp_dir.name, "cmd_cache.db"
+        )
+
+    def tearDown(self):
+        self.follower.stop_strategy_shards()
+        self.follower.expired_cmds.close()
+        self.tmp_dir.cleanup()
+
+    def test_shards_send_each_cmd_once(self):
+        user = ReplayUser()
+        self.follower.follow(
+            users=[user], strategies=[], cmd_cache=False, strategy_processes=2
+        )
+        self.follower.start_trader_thread([user], 120)
+        signal = datetime.datetime.now()
+        strategy_workers = [
+            (
+                "s{}".format(i),
+                "s{}".format(i),
+                {"stock_code": "60000{}".format(i), "signal": signal},
+            )
+            for i in range(4)
+        ]
+        self.follower.start_strategy_workers(strategy_workers, 0.05)
+
+        deadline = time.time() + 30
+        while len(user.orders) < 4 and time.time() < deadline:
+            time.sleep(0.05)
+        # 分片进程继续轮询，已执行的指令不会再次发送
+        time.sleep(0.5)
+
+        self.assertEqual(
+            sorted(order["security"] for order in user.orders),
+            ["600000", "600001", "600002", "600003"],
+        )
+        self.assertEqual(len(self.follower.expired_cmds), 4)
+
+
+class TestShardOptions(unittest.TestCase):
+    def test_reject_history_options(self):
+        for kwargs in (
+            {"record_history": "history.jsonl"},
+            {"history_source": mock.MagicMock()},
+        ):
+            with self.assertRaises(ValueError):
+                ShardFollower().follow(
+                    users=[], strategies=[], strategy_processes=2, **kwargs
+                )
@@ -0,0 +1,121 @@
+# coding:utf-8
+import json
+import os
+import stat
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from easytrader.joinquant_follower import JoinQuantFollower
+from easytrader.shared_poller import SharedPollerServer, SharedPollerSource
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.content = json.dumps(data).encode("utf8")
+        self.status_code = 200
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content.decode("utf8"))
+
+
+def jq_history(*amounts):
+    return {
+        "data": {
+            "transaction": [
+                {
+                    "date": "2019-01-02",
+                    "time": "10:0{}".format(i),
+                    "stock": "浦发银行(600000.XSHG)",
+                    "transaction": "买",
+                    "amount": "{}股".format(amount),
+                    "price": 10.0,
+                }
+                for i, amount in enumerate(amounts)
+            ]
+        }
+    }
+
+
+class TestSharedPoller(unittest.TestCase):
+    def setUp(self):
+        self.upstream = JoinQuantFollower()
+        self.upstream.s = mock.MagicMock()
+        self.upstream.s.get.return_value = FakeResponse(jq_history(100))
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.authkey_file = os.path.join(self.tmp_dir.name, "poller.key")
+        self.server = SharedPollerServer(
+            self.upstream,
+            address=("127.0.0.1", 0),
+            track_interval=60,
+            authkey_file=self.authkey_file,
+        )
+        self.server.start()
+        self.sources = []
+
+    def tearDown(self):
+        for source in self.sources:
+            source.close()
+        self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def subscriber(self):
+        source = SharedPollerSource(
+            self.server.address, timeout=5, authkey_file=self.authkey_file
+        )
+        self.sources.append(source)
+        follower = JoinQuantFollower()
+        follower.follow(
+            users=[], strategies=[], cmd_cache=False, history_source=source
+        )
+        return follower
+
+    def amounts(self, follower):
+        return [
+            t["amount"]
+            for t in follower.query_strategy_transaction("backtest")
+        ]
+
+    def wait_amounts(self, follower):
+        deadline = time.time() + 5
+        amounts = self.amounts(follower)
+        while not amounts and time.time() < deadline:
+            time.sleep(0.01)
+            amounts = self.amounts(follower)
+        return amounts
+
+    def test_fan_out_one_upstream_request(self):
+        followers = [self.subscriber() for _ in range(3)]
+        for follower in followers:
+            self.assertEqual(self.amounts(follower), [100])
+        self.assertEqual(self.upstream.s.get.call_count, 1)
+
+        self.upstream.s.get.return_value = FakeResponse(jq_history(100, 200))
+        self.assertEqual(self.server.poll_once("backtest"), 1)
+        self.assertEqual(self.server.poll_once("backtest"), 0)
+        for follower in followers:
+            self.assertEqual(self.wait_amounts(follower), [200])
+            self.assertEqual(self.amounts(follower), [])
+        self.assertEqual(self.upstream.s.get.call_count, 3)
+
+    def test_random_authkey_in_private_file(self):
+        self.assertEqual(len(self.server.authkey), 32)
+        if os.name == "posix":
+            mode = stat.S_IMODE(os.stat(self.authkey_file).st_mode)
+            self.assertEqual(mode, 0o600)
+
+    def test_require_authkey_and_local_address(self):
+        with self.assertRaises(ValueError):
+            SharedPollerServer(self.upstream, address=("127.0.0.1", 0))
+        with self.assertRaises(ValueError):
+            SharedPollerServer(
+                self.upstream, address=("0.0.0.0", 0), authkey=b"key"
+            )
+        with self.assertRaises(ValueError):
+            SharedPollerSource(("127.0.0.1", 6001))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# coding:utf-8
+import datetime
+import queue
+import threading
+import time
+import unittest
+
+from easytrader.trade_queue import TradeCmdQueue
+
+
+def make_cmd(action, seconds_ago, name="test_strategy"):
+    return {
+        "strategy": name,
+        "strategy_name": name,
+        "action": action,
+        "stock_code": "sh600000",
+        "amount": 100,
+        "price": 10.0,
+        "datetime": datetime.datetime.now()
+        - datetime.timedelta(seconds=seconds_ago),
+    }
+
+
+class TestTradeCmdQueue(unittest.TestCase):
+    def test_sell_first_then_nearest_deadline(self):
+        trade_queue = TradeCmdQueue(expire_seconds=120)
+        fresh_buy = make_cmd("buy", 1, "a")
+        old_buy = make_cmd("buy", 100, "b")
+        fresh_sell = make_cmd("sell", 2, "c")
+        old_sell = make_cmd("sell", 50, "d")
+        for cmd in [fresh_buy, old_buy, fresh_sell, old_sell]:
+            trade_queue.put(cmd)
+
+        result = [trade_queue.get_nowait() for _ in range(4)]
+        self.assertEqual(result, [old_sell, fresh_sell, old_buy, fresh_buy])
+
+    def test_drop_expired_cmd_on_get(self):
+        trade_queue = TradeCmdQueue(expire_seconds=120)
+        expired_sell = make_cmd("sell", 200)
+        buy = make_cmd("buy", 1)
+        trade_queue.put(expired_sell)
+        trade_queue.put(buy)
+
+        self.assertIs(trade_queue.get_nowait(), buy)
+        self.assertTrue(trade_queue.empty())
+
+    def test_timeout_covers_dropped_cmds(self):
+        trade_queue = TradeCmdQueue(expire_seconds=120)
+        stopped = threading.Event()
+
+        def put_expired():
+            # 最多持续 2 秒，超时未生效时测试失败而不是一直等待
+            end = time.time() + 2
+            while time.time() < end and not stopped.wait(0.05):
+                trade_queue.put(make_cmd("buy", 200))
+
+        producer = threading.Thread(target=put_expired)
+        producer.start()
+        start = time.time()
+        try:
+            with self.assertRaises(queue.Empty):
+                trade_queue.get(timeout=0.3)
+        finally:
+            stopped.set()
+            producer.join()
+        self.assertLess(time.time() - start, 1)
@@ -0,0 +1,141 @@
+# coding:utf-8
+import datetime
+import os
+import queue
+import tempfile
+import unittest
+
+from easytrader.follower import BaseFollower
+from easytrader.order_netting import OrderNetter
+from easytrader.replay import ReplayUser
+
+
+class TestTradeCmdStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "trade_cmds.db")
+        self.users = [ReplayUser(), ReplayUser()]
+        self.followers = []
+
+    def tearDown(self):
+        for follower in self.followers:
+            follower.trade_store.close()
+        self.tmp_dir.cleanup()
+
+    def follower(self):
+        follower = BaseFollower()
+        follower.follow(
+            users=self.users,
+            strategies=[],
+            cmd_cache=False,
+            trade_cmd_store=self.path,
+        )
+        self.followers.append(follower)
+        return follower
+
+    def trade_cmd(self, stock_code, seconds_ago=0):
+        return {
+            "strategy": "s",
+            "strategy_name": "s",
+            "action": "buy",
+            "stock_code": stock_code,
+            "amount": 100,
+            "price": 10.0,
+            "datetime": datetime.datetime.now()
+            - datetime.timedelta(seconds=seconds_ago),
+        }
+
+    def crash_writer(self, follower):
+        """后台线程不再提交批量写入，模拟写入前进程退出"""
+        store = follower.trade_store
+        store._writes = queue.Queue()
+        self.followers.remove(follower)
+        self.addCleanup(store._conn.close)
+
+    def restart_after_crash(self):
+        follower = self.follower()
+        follower.resume_trade_cmds(self.users, 120)
+        return follower
+
+    def restart(self):
+        self.followers[-1].trade_store.flush()
+        follower = self.follower()
+        follower.resume_trade_cmds(self.users, 120)
+        return follower
+
+    def test_resume_only_accounts_without_orders(self):
+        follower = self.follower()
+        follower.put_trade_cmd(self.trade_cmd("sh600000"))
+        trade_cmd = follower.trade_queue.get()
+        follower._send_trade_cmd(
+            trade_cmd, self.users[0], "ReplayUser#0", "limit"
+        )
+
+        follower = self.restart()
+        self.assertEqual(follower.trade_queue.qsize(), 1)
+        trade_cmd = follower.trade_queue.get()
+        self.assertEqual(trade_cmd["skip_accounts"], ["ReplayUser#0"])
+        follower._execute_trade_cmd(trade_cmd, self.users, 120, "limit", 0)
+        self.assertEqual(len(self.users[0].orders), 1)
+        self.assertEqual(len(self.users[1].orders), 1)
+
+        follower = self.restart()
+        self.assertEqual(follower.trade_queue.qsize(), 0)
+
+    def test_skip_expired_and_uncertain_cmds(self):
+        follower = self.follower()
+        follower.put_trade_cmd(self.trade_cmd("sh600000", seconds_ago=600))
+        follower.put_trade_cmd(self.trade_cmd("sh600001"))
+        follower.trade_store.flush()
+        trade_cmd = follower.trade_queue.get()
+        for index in range(2):
+            follower._set_trade_cmd_state(
+                trade_cmd, "dispatched", "ReplayUser#{}".format(index)
+            )
+
+        follower = self.restart()
+        self.assertEqual(follower.trade_queue.qsize(), 0)
+        self.assertEqual(follower.trade_store.pending(["ReplayUser#0"]), [])
+
+    def test_no_resend_when_crash_after_dispatch(self):
+        follower = self.follower()
+        follower.put_trade_cmd(self.trade_cmd("sh600000"))
+        trade_cmd = follower.trade_queue.get()
+        self.crash_writer(follower)
+        follower._send_trade_cmd(
+            trade_cmd, self.users[0], "ReplayUser#0", "limit"
+        )
+
+        follower = self.restart_after_crash()
+        trade_cmd = follower.trade_queue.get_nowait()
+        self.assertEqual(trade_cmd["skip_accounts"], ["ReplayUser#0"])
+        follower._execute_trade_cmd(trade_cmd, self.users, 120, "limit", 0)
+        self.assertEqual(len(self.users[0].orders), 1)
+        self.assertEqual(len(self.users[1].orders), 1)
+
+    def test_new_cmd_saved_before_cmd_cache(self):
+        follower = self.follower()
+        self.crash_writer(follower)
+        follower.put_trade_cmd(self.trade_cmd("sh600000"))
+
+        follower = self.restart_after_crash()
+        self.assertEqual(follower.trade_queue.qsize(), 1)
+
+    def test_netted_cmds_replace_sources(self):
+        follower = self.follower()
+        follower._order_netter = OrderNetter(follower.trade_queue, window=60)
+        follower._order_netter.store = follower.trade_store
+        buy = self.trade_cmd("sh600000")
+        sell = dict(self.trade_cmd("sh600000"), action="sell", amount=40)
+        sell["strategy_name"] = "t"
+        follower.put_trade_cmd(buy)
+        follower.put_trade_cmd(sell)
+        follower._order_netter.flush()
+
+        follower = self.restart()
+        self.assertEqual(follower.trade_queue.qsize(), 1)
+        self.assertEqual(follower.trade_queue.get()["amount"], 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
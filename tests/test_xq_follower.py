@@ -1,10 +1,15 @@
 # coding:utf-8
 import datetime
+import json
 import os
+import tempfile
+import threading
 import time
 import unittest
 from unittest import mock
 
+from easytrader.asset_sizer import NetValueRefresher, StrategyAssets
+from easytrader.replay import ReplayUser
 from easytrader.xq_follower import XueQiuFollower
 
 
@@ -64,6 +69,41 @@ class TestXueQiuTrader(unittest.TestCase):
             amount = follower._adjust_sell_amount(stock_code, sell_amount)
             self.assertEqual(amount, excepted_amount)
 
+    def test_adjust_sell_amount_read_position_once(self):
+        follower = XueQiuFollower()
+        follower._adjust_sell = True
+        user = mock.MagicMock()
+        position = mock.PropertyMock(return_value=TEST_POSITION)
+        type(user).position = position
+        follower._users = [user]
+
+        transactions = [
+            {
+                "weight": 0,
+                "prev_weight": 10,
+                "price": 10,
+                "stock_symbol": "SZ169101",
+                "created_at": int(time.time() * 1000),
+            }
+            for _ in range(3)
+        ]
+        follower.project_transactions(transactions, assets=100000)
+        self.assertEqual([t["amount"] for t in transactions], [600] * 3)
+        self.assertEqual(position.call_count, 1)
+
+        trade_cmd = {
+            "strategy": "test_strategy",
+            "strategy_name": "test_strategy",
+            "action": "sell",
+            "stock_code": "sz169101",
+            "amount": 600,
+            "price": 10.0,
+            "datetime": datetime.datetime.now(),
+        }
+        follower._execute_trade_cmd(trade_cmd, [user], 10, "limit", 0)
+        follower._adjust_sell_amount("169101", 600)
+        self.assertEqual(position.call_count, 2)
+
     def test_slippage_with_default(self):
         follower = XueQiuFollower()
         mock_user = mock.MagicMock()
@@ -144,6 +184,146 @@ class TestXqFollower(unittest.TestCase):
         self.assertTrue(len(result) == 1)
 
 
+class QuietXueQiuFollower(XueQiuFollower):
+    """不访问雪球的 follower，用于检查多进程跟踪时主进程不会退出"""
+
+    def extract_strategy_name(self, strategy_url):
+        return strategy_url
+
+    def query_strategy_transaction(self, strategy, **kwargs):
+        return []
+
+
+class TestShardedXqFollower(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.follower = QuietXueQiuFollower()
+        self.follower.SHARED_CMD_CACHE_FILE = os.path.join(
+            self.tmp_dir.name, "cmd_cache.db"
+        )
+
+    def tearDown(self):
+        self.follower.stop_strategy_shards()
+        self.follower.stop_trader_thread(timeout=5)
+        self.follower.expired_cmds.close()
+        self.tmp_dir.cleanup()
+
+    def test_follow_keeps_process_alive(self):
+        existing = set(threading.enumerate())
+        self.follower.follow(
+            users=[ReplayUser()],
+            strategies=["ZH000001", "ZH000002"],
+            total_assets=[10000, 10000],
+            initial_assets=[None, None],
+            track_interval=0.05,
+            cmd_cache=False,
+            net_value_refresh_interval=None,
+            bootstrap_cache=False,
+            strategy_processes=2,
+        )
+        time.sleep(0.5)
+
+        # follow 返回后需要有非 daemon 线程，否则脚本会立即退出并结束分片进程
+        self.assertTrue(
+            [
+                thread
+                for thread in threading.enumerate()
+                if thread not in existing and not thread.daemon
+                and thread.is_alive()
+            ]
+        )
+        self.assertTrue(
+            all(proc.is_alive() for proc in self.follower._shard_pool._procs)
+        )
+        self.assertEqual(len(self.follower._shard_pool._procs), 2)
+
+
+def rebalancing(rebalancing_id, created_at, status="success"):
+    return {
+        "id": rebalancing_id,
+        "status": status,
+        "created_at": created_at,
+        "rebalancing_histories": [
+            {
+                "stock_symbol": "SH6000{:02d}".format(rebalancing_id),
+                "price": None if status == "pending" else 10.0,
+                "weight": 10,
+                "prev_weight": 0,
+                "created_at": created_at,
+            }
+        ],
+    }
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.content = json.dumps(data).encode("utf8")
+        self.status_code = 200
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content.decode("utf8"))
+
+
+class TestRebalancingCursor(unittest.TestCase):
+    def setUp(self):
+        self.follower = XueQiuFollower()
+        self.follower.s = mock.MagicMock()
+        self.rebalancings = []
+        self.follower.s.get.side_effect = self.get
+
+    def get(self, url, params=None, headers=None):
+        page, count = params["page"], params["count"]
+        items = self.rebalancings[(page - 1) * count : page * count]
+        return FakeResponse(
+            {
+                "count": len(items),
+                "page": page,
+                "totalCount": len(self.rebalancings),
+                "maxPage": (len(self.rebalancings) + count - 1) // count,
+                "list": items,
+            }
+        )
+
+    def add(self, *rebalancings):
+        # 接口按时间由新到旧返回
+        self.rebalancings[:0] = reversed(rebalancings)
+
+    def query(self):
+        transactions = self.follower.query_strategy_transaction(
+            "ZH000001", assets=100000
+        )
+        return sorted(t["stock_code"] for t in transactions)
+
+    def test_catch_up_on_missed_rebalancings(self):
+        now = int(time.time() * 1000)
+        self.add(rebalancing(1, now))
+        self.assertEqual(self.query(), ["sh600001"])
+
+        self.follower.REBALANCING_PAGE_SIZE = 2
+        self.add(
+            rebalancing(2, now + 1),
+            rebalancing(3, now + 2),
+            rebalancing(4, now + 3),
+        )
+        self.assertEqual(self.query(), ["sh600002", "sh600003", "sh600004"])
+        pages = [
+            kwargs["params"]["page"]
+            for _, kwargs in self.follower.s.get.call_args_list
+        ]
+        self.assertEqual(pages, [1, 1, 2])
+        self.assertEqual(self.query(), [])
+
+    def test_reprocess_pending_rebalancing(self):
+        now = int(time.time() * 1000)
+        self.add(rebalancing(1, now, status="pending"))
+        self.assertEqual(self.query(), [])
+
+        self.rebalancings[0] = rebalancing(1, now)
+        self.add(rebalancing(2, now + 1))
+        self.assertEqual(self.query(), ["sh600001", "sh600002"])
+
+
 TEST_POSITION = [
     {
         "Unnamed: 14": "",
@@ -238,3 +418,74 @@ TEST_XQ_PORTOFOLIO_HISTORY = {
     ],
     "maxPage": 17,
 }
+
+
+class TestNetValueRefresh(unittest.TestCase):
+    def setUp(self):
+        self.follower = XueQiuFollower()
+        self.follower.s = mock.MagicMock()
+        self.quotes = {}
+        self.requests = []
+        self.follower.s.get.side_effect = self.get
+        self.follower._get_portfolio_net_value = mock.Mock(return_value=2.0)
+
+    def get(self, url, params=None, headers=None):
+        codes = params["code"].split(",")
+        self.requests.append(codes)
+        return FakeResponse(
+            {
+                code: {"net_value": self.quotes[code]}
+                for code in codes
+                if code in self.quotes
+            }
+        )
+
+    def test_fetch_net_values_in_batches(self):
+        self.follower.NET_VALUE_BATCH_SIZE = 2
+        self.quotes = {"ZH000001": 1.1, "ZH000002": 1.2, "ZH000003": 1.3}
+
+        net_values = self.follower.fetch_net_values(
+            ["ZH000001", "ZH000002", "ZH000003", "ZH000004"]
+        )
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(
+            net_values,
+            {
+                "ZH000001": 1.1,
+                "ZH000002": 1.2,
+                "ZH000003": 1.3,
+                "ZH000004": 2.0,
+            },
+        )
+        self.follower._get_portfolio_net_value.assert_called_once_with(
+            "ZH000004"
+        )
+
+    def test_project_with_refreshed_assets(self):
+        assets = StrategyAssets(100000, 100000)
+        refresher = NetValueRefresher(self.follower.fetch_net_values)
+        refresher.add("ZH000001", assets)
+        self.quotes = {"ZH000001": "1.5"}
+
+        self.assertEqual(refresher.refresh(), 1)
+
+        transactions = [
+            {
+                "weight": 10,
+                "prev_weight": 0,
+                "price": 10.0,
+                "created_at": 1546394400000,
+                "stock_symbol": "SH600000",
+            }
+        ]
+        self.follower.project_transactions(transactions, assets)
+        self.assertEqual(transactions[0]["amount"], 1500)
+
+    def test_keep_assets_when_refresh_fails(self):
+        assets = StrategyAssets(100000, 120000)
+        refresher = NetValueRefresher(mock.Mock(side_effect=IOError))
+        refresher.add("ZH000001", assets)
+
+        self.assertEqual(refresher.refresh(), 0)
+        self.assertEqual(assets.value, 120000)